@@ -1,62 +1,222 @@
 # backend/app/api/bookings.py
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+import asyncio
+import json
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Dict, Set
+from typing import List
 
 from ..db import get_db
 from ..models.user import User
 from ..models.provider import Provider
 from ..models.booking import Booking
-from ..schemas.booking import BookingCreate, BookingUpdateStatus, BookingOut, BookingAutoCreate, BookingLocationUpdate, BookingRatingCreate, BookingFundingContribution
-from ..services.auth_service import get_current_user
+from ..schemas.booking import BookingCreate, BookingUpdateStatus, BookingOut, BookingAutoCreate, BookingLocationUpdate, BookingLocationBatch, BookingTrackPoint, BookingRatingCreate, BookingFundingContribution
+from ..services.auth_service import get_current_user, get_current_user_id, decode_user_id
 from ..services.booking_service import create_booking, update_booking_status
+from ..services.rating_service import record_rating
 from ..services.provider_service import nearby_providers, haversine_km
+from ..services.realtime import hub, pump
+from ..services import live_location, track_service, dispatch_service, eta_service
+from ..config import settings
 
 router = APIRouter(prefix="/bookings", tags=["Bookings"])
 
-# Simple in-memory connection store for demo
-_connections: Dict[int, Set[WebSocket]] = {}
+def _booking_rows(db: Session):
+    # Booking + its provider + the provider's user in one round-trip
+    return (
+        db.query(Booking, Provider, User)
+        .outerjoin(Provider, Provider.id == Booking.provider_id)
+        .outerjoin(User, User.id == Provider.user_id)
+    )
+
+# Provider is on the way to the consumer: the only statuses an ETA means anything for
+_ETA_STATUSES = {"accepted", "on_the_way", "arrived"}
 
-async def _broadcast_status(booking: Booking):
-    import json
-    ws_set = _connections.get(booking.id)
-    if not ws_set:
+def _booking_out(b: Booking, provider: Provider | None, provider_user: User | None,
+                 with_eta: bool = False) -> BookingOut:
+    update = {
+        'provider_name': provider_user.name if provider_user else None,
+        'provider_phone': provider_user.phone if provider_user else None,
+        'provider_rating': provider.rating if provider else None,
+    }
+    # The DB copy of the live position lags behind; prefer the in-memory fix
+    fix = live_location.overlay(b.id, {})
+    update.update(fix)
+    # A road-graph ETA is a route search: single-booking and live payloads only, never lists
+    if with_eta:
+        update.update(_eta_fields(
+            b.status,
+            fix.get("provider_live_lat", b.provider_live_lat), fix.get("provider_live_lng", b.provider_live_lng),
+            b.consumer_lat, b.consumer_lng,
+        ))
+    return BookingOut.model_validate(b).model_copy(update=update)
+
+def _eta_fields(status, p_lat, p_lng, c_lat, c_lng) -> dict:
+    if status not in _ETA_STATUSES:
+        return {}
+    eta = eta_service.estimate(p_lat, p_lng, c_lat, c_lng)
+    return {"eta_estimate_minutes": eta.minutes, "eta_source": eta.source} if eta else {}
+
+def _topic(booking_id: int) -> str:
+    return f"booking:{booking_id}"
+
+def _load_status_payload(booking_id: int, db: Session | None = None) -> dict | None:
+    from ..db import SessionLocal
+    own = db is None
+    db = db or SessionLocal()
+    try:
+        row = _booking_rows(db).filter(Booking.id == booking_id).first()
+        if not row:
+            return None
+        payload = {**_booking_out(*row, with_eta=True).model_dump(mode="json"), "type": "status"}
+        live_location.remember_snapshot(booking_id, payload, share=False)
+        return payload
+    finally:
+        if own:
+            db.close()
+
+def _publish_status(db: Session, booking: Booking) -> None:
+    """Push the booking's current state to its WebSocket subscribers (safe from sync handlers)."""
+    topic = _topic(booking.id)
+    if not hub.has_subscribers(topic):
         return
-    payload = BookingOut.from_orm(booking).model_dump()
-    for ws in list(ws_set):
-        try:
-            await ws.send_text(json.dumps(payload))
-        except Exception:
-            try:
-                ws_set.remove(ws)
-            except Exception:
-                pass
+    row = _booking_rows(db).filter(Booking.id == booking.id).first()
+    if row:
+        payload = {**_booking_out(*row, with_eta=True).model_dump(mode="json"), "type": "status"}
+        live_location.remember_snapshot(booking.id, payload)
+        hub.publish(topic, payload)
+
+def _announce_assigned(db: Session, b: Booking) -> None:
+    """Put a booking that now waits on its provider into that provider's feed."""
+    row = _booking_rows(db).filter(Booking.id == b.id).first()
+    if row:
+        dispatch_service.notify_providers(
+            db, [b.provider_id],
+            {"type": "booking_assigned", "booking_id": b.id, "booking": _booking_out(*row).model_dump(mode="json")},
+        )
+
+def _announce_dispatch(db: Session, b: Booking, previous_provider_id: int, reason: str) -> None:
+    """After a decline/timeout: tell both providers on their feeds, then the booking's watchers."""
+    if b.provider_id != previous_provider_id:
+        dispatch_service.notify_providers(
+            db, [previous_provider_id], {"type": "booking_unassigned", "booking_id": b.id, "reason": reason},
+        )
+        _announce_assigned(db, b)
+    _publish_status(db, b)
+
+# Timed-out offers are moved on by the dispatch scheduler; tell the clients too
+dispatch_service.on_reassigned(lambda db, b, previous: _announce_dispatch(db, b, previous, "timeout"))
+
+def _ingest_location(booking_id: int, lat: float, lng: float, db: Session | None = None,
+                     ts: float | None = None, learn: bool = True) -> dict | None:
+    """Record a provider GPS fix and fan it out; nothing is committed here."""
+    prev = live_location.last_fix(booking_id)
+    fix = live_location.record_fix(booking_id, lat, lng, ts)
+    if learn:
+        eta_service.observe(prev, [fix])
+    # Clients replace their booking state with every message, so location events
+    # carry the full booking payload (from the last status snapshot)
+    base = live_location.snapshot(booking_id) or _load_status_payload(booking_id, db)
+    if base is None:
+        return None
+    event = {**live_location.overlay(booking_id, base), "type": "location"}
+    event.update(_eta_fields(base.get("status"), event["provider_live_lat"], event["provider_live_lng"],
+                             base.get("consumer_lat"), base.get("consumer_lng")))
+    hub.publish(_topic(booking_id), event)
+    return event
+
+def _parse_fix(raw: str) -> tuple[float, float] | None:
+    try:
+        msg = json.loads(raw)
+        if msg.get("type") != "location":
+            return None
+        lat, lng = float(msg["lat"]), float(msg["lng"])
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        return None
+    return lat, lng
+
+def _ws_ingest(booking_id: int, user_id: int, lat: float, lng: float) -> bool:
+    from ..db import SessionLocal
+    db = SessionLocal()
+    try:
+        # Re-checked per fix (cached) so a reassigned provider stops being relayed
+        if live_location.assigned_user_id(db, booking_id) != user_id:
+            return False
+        _ingest_location(booking_id, lat, lng, db)
+        return True
+    finally:
+        db.close()
+
+def _provider_id_for_user(user_id: int) -> int | None:
+    from ..db import SessionLocal
+    db = SessionLocal()
+    try:
+        row = db.query(Provider.id).filter(Provider.user_id == user_id).first()
+        return row.id if row else None
+    finally:
+        db.close()
+
+@router.websocket("/ws/provider")
+async def provider_ws(websocket: WebSocket, token: str | None = None, last_event_id: str | None = None):
+    """Feed for one provider (`?token=<jwt>`): bookings assigned to or taken from them,
+    and broadcast offers. Every event has an "event_id"; reconnect with
+    `&last_event_id=<id>` to receive only what was missed, or get {"type": "resync"}
+    when that isn't possible (then refetch GET /bookings and /bookings/offers)."""
+    user_id = decode_user_id(token)
+    provider_id = await run_in_threadpool(_provider_id_for_user, user_id) if user_id is not None else None
+    if provider_id is None:
+        await websocket.close(code=4401)
+        return
+    await websocket.accept()
+    sub, missed = hub.subscribe_from(dispatch_service.provider_topic(provider_id), last_event_id)
+    sender = None
+    try:
+        if missed is None:
+            await websocket.send_json({"type": "resync"})
+        for text in missed or ():
+            await websocket.send_text(text)
+        sender = asyncio.create_task(pump(websocket, sub))
+        while True:
+            await websocket.receive_text()  # keep alive
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if sender is not None:
+            sender.cancel()
+        sub.close()
 
 @router.websocket("/ws/{booking_id}")
-async def booking_ws(websocket: WebSocket, booking_id: int):
+async def booking_ws(websocket: WebSocket, booking_id: int, token: str | None = None):
+    """Booking updates. The assigned provider may also connect with `?token=<jwt>`
+    and send `{"type": "location", "lat": .., "lng": ..}` messages."""
     await websocket.accept()
-    ws_set = _connections.setdefault(booking_id, set())
-    ws_set.add(websocket)
+    # Subscribe before reading the snapshot so no update can fall in between
+    sub = hub.subscribe(_topic(booking_id))
+    sender = None
+    reporter_id = decode_user_id(token)
     try:
-        # Immediately push current state if exists
-        try:
-            from ..db import SessionLocal
-            db = SessionLocal()
-            b = db.query(Booking).get(booking_id)
-            if b:
-                await _broadcast_status(b)
-        except Exception:
-            pass
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
+        initial = await run_in_threadpool(_load_status_payload, booking_id)
+        if initial:
+            await websocket.send_json(initial)
+        sender = asyncio.create_task(pump(websocket, sub))
         while True:
-            # We don't expect messages from client; keep alive
-            await websocket.receive_text()
+            raw = await websocket.receive_text()
+            if reporter_id is None:
+                continue  # viewers don't send anything meaningful; keep alive
+            fix = _parse_fix(raw)
+            if fix is None:
+                continue
+            if not await run_in_threadpool(_ws_ingest, booking_id, reporter_id, *fix):
+                await websocket.send_json({"type": "error", "detail": "Only assigned provider can update location"})
     except WebSocketDisconnect:
-        ws_set.discard(websocket)
+        pass
+    finally:
+        if sender is not None:
+            sender.cancel()
+        sub.close()
 
 @router.post("", response_model=BookingOut)
 def create(payload: BookingCreate, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
@@ -73,6 +233,7 @@ def create(payload: BookingCreate, db: Session = Depends(get_db), user: User = D
         consumer_lat=payload.consumer_lat,
         consumer_lng=payload.consumer_lng,
     )
+    _announce_assigned(db, b)
     return b
 
 @router.post("/auto", response_model=BookingOut)
@@ -92,7 +253,16 @@ def create_auto(payload: BookingAutoCreate, db: Session = Depends(get_db), user:
     # Order by distance (nearest first)
     candidates.sort(key=lambda p: haversine_km(payload.consumer_lat, payload.consumer_lng, p.lat, p.lng))
     queue = [p.id for p in candidates]
+    mode = payload.dispatch_mode or settings.DISPATCH_MODE
+    if mode not in ("sequential", "broadcast"):
+        raise HTTPException(status_code=422, detail="dispatch_mode must be 'sequential' or 'broadcast'")
+    broadcast_offer = mode == "broadcast" and len(queue) > 1
+    if broadcast_offer:
+        # Everyone in the queue holds the offer; provider_id is the nearest until someone accepts
+        queue = queue[:max(settings.DISPATCH_BROADCAST_FANOUT, 1)]
     provider_id = queue[0]
+    # Only time the offer out when there is someone to move on to
+    expires = dispatch_service.offer_deadline() if len(queue) > 1 else None
 
     b = create_booking(
         db,
@@ -104,118 +274,104 @@ def create_auto(payload: BookingAutoCreate, db: Session = Depends(get_db), user:
         consumer_lng=payload.consumer_lng,
         dispatch_queue=queue,
         dispatch_idx=0,
+        offer_expires_at=expires,
+        status=dispatch_service.OFFERED_STATUS if broadcast_offer else "requested",
     )
+    dispatch_service.scheduler.schedule(b.id, 0, expires)
+    if broadcast_offer:
+        row = _booking_rows(db).filter(Booking.id == b.id).first()
+        dispatch_service.send_offers(db, b, _booking_out(*row).model_dump(mode="json"))
+    else:
+        _announce_assigned(db, b)
     return b
 
 @router.get("", response_model=List[BookingOut])
-def my_bookings(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def my_bookings(
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
     # If the user is a provider, show provider bookings; else show as customer
     provider = db.query(Provider).filter(Provider.user_id == user.id).first()
     if provider:
-        bookings = db.query(Booking).filter(Booking.provider_id == provider.id).order_by(Booking.id.desc()).all()
+        own = Booking.provider_id == provider.id
     else:
-        bookings = db.query(Booking).filter(Booking.customer_id == user.id).order_by(Booking.id.desc()).all()
-    
-    # Enrich with provider information
-    result = []
-    for b in bookings:
-        booking_provider = db.query(Provider).get(b.provider_id)
-        provider_user = None
-        if booking_provider:
-            provider_user = db.query(User).get(booking_provider.user_id)
-        
-        booking_dict = {
-            **b.__dict__,
-            'provider_name': provider_user.name if provider_user else None,
-            'provider_phone': provider_user.phone if provider_user else None,
-            'provider_rating': booking_provider.rating if booking_provider else None,
-        }
-        result.append(BookingOut(**booking_dict))
-    
-    return result
+        own = Booking.customer_id == user.id
+    rows = _booking_rows(db).filter(own).order_by(Booking.id.desc()).offset(offset).limit(limit).all()
+    return [_booking_out(b, p, u) for b, p, u in rows]
+
+def _holds_offer(db: Session, b: Booking, user: User) -> bool:
+    if b.status != dispatch_service.OFFERED_STATUS:
+        return False
+    provider = db.query(Provider).filter(Provider.user_id == user.id).first()
+    return bool(provider and provider.id in (b.dispatch_queue or []))
+
+@router.get("/offers", response_model=List[BookingOut])
+def my_offers(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    """Broadcast offers this provider can still accept."""
+    provider = db.query(Provider).filter(Provider.user_id == user.id).first()
+    if not provider:
+        return []
+    rows = _booking_rows(db).filter(Booking.status == dispatch_service.OFFERED_STATUS).order_by(Booking.id.desc()).all()
+    return [_booking_out(b, p, u) for b, p, u in rows if provider.id in (b.dispatch_queue or [])]
 
 @router.get("/{booking_id}", response_model=BookingOut)
 def get_booking(booking_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    b = db.query(Booking).get(booking_id)
-    if not b:
+    row = _booking_rows(db).filter(Booking.id == booking_id).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Booking not found")
-    provider = db.query(Provider).filter(Provider.user_id == user.id).first()
+    b, booking_provider, provider_user = row
     is_customer = user.id == b.customer_id
-    is_assigned_provider = bool(provider and provider.id == b.provider_id)
-    if not (is_customer or is_assigned_provider):
+    is_assigned_provider = bool(booking_provider and booking_provider.user_id == user.id)
+    if not (is_customer or is_assigned_provider or _holds_offer(db, b, user)):
         raise HTTPException(status_code=403, detail="Not allowed")
-    
-    # Get provider information
-    booking_provider = db.query(Provider).get(b.provider_id)
-    provider_user = None
-    if booking_provider:
-        provider_user = db.query(User).get(booking_provider.user_id)
-    
-    # Create response with provider info
-    booking_dict = {
-        **b.__dict__,
-        'provider_name': provider_user.name if provider_user else None,
-        'provider_phone': provider_user.phone if provider_user else None,
-        'provider_rating': booking_provider.rating if booking_provider else None,
-    }
-    
-    return BookingOut(**booking_dict)
+    return _booking_out(b, booking_provider, provider_user, with_eta=True)
 
 @router.patch("/{booking_id}", response_model=BookingOut)
 def update_status(booking_id: int, payload: BookingUpdateStatus, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    import anyio
     b = db.query(Booking).get(booking_id)
     if not b:
         raise HTTPException(status_code=404, detail="Booking not found")
 
-    # Only customer or current provider can change it
     provider = db.query(Provider).filter(Provider.user_id == user.id).first()
     is_customer = user.id == b.customer_id
+
+    # Broadcast offer: any provider holding it may accept; the first accept wins
+    if b.status == dispatch_service.OFFERED_STATUS and not is_customer:
+        if not (provider and provider.id in (b.dispatch_queue or [])):
+            raise HTTPException(status_code=403, detail="Not allowed")
+        if payload.status == "declined":
+            return b  # the others may still take it; the offer expires on its own
+        if payload.status != "accepted":
+            raise HTTPException(status_code=409, detail="Accept the offer first")
+        claimed = dispatch_service.claim_offer(db, b, provider.id)
+        if claimed is None:
+            raise HTTPException(status_code=409, detail="Offer already taken")
+        _publish_status(db, claimed)
+        return claimed
+
+    # Only customer or current provider can change it
     is_assigned_provider = bool(provider and provider.id == b.provider_id)
     if not (is_customer or is_assigned_provider):
+        if provider and provider.id in (b.dispatch_queue or []):
+            # Was offered this booking, but it was taken or moved on meanwhile
+            raise HTTPException(status_code=409, detail="Offer no longer available")
         raise HTTPException(status_code=403, detail="Not allowed")
 
     # Decline → try reassigning to the next provider in the dispatch queue
     if payload.status == "declined" and is_assigned_provider:
-        queue = b.dispatch_queue or []
-        idx = int(b.dispatch_idx or 0)
-        next_idx = idx + 1
-        reassigned = False
-        while next_idx < len(queue):
-            next_pid = queue[next_idx]
-            # Ensure next provider still exists and is active
-            next_p = db.query(Provider).get(next_pid)
-            if next_p and next_p.active and next_p.lat is not None and next_p.lng is not None:
-                b.provider_id = next_p.id
-                b.status = "requested"
-                b.dispatch_idx = next_idx
-                # reset live location and previous offer when reassigning
-                b.provider_live_lat = None
-                b.provider_live_lng = None
-                b.eta_minutes = None
-                b.price_amount = None
-                b.price_currency = None
-                db.commit()
-                db.refresh(b)
-                reassigned = True
-                break
-            next_idx += 1
-        if not reassigned:
-            # No more providers to try; keep as declined (consumer may retry)
-            b = update_booking_status(
-                db,
-                booking_id=booking_id,
-                status="declined",
-                scheduled_at=payload.scheduled_at,
-            )
+        previous = b.provider_id
+        moved = dispatch_service.advance_dispatch(db, b, exhausted_status="declined")
+        if moved is None:
+            raise HTTPException(status_code=409, detail="Booking changed meanwhile; reload and retry")
+        b = moved
         # Broadcast and return
-        try:
-            anyio.from_thread.run(_broadcast_status, b)
-        except Exception:
-            pass
+        _announce_dispatch(db, b, previous, "declined")
         return b
 
     # Normal status update path
+    was_offered = b.status == dispatch_service.OFFERED_STATUS
     b = update_booking_status(
         db,
         booking_id=booking_id,
@@ -226,45 +382,73 @@ def update_status(booking_id: int, payload: BookingUpdateStatus, db: Session = D
         price_currency=payload.price_currency,
     )
 
+    # Customer changed a broadcast offer (e.g. canceled it): withdraw it everywhere
+    if was_offered:
+        dispatch_service.cancel_offers(db, b, reason=b.status)
+
     # Fire-and-forget broadcast (don't block response if no listeners)
-    try:
-        anyio.from_thread.run(_broadcast_status, b)  # if called in thread context
-    except Exception:
-        # Fallback to direct await in async context isn't possible here; ignore if not available
-        pass
+    _publish_status(db, b)
 
     return b
 
 @router.post("/{booking_id}/location", response_model=BookingOut)
-def update_location(booking_id: int, payload: BookingLocationUpdate, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    import anyio
-    b = db.query(Booking).get(booking_id)
-    if not b:
+def update_location(booking_id: int, payload: BookingLocationUpdate, db: Session = Depends(get_db), user_id: int = Depends(get_current_user_id)):
+    # Hot path (a ping every few seconds): token-only auth, cached ownership, no commit
+    assignee = live_location.assigned_user_id(db, booking_id)
+    if assignee is None:
         raise HTTPException(status_code=404, detail="Booking not found")
 
     # Only assigned provider can update live location
-    provider = db.query(Provider).filter(Provider.user_id == user.id).first()
-    if not (provider and provider.id == b.provider_id):
+    if assignee != user_id:
         raise HTTPException(status_code=403, detail="Only assigned provider can update location")
 
-    b.provider_live_lat = payload.lat
-    b.provider_live_lng = payload.lng
-    db.commit()
-    db.refresh(b)
+    # Broadcast new location via WS; persisted in batches by live_location
+    return _ingest_location(booking_id, payload.lat, payload.lng, db)
 
-    # Broadcast new location via WS
-    try:
-        anyio.from_thread.run(_broadcast_status, b)
-    except Exception:
-        pass
+def _epoch(dt: datetime) -> float:
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
 
-    return b
+@router.post("/{booking_id}/locations", response_model=BookingOut)
+def update_locations_batch(booking_id: int, payload: BookingLocationBatch, db: Session = Depends(get_db), user_id: int = Depends(get_current_user_id)):
+    """Flush of fixes buffered offline: one ownership check, one broadcast, newest fix wins."""
+    assignee = live_location.assigned_user_id(db, booking_id)
+    if assignee is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if assignee != user_id:
+        raise HTTPException(status_code=403, detail="Only assigned provider can update location")
+
+    fixes = sorted(((f.lat, f.lng, _epoch(f.ts)) for f in payload.fixes), key=lambda f: f[2])
+    if payload.store_track:
+        b = db.query(Booking).get(booking_id)
+        b.provider_track = track_service.append(
+            b.provider_track, fixes,
+            tolerance_m=settings.TRACK_SIMPLIFY_METERS, max_points=settings.TRACK_MAX_POINTS,
+        )
+        db.commit()
+
+    # Every pair of buffered fixes teaches the ETA speed grid, not just the newest
+    eta_service.observe(live_location.last_fix(booking_id), fixes)
+    lat, lng, ts = fixes[-1]
+    event = _ingest_location(booking_id, lat, lng, db, ts=ts, learn=False)
+    if event is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return event
+
+@router.get("/{booking_id}/track", response_model=List[BookingTrackPoint])
+def get_track(booking_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    row = _booking_rows(db).filter(Booking.id == booking_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    b, booking_provider, _ = row
+    if not (user.id == b.customer_id or (booking_provider and booking_provider.user_id == user.id)):
+        raise HTTPException(status_code=403, detail="Not allowed")
+    return [
+        {"lat": lat, "lng": lng, "ts": datetime.fromtimestamp(t, tz=timezone.utc)}
+        for lat, lng, t in track_service.decode(b.provider_track)
+    ]
 
 @router.post("/{booking_id}/rating", response_model=BookingOut)
 def rate_booking(booking_id: int, payload: BookingRatingCreate, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    import anyio
-    from datetime import datetime
-
     b = db.query(Booking).get(booking_id)
     if not b:
         raise HTTPException(status_code=404, detail="Booking not found")
@@ -279,35 +463,18 @@ def rate_booking(booking_id: int, payload: BookingRatingCreate, db: Session = De
     if b.status != "completed":
         raise HTTPException(status_code=400, detail="Booking must be completed to rate")
 
-    # Persist rating on booking
-    b.rating_stars = payload.stars
-    b.rating_comment = (payload.comment or "").strip() or None
-    b.rated_at = datetime.utcnow()
-
-    # Update provider aggregates
-    provider = db.query(Provider).get(b.provider_id)
-    if provider:
-        # New average rating = ((old_avg * jobs_done) + stars) / (jobs_done + 1)
-        new_jobs_done = int(provider.jobs_done or 0) + 1
-        old_total = float(provider.rating or 0.0) * float(provider.jobs_done or 0)
-        new_avg = (old_total + float(payload.stars)) / float(new_jobs_done)
-        provider.jobs_done = new_jobs_done
-        provider.rating = new_avg
-
-    db.commit()
+    # Persist rating on booking and update provider aggregates (atomic; a concurrent rating loses)
+    if not record_rating(db, b, payload.stars, (payload.comment or "").strip() or None):
+        raise HTTPException(status_code=400, detail="Booking already rated")
     db.refresh(b)
 
     # Broadcast update
-    try:
-        anyio.from_thread.run(_broadcast_status, b)
-    except Exception:
-        pass
+    _publish_status(db, b)
 
     return b
 
 @router.post("/{booking_id}/contribute", response_model=BookingOut)
 def contribute_funding(booking_id: int, payload: BookingFundingContribution, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    import anyio
     from datetime import datetime
 
     b = db.query(Booking).get(booking_id)
@@ -371,9 +538,6 @@ def contribute_funding(booking_id: int, payload: BookingFundingContribution, db:
     db.refresh(b)
 
     # Broadcast update
-    try:
-        anyio.from_thread.run(_broadcast_status, b)
-    except Exception:
-        pass
+    _publish_status(db, b)
 
     return b
@@ -1,5 +1,5 @@
 # backend/app/api/forum.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -8,6 +8,7 @@ from ..models.user import User
 from ..models.forum_post import ForumPost
 from ..schemas.forum_post import ForumPostCreate, ForumPostOut
 from ..services.auth_service import get_current_user
+from ..services.cache_service import cached_response
 
 router = APIRouter(prefix="/forum", tags=["Forum"])
 
@@ -39,8 +40,10 @@ def create_post_internal(
     return post
 
 @router.get("/posts", response_model=List[ForumPostOut])
-def get_posts(db: Session = Depends(get_db)):
-    return db.query(ForumPost).order_by(ForumPost.id.desc()).all()
+def get_posts(request: Request, db: Session = Depends(get_db)):
+    return cached_response(request, ("forum_posts",), lambda: [
+        ForumPostOut.model_validate(p) for p in db.query(ForumPost).order_by(ForumPost.id.desc()).all()
+    ])
 
 @router.post("/posts", response_model=ForumPostOut)
 def create_post(
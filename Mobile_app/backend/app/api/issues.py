@@ -1,16 +1,19 @@
 # backend/app/api/issues.py
 from typing import Optional
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, date
 
 from ..db import get_db
 from ..models.issue import Issue
 from ..models.user import User
-from ..schemas.issue import IssueCreate, IssueOut, ComplaintEscalateRequest, EmailComposeResponse, OfficialStatusUpdate
+from ..schemas.issue import IssueCreate, IssueOut, IssueMapOut, IssueStatsOut, ComplaintEscalateRequest, EmailComposeResponse, OfficialStatusUpdate
 from ..services.auth_service import get_current_user
 from ..services.issue_service import save_upload, create_issue
 from ..services.notify_service import notify_officials
+from ..services.dedup_service import find_duplicate, bump_cluster, register_issue, unregister_issue, cluster_root
+from ..services import map_service, stats_service
+from ..services.cache_service import conditional
 
 # Lazy-load AI pipeline to avoid heavy imports at module import time (helps with reload on Windows)
 _autotagger = None
@@ -74,8 +77,13 @@ def create_issue_json(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
+    # Near-duplicate of a recent nearby report? Join its cluster and reuse its analysis
+    canonical = find_duplicate(db, title=payload.title, description=payload.description, lat=payload.lat, lng=payload.lng)
+
     ai_res = None
-    if payload.analyze:
+    if canonical is not None:
+        ai_res = canonical.ai
+    elif payload.analyze:
         autotagger = get_autotagger()
         if autotagger:
             ai_res = autotagger.classify_text(payload.description)
@@ -114,8 +122,15 @@ def create_issue_json(
         db, user_id=user.id,
         title=payload.title, description=payload.description,
         lat=payload.lat, lng=payload.lng,
-        image_url=None, ai=ai_res
+        image_url=None, ai=ai_res,
+        duplicate_of_id=canonical.id if canonical else None,
     )
+    if canonical is not None:
+        # Cluster already drafted/notified; don't repeat that work per duplicate
+        bump_cluster(db, canonical.id)
+        db.refresh(issue)
+        return issue
+    register_issue(issue)
 
     # If government-related category, prepare complaint draft
     gov_categories = {"water", "electricity", "road", "garbage"}
@@ -155,8 +170,12 @@ def create_issue_with_image(
     user: User = Depends(get_current_user),
 ):
     path = save_upload(file)
+    canonical = find_duplicate(db, title=title, description=description, lat=lat, lng=lng)
+
     ai_res = None
-    if analyze:
+    if canonical is not None:
+        ai_res = canonical.ai
+    elif analyze:
         autotagger = get_autotagger()
         if autotagger:
             # Your AutoTagger can have an image+text method; adapt as needed
@@ -198,8 +217,14 @@ def create_issue_with_image(
         db, user_id=user.id,
         title=title, description=description,
         lat=lat, lng=lng,
-        image_url=path, ai=ai_res
+        image_url=path, ai=ai_res,
+        duplicate_of_id=canonical.id if canonical else None,
     )
+    if canonical is not None:
+        bump_cluster(db, canonical.id)
+        db.refresh(issue)
+        return issue
+    register_issue(issue)
 
     # If government-related category, prepare complaint draft
     gov_categories = {"water", "electricity", "road", "garbage"}
@@ -227,6 +252,17 @@ def create_issue_with_image(
 
     return issue
 
+def _mark_escalated_from_root(db: Session, issue: Issue, root: Issue) -> Issue:
+    """Record an already escalated cluster's escalation on one of its duplicates."""
+    issue.escalated = True
+    issue.escalated_to = root.escalated_to
+    issue.escalated_at = datetime.utcnow()
+    db.add(issue)
+    db.commit()
+    db.refresh(issue)
+    return issue
+
+
 @router.post("/{issue_id}/escalate", response_model=IssueOut)
 def escalate_issue(
     issue_id: int,
@@ -241,6 +277,11 @@ def escalate_issue(
     if user.role != 'admin' and issue.user_id != user.id:
         raise HTTPException(status_code=403, detail="Not allowed")
 
+    # Duplicates escalate through their cluster: one notification + fundraiser per incident
+    root = cluster_root(db, issue)
+    if root.id != issue.id and root.escalated:
+        return _mark_escalated_from_root(db, issue, root)
+
     # Determine category and target
     classification = None
     ai = issue.ai or {}
@@ -300,10 +341,21 @@ def escalate_issue(
             }
         )
 
+    if root.id != issue.id:
+        # Claim the root before notifying so concurrent escalations of the same
+        # cluster notify once; the loser just copies the root's escalation.
+        claimed = db.query(Issue).filter(Issue.id == root.id, Issue.escalated.isnot(True)).update(
+            {Issue.escalated: True, Issue.escalated_at: datetime.utcnow()}, synchronize_session=False
+        )
+        if not claimed:
+            db.rollback()
+            db.refresh(root)
+            return _mark_escalated_from_root(db, issue, root)
+
     # Send via notifier (log-only) and capture target
     from ..services.notify_service import notify_officials
     notify = notify_officials(classification, {
-        'issue_id': issue.id,
+        'issue_id': root.id,
         'title': issue.title,
         'description': issue.description,
         'subject': f"Community Complaint - {issue.title}",
@@ -313,12 +365,17 @@ def escalate_issue(
     })
     target_email = (notify or {}).get('target')
 
-    # Mark as escalated and store draft
+    # Mark the cluster root (and the escalated issue) as escalated and store draft
     issue.complaint_draft = draft_text
-    issue.escalated = True
-    issue.escalated_to = target_email or dept_name or 'Concerned Department'
-    issue.escalated_at = datetime.utcnow()
-    db.add(issue)
+    root.escalated = True
+    root.escalated_to = target_email or dept_name or 'Concerned Department'
+    root.escalated_at = datetime.utcnow()
+    db.add(root)
+    if root.id != issue.id:
+        issue.escalated = True
+        issue.escalated_to = root.escalated_to
+        issue.escalated_at = root.escalated_at
+        db.add(issue)
     db.commit()
     db.refresh(issue)
 
@@ -330,7 +387,7 @@ def escalate_issue(
         qr_path = generate_qr_placeholder(qr_data)
         create_fundraiser(
             db,
-            issue_id=issue.id,
+            issue_id=root.id,
             creator_user_id=user.id,
             target_amount=1000.0,
             currency="INR",
@@ -409,12 +466,20 @@ def delete_issue(issue_id: int, db: Session = Depends(get_db), user: User = Depe
         raise HTTPException(status_code=404, detail="Issue not found")
     if user.role != 'admin' and issue.user_id != user.id:
         raise HTTPException(status_code=403, detail="Not allowed")
+    new_root = unregister_issue(db, issue)
     db.delete(issue)
     db.commit()
+    if new_root is not None:
+        register_issue(new_root)
     return {"deleted": True}
 
 @router.get("", response_model=list[IssueOut])
-def list_issues(sort: Optional[str] = None, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def list_issues(
+    sort: Optional[str] = None,
+    _etag: None = Depends(conditional("issues", "users", "votes", vary_user=True)),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
     query = db.query(Issue)
 
     def ensure_draft(it: Issue):
@@ -445,6 +510,39 @@ def list_issues(sort: Optional[str] = None, db: Session = Depends(get_db), user:
         issues = [ensure_draft(i) for i in issues]
         return issues
 
+@router.get("/map", response_model=IssueMapOut)
+def issues_map(
+    bbox: str = Query(..., description="min_lng,min_lat,max_lng,max_lat"),
+    zoom: int = Query(..., ge=0, le=22),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    try:
+        box = map_service.parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return map_service.query_map(db, bbox=box, zoom=zoom)
+
+@router.get("/stats", response_model=IssueStatsOut)
+def issues_stats(
+    group_by: str = Query("category,status", description="comma-separated: cell,category,day,status"),
+    day_from: Optional[date] = None,
+    day_to: Optional[date] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    cell: Optional[str] = Query(None, description="z/x/y grid cell"),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    fields = [f.strip() for f in group_by.split(",") if f.strip()]
+    bad = [f for f in fields if f not in stats_service.GROUP_FIELDS]
+    if bad:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by field(s): {', '.join(bad)}")
+    return stats_service.query_stats(
+        db, group_by=list(dict.fromkeys(fields)), day_from=day_from, day_to=day_to,
+        category=category, status=status, cell=cell,
+    )
+
 @router.post("/{issue_id}/contribute")
 def contribute_funding(issue_id: int, payload: dict, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
     from ..models.booking import Booking
@@ -525,8 +623,8 @@ def contribute_funding(issue_id: int, payload: dict, db: Session = Depends(get_d
             )
             
             if candidates:
-                # Sort by rating (highest first), then by distance
-                candidates.sort(key=lambda p: (-float(p.rating or 0), haversine_km(issue.lat, issue.lng, p.lat, p.lng)))
+                # Sort by rating score (highest first), then by distance
+                candidates.sort(key=lambda p: (-float(p.rating_score or 0), haversine_km(issue.lat, issue.lng, p.lat, p.lng)))
                 best_provider = candidates[0]
                 
                 # Update booking to assign to best provider
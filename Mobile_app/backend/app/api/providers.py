@@ -1,5 +1,5 @@
 # backend/app/api/providers.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -9,6 +9,7 @@ from ..models.provider import Provider
 from ..schemas.provider import ProviderCreate, ProviderUpdate, ProviderOut
 from ..services.auth_service import get_current_user
 from ..services.provider_service import nearby_providers
+from ..services.cache_service import cached_response
 from ..ai.embeddings import EmbeddingsClient
 
 router = APIRouter(prefix="/providers", tags=["Providers"])
@@ -79,8 +80,12 @@ def update_provider(provider_id: int, payload: ProviderUpdate, db: Session = Dep
     return p
 
 @router.get("/nearby", response_model=List[ProviderOut])
-def search_nearby(lat: float, lng: float, within_km: float = 5.0, skill: Optional[str] = None, query: Optional[str] = None, db: Session = Depends(get_db)):
-    return nearby_providers(db, lat=lat, lng=lng, within_km=within_km, skill=skill, query=query)
+def search_nearby(request: Request, lat: float, lng: float, within_km: float = 5.0, skill: Optional[str] = None, query: Optional[str] = None, db: Session = Depends(get_db)):
+    # display_name comes from the linked user, so user edits invalidate too
+    return cached_response(request, ("providers", "users"), lambda: [
+        ProviderOut.model_validate(p)
+        for p in nearby_providers(db, lat=lat, lng=lng, within_km=within_km, skill=skill, query=query)
+    ])
 
 @router.get("/me", response_model=ProviderOut)
 def get_my_provider(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
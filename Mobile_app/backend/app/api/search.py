@@ -0,0 +1,24 @@
+# backend/app/api/search.py
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Literal, Optional
+
+from ..db import get_db
+from ..models.user import User
+from ..schemas.search import SearchResults
+from ..services.auth_service import get_current_user
+from ..services.search_service import search
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+@router.get("", response_model=SearchResults)
+def search_all(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[Literal["issue", "forum_post"]] = None,
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    res = search(db, q=q, kind=kind, limit=limit, offset=offset)
+    return SearchResults(query=q, total=res["total"], limit=limit, offset=offset, results=res["results"])
@@ -6,6 +6,7 @@ from pydantic import BaseModel
 
 from ..db import get_db
 from ..models.issue import Issue
+from ..services.cache_service import bump
 
 router = APIRouter(prefix="/votes", tags=["Votes"])
 
@@ -26,6 +27,7 @@ def vote_issue(issue_id: int, payload: VoteRequest, db: Session = Depends(get_db
 
     # Update in-memory score using provided value from request body
     _votes[issue_id] = _votes.get(issue_id, 0) + int(payload.value)
+    bump("votes")  # trending order of GET /issues depends on scores
     return {"issue_id": issue_id, "score": _votes[issue_id]}
 
 
@@ -17,6 +17,87 @@ class Settings:
     # ── Files
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "./uploads")
 
+    # ── Duplicate issue detection (same incident reported many times nearby)
+    DEDUP_ENABLED: bool = os.getenv("DEDUP_ENABLED", "1") not in ("0", "false", "False")
+    DEDUP_RADIUS_M: float = float(os.getenv("DEDUP_RADIUS_M", "300"))
+    DEDUP_WINDOW_HOURS: float = float(os.getenv("DEDUP_WINDOW_HOURS", "72"))
+    DEDUP_MAX_HAMMING: int = int(os.getenv("DEDUP_MAX_HAMMING", "14"))  # of 64 SimHash bits
+
+    # ── Issues map (viewport clustering)
+    MAP_CLUSTER_MAX_ZOOM: int = int(os.getenv("MAP_CLUSTER_MAX_ZOOM", "14"))    # <= this zoom: clusters
+    MAP_CLUSTER_CELL_SHIFT: int = int(os.getenv("MAP_CLUSTER_CELL_SHIFT", "3"))  # 8x8 cells per map tile
+    MAP_MARKER_BUCKET_ZOOM: int = int(os.getenv("MAP_MARKER_BUCKET_ZOOM", "15"))
+    MAP_MAX_MARKERS: int = int(os.getenv("MAP_MAX_MARKERS", "2000"))
+
+    # ── Issue stats rollups (dashboard heatmap)
+    STATS_CELL_ZOOM: int = int(os.getenv("STATS_CELL_ZOOM", "14"))  # ~2.4 km tiles, stand-in for wards
+
+    # ── Response cache (ETag / 304 + TTL cache for anonymous reads)
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "5"))  # 0 disables the TTL cache
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+
+    # ── Realtime (WebSocket fan-out)
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "32"))  # per socket; oldest dropped when full
+    # Cross-worker fan-out: memory:// (single worker) | unix:///path/to/dir | redis://host:6379
+    BROADCAST_URL: str = os.getenv("BROADCAST_URL", "memory://")
+    BROADCAST_QUEUE_SIZE: int = int(os.getenv("BROADCAST_QUEUE_SIZE", "10000"))  # unsent messages; newer ones dropped when full
+    # Events kept per replayable topic (provider feeds) for resume-from-last-event-id
+    WS_REPLAY_BUFFER_SIZE: int = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "100"))
+
+    # ── Live provider location (in-memory, persisted in batches)
+    LIVE_LOCATION_PERSIST_SECONDS: float = float(os.getenv("LIVE_LOCATION_PERSIST_SECONDS", "15"))
+    LIVE_LOCATION_ASSIGNEE_TTL_SECONDS: float = float(os.getenv("LIVE_LOCATION_ASSIGNEE_TTL_SECONDS", "30"))
+    TRACK_SIMPLIFY_METERS: float = float(os.getenv("TRACK_SIMPLIFY_METERS", "10"))  # Douglas-Peucker tolerance
+    TRACK_MAX_POINTS: int = int(os.getenv("TRACK_MAX_POINTS", "2000"))
+
+    # ── Dispatch (auto-assigned bookings)
+    DISPATCH_ACCEPT_TIMEOUT_SECONDS: float = float(os.getenv("DISPATCH_ACCEPT_TIMEOUT_SECONDS", "60"))
+    # sequential: one provider at a time down the queue; broadcast: offer to the nearest K at once
+    DISPATCH_MODE: str = os.getenv("DISPATCH_MODE", "sequential")
+    DISPATCH_BROADCAST_FANOUT: int = int(os.getenv("DISPATCH_BROADCAST_FANOUT", "3"))
+
+    # ── ETA estimates (services/eta_service.py)
+    ETA_GRAPH_PATH: str = os.getenv("ETA_GRAPH_PATH", "")  # .osm extract or JSON graph; empty: speed grid only
+    ETA_LANDMARKS: int = int(os.getenv("ETA_LANDMARKS", "8"))
+    ETA_SNAP_MAX_METERS: float = float(os.getenv("ETA_SNAP_MAX_METERS", "300"))
+    ETA_MAX_SETTLED_NODES: int = int(os.getenv("ETA_MAX_SETTLED_NODES", "200000"))
+    ETA_SPEED_CELL_ZOOM: int = int(os.getenv("ETA_SPEED_CELL_ZOOM", "14"))
+    ETA_DEFAULT_SPEED_KMH: float = float(os.getenv("ETA_DEFAULT_SPEED_KMH", "20"))
+    ETA_DETOUR_FACTOR: float = float(os.getenv("ETA_DETOUR_FACTOR", "1.3"))  # road vs straight-line distance
+    ETA_CACHE_ZOOM: int = int(os.getenv("ETA_CACHE_ZOOM", "16"))  # ~600 m tiles
+    ETA_CACHE_TTL_SECONDS: float = float(os.getenv("ETA_CACHE_TTL_SECONDS", "300"))
+    ETA_CACHE_MAX_ENTRIES: int = int(os.getenv("ETA_CACHE_MAX_ENTRIES", "10000"))
+
+    # ── Negotiation history log (app/negotiation/services/history_log.py)
+    NEGOTIATION_DATA_DIR: str = os.getenv("NEGOTIATION_DATA_DIR", "")  # empty: app/negotiation/data
+    NEGOTIATION_LOG_FLUSH_SECONDS: float = float(os.getenv("NEGOTIATION_LOG_FLUSH_SECONDS", "1.0"))
+    NEGOTIATION_LOG_BATCH: int = int(os.getenv("NEGOTIATION_LOG_BATCH", "256"))
+    NEGOTIATION_LOG_MAX_BYTES: int = int(os.getenv("NEGOTIATION_LOG_MAX_BYTES", str(8 * 1024 * 1024)))
+    NEGOTIATION_LOG_KEEP_SEGMENTS: int = int(os.getenv("NEGOTIATION_LOG_KEEP_SEGMENTS", "4"))
+    # Acceptance model (app/negotiation/services/acceptance_model.py), fitted off the request path
+    NEGOTIATION_MODEL_MIN_ROWS: int = int(os.getenv("NEGOTIATION_MODEL_MIN_ROWS", "12"))  # labelled turns before first fit
+    NEGOTIATION_MODEL_REFIT_ROWS: int = int(os.getenv("NEGOTIATION_MODEL_REFIT_ROWS", "20"))  # new labelled turns per refit
+    NEGOTIATION_PRICE_STEP: float = float(os.getenv("NEGOTIATION_PRICE_STEP", "1.0"))  # counter-offer granularity (currency units)
+    NEGOTIATION_MODEL_DIR: str = os.getenv("NEGOTIATION_MODEL_DIR", "")  # trained intelligent model; empty: app/negotiation/models/trained
+    # Sessions (app/negotiation/services/session_store.py): LRU+TTL in memory over a durable backend
+    NEGOTIATION_SESSION_BACKEND: str = os.getenv("NEGOTIATION_SESSION_BACKEND", "sqlite")  # sqlite | memory
+    NEGOTIATION_SESSION_DB: str = os.getenv("NEGOTIATION_SESSION_DB", "")  # empty: <negotiation data dir>/negotiation_sessions.db
+    NEGOTIATION_SESSION_TTL_SECONDS: float = float(os.getenv("NEGOTIATION_SESSION_TTL_SECONDS", str(6 * 3600)))  # idle time before a session expires
+    NEGOTIATION_SESSION_CACHE_SIZE: int = int(os.getenv("NEGOTIATION_SESSION_CACHE_SIZE", "1000"))  # engines kept in memory per worker
+
+    # ── Pricing profiles from booking outcomes (services/pricing_service.py)
+    PRICING_CELL_ZOOM: int = int(os.getenv("PRICING_CELL_ZOOM", "12"))  # ~10 km tiles
+    PRICING_MAX_SAMPLES: int = int(os.getenv("PRICING_MAX_SAMPLES", "500"))  # most recent prices kept per profile
+    PRICING_MIN_SAMPLES: int = int(os.getenv("PRICING_MIN_SAMPLES", "5"))  # fewer: fall back to a broader profile
+    PRICING_LIST_PERCENTILE: float = float(os.getenv("PRICING_LIST_PERCENTILE", "75"))  # suggested opening price
+    PRICING_MIN_PERCENTILE: float = float(os.getenv("PRICING_MIN_PERCENTILE", "25"))  # suggested floor
+    PRICING_REFRESH_SECONDS: float = float(os.getenv("PRICING_REFRESH_SECONDS", "600"))  # background re-read (bulk updates)
+    PRICING_LOAD_WAIT_SECONDS: float = float(os.getenv("PRICING_LOAD_WAIT_SECONDS", "10"))  # lookups during the startup load
+
+    # ── Provider ratings (Bayesian score used for ranking)
+    RATING_PRIOR_MEAN: float = float(os.getenv("RATING_PRIOR_MEAN", "3.5"))
+    RATING_PRIOR_WEIGHT: float = float(os.getenv("RATING_PRIOR_WEIGHT", "5"))  # in "virtual ratings"
+
     @property
     def access_token_timedelta(self) -> timedelta:
         return timedelta(minutes=self.ACCESS_TOKEN_EXPIRE_MINUTES)
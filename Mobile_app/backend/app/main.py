@@ -17,10 +17,25 @@ from .api import (
     consumers as consumers_router,
     fundraisers as fundraisers_router,
     self_help as self_help_router,
+    search as search_router,
 )
+from .services.search_service import ensure_search_index
+from .services import stats_service  # noqa: F401  (registers issue_stats rollup listeners)
+from .services import pricing_service  # also registers the booking outcome listeners
+from .services import broadcast, dispatch_service, eta_service
 
 # Create DB tables on startup (dev mode only)
 Base.metadata.create_all(bind=engine)
+# Full-text search index + sync triggers (idempotent)
+ensure_search_index(engine)
+# Join the other workers' broadcast bus (BROADCAST_URL)
+broadcast.start()
+# Resume offer timeouts of auto-dispatched bookings
+dispatch_service.start()
+# Road graph for ETA estimates loads in the background (ETA_GRAPH_PATH)
+eta_service.start()
+# Price profiles for negotiation bounds load in the background too
+pricing_service.start()
 
 app = FastAPI(
     title="Hackademia Backend",
@@ -28,6 +43,11 @@ app = FastAPI(
     description="API backend for Hackademia project",
 )
 
+@app.on_event("shutdown")
+def _leave_broadcast_bus() -> None:
+    # Flush queued messages and close sockets (the unix backend unlinks its socket file)
+    broadcast.stop()
+
 # ✅ CORS
 app.add_middleware(
     CORSMiddleware,
@@ -52,6 +72,7 @@ app.include_router(forum_router.router, prefix="/api")
 app.include_router(votes_router.router, prefix="/api")
 app.include_router(fundraisers_router.router, prefix="/api")
 app.include_router(self_help_router.router, prefix="/api")
+app.include_router(search_router.router, prefix="/api")
 
 # Negotiation (dynamic pricing & AI)
 from .negotiation.routes import router as negotiation_router
@@ -6,6 +6,7 @@ from .issue import Issue
 from .booking import Booking
 from .fundraiser import Fundraiser, Contribution
 from .forum_post import ForumPost
+from .issue_stat import IssueStat
 
 __all__ = [
     "User",
@@ -16,4 +17,5 @@ __all__ = [
     "Fundraiser",
     "Contribution",
     "ForumPost",
+    "IssueStat",
 ]
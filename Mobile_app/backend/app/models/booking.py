@@ -1,5 +1,5 @@
 # backend/app/models/booking.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, func, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, func, JSON, Index
 from sqlalchemy.orm import relationship
 from ..db import Base
 
@@ -20,14 +20,19 @@ class Booking(Base):
     # Provider live location during service (updated via API)
     provider_live_lat = Column(Float, nullable=True)
     provider_live_lng = Column(Float, nullable=True)
+    # Simplified breadcrumb trail, polyline-encoded (lat, lng, t); see services/track_service.py
+    provider_track = Column(Text, nullable=True)
 
     # Dispatch queue for auto-assignment and decline → reassign flow
     # Stores ordered provider IDs considered for this booking, with current index
+    # (broadcast mode: every provider in the queue holds the offer while status is "offered")
     dispatch_queue = Column(JSON, nullable=True)  # list[int]
     dispatch_idx = Column(Integer, default=0)
+    # When the current provider's offer times out and dispatch moves on (NULL: no timer)
+    offer_expires_at = Column(DateTime(timezone=True), nullable=True)
 
     # Status flow (strings are not strictly enforced to allow custom steps like on_the_way, arrived, started, completed)
-    status = Column(String(32), default="requested")  # requested|accepted|declined|scheduled|completed|canceled|on_the_way|arrived|started
+    status = Column(String(32), default="requested")  # requested|offered|accepted|declined|scheduled|completed|canceled|on_the_way|arrived|started
     scheduled_at = Column(DateTime(timezone=True), nullable=True)
     notes = Column(String(1000), default="")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -50,3 +55,9 @@ class Booking(Base):
     funding_current = Column(Float, default=0.0)  # Current amount funded
     funding_contributions = Column(JSON, nullable=True)  # List of contributions with user_id and amount
     auto_assign_enabled = Column(Integer, default=1)  # 1 = enabled, 0 = disabled
+
+    __table_args__ = (
+        # "my bookings" lists: filter by party, newest first
+        Index("ix_bookings_provider_id_id", "provider_id", "id"),
+        Index("ix_bookings_customer_id_id", "customer_id", "id"),
+    )
@@ -31,3 +31,7 @@ class Issue(Base):
     funding_contributions = Column(JSON, nullable=True)  # List of contributions with user_id and amount
     auto_assign_enabled = Column(Integer, default=1)  # 1 = enabled, 0 = disabled
     assigned_booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=True)  # Link to created booking when funded
+
+    # Near-duplicate clustering: reports of the same incident point at the first (canonical) one
+    duplicate_of_id = Column(Integer, ForeignKey("issues.id"), nullable=True, index=True)
+    duplicate_count = Column(Integer, default=0)  # on canonical issues: number of linked duplicates
@@ -0,0 +1,22 @@
+# backend/app/models/issue_stat.py
+from sqlalchemy import Column, Integer, String, Date, UniqueConstraint, Index
+from ..db import Base
+
+class IssueStat(Base):
+    """Rollup of issue counts keyed by (grid cell, category, day, status).
+
+    Maintained incrementally by services/stats_service.py on issue insert/update/delete.
+    """
+    __tablename__ = "issue_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cell = Column(String(32), nullable=False)       # "z/x/y" map tile, or "none" without coordinates
+    category = Column(String(64), nullable=False)   # ai.classification.category, or "uncategorized"
+    day = Column(Date, nullable=False)              # UTC day of Issue.created_at
+    status = Column(String(32), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("cell", "category", "day", "status", name="uq_issue_stats_key"),
+        Index("ix_issue_stats_day_category", "day", "category"),
+    )
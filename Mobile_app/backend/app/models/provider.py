@@ -2,6 +2,7 @@
 from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, func, JSON
 from sqlalchemy.orm import relationship
 from ..db import Base
+from ..config import settings
 
 class Provider(Base):
     __tablename__ = "providers"
@@ -11,8 +12,13 @@ class Provider(Base):
     bio = Column(String(500), default="")
     # skills stored as comma-separated tags; API accepts string or array and normalizes
     skills = Column(String(300), default="")
-    rating = Column(Float, default=0.0)
-    jobs_done = Column(Integer, default=0)
+    # Rating aggregates, maintained by services/rating_service.py
+    rating = Column(Float, default=0.0)            # plain average
+    rating_sum = Column(Integer, default=0)
+    rating_count = Column(Integer, default=0)
+    # Bayesian average, used for ranking; starts at the prior until the first rating
+    rating_score = Column(Float, default=lambda: settings.RATING_PRIOR_MEAN)
+    jobs_done = Column(Integer, default=0)         # completed bookings
     # provider personal/location fields
     age = Column(Integer, nullable=True)
     address = Column(String(255), nullable=True)
@@ -5,9 +5,14 @@ class StartSessionRequest(BaseModel):
     session_id: str = Field(..., description="Unique session id (e.g., UUID from client).")
     product_id: int
     product_name: str
-    list_price: float = Field(..., gt=0)
-    min_price: float = Field(..., gt=0)
+    # Omit either bound to have it suggested from completed bookings (see services/pricing_service.py)
+    list_price: Optional[float] = Field(default=None, gt=0)
+    min_price: Optional[float] = Field(default=None, gt=0)
     currency: Optional[str] = "INR"
+    service_category: Optional[str] = Field(default=None, description="Booking service category, for suggested bounds.")
+    provider_id: Optional[int] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
 
 class ChatTurnRequest(BaseModel):
     session_id: str
@@ -18,4 +23,16 @@ class ChatTurnResponse(BaseModel):
     reply: str
     status: str  # "ongoing" | "accepted" | "rejected"
     final_price: Optional[float] = None
-    history: List[Any]
\ No newline at end of file
+    history: List[Any]
+    seq: int = 0  # number of turns so far; pass as `since` to fetch only later turns
+
+class WsChatTurn(BaseModel):
+    """A buyer message sent over the negotiation WebSocket."""
+    user_message: str
+    buyer_budget: Optional[float] = None
+
+class TurnsResponse(BaseModel):
+    seq: int
+    status: str
+    final_price: Optional[float] = None
+    turns: List[Any]
@@ -1,41 +1,91 @@
-from fastapi import APIRouter, HTTPException
-from .models.negotiation_model import StartSessionRequest, ChatTurnRequest, ChatTurnResponse
+import json
+from typing import Any, Dict, Optional, Tuple, Union
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+
+from .models.negotiation_model import StartSessionRequest, ChatTurnRequest, ChatTurnResponse, TurnsResponse, WsChatTurn
 from .services.negotiation_service import NegotiationService, NegotiationEngine
 from .services.intelligent_negotiation_service import IntelligentNegotiationEngine, IntelligentNegotiationService
 from .models.provider_model import ProviderConfig
+from .services.session_store import SessionConflict, SessionStore
+from ..services import pricing_service
 
 router = APIRouter(prefix="/negotiation", tags=["Negotiation"])
 
-# In-memory sessions (for demo). In production, move to Redis/DB.
-_sessions: dict[str, NegotiationEngine] = {}
-_intelligent_sessions: dict[str, IntelligentNegotiationEngine] = {}
+# LRU+TTL in memory, saved after every turn so sessions survive restarts and span workers
+_sessions: SessionStore[NegotiationEngine] = SessionStore("basic", NegotiationEngine.from_state)
+_intelligent_sessions: SessionStore[IntelligentNegotiationEngine] = SessionStore("intelligent", IntelligentNegotiationEngine.from_state)
 
-@router.post("/start")
-def start_session(payload: StartSessionRequest):
+Engine = Union[NegotiationEngine, IntelligentNegotiationEngine]
+
+
+def _provider_config(payload: StartSessionRequest) -> Tuple[ProviderConfig, str]:
+    """Provider terms for a session; bounds the client left out come from the pricing profiles."""
+    list_price, min_price, source = payload.list_price, payload.min_price, "client"
+    if list_price is None or min_price is None:
+        try:
+            suggested = pricing_service.suggest_bounds(payload.service_category, payload.provider_id, payload.lat, payload.lng)
+        except pricing_service.PricingNotReady as e:
+            raise HTTPException(status_code=503, detail=f"{e}; retry shortly.")
+        if suggested is None:
+            raise HTTPException(status_code=400, detail="Price bounds missing and not enough completed bookings to suggest them.")
+        source = suggested["source"]
+        if list_price is None:
+            list_price = max(suggested["list_price"], min_price or 0.0)
+        if min_price is None:
+            min_price = min(suggested["min_price"], list_price)
     provider = ProviderConfig(
         product_id=payload.product_id,
         product_name=payload.product_name,
-        list_price=payload.list_price,
-        min_price=payload.min_price,
+        list_price=list_price,
+        min_price=min_price,
         currency=payload.currency or "INR",
     )
     if provider.min_price <= 0 or provider.list_price <= 0 or provider.min_price > provider.list_price:
         raise HTTPException(status_code=400, detail="Invalid price bounds.")
+    return provider, source
+
+
+def _turns(eng: Engine, since: int) -> Dict[str, Any]:
+    return {
+        "seq": len(eng.state.history),
+        "status": eng.state.status,
+        "final_price": eng.state.final_price,
+        "turns": eng.history_since(since),
+    }
+
+def _play_turn(store: SessionStore, session_id: str, user_message: str, buyer_budget: Optional[float]):
+    """One chat turn -> (engine.step() result, engine, seq before the turn); None if the session is gone."""
+    def turn(eng: Engine):
+        seq = len(eng.state.history)
+        return eng.step(user_message=user_message, buyer_hint_budget=buyer_budget), eng, seq
+    return store.play(session_id, turn)
+
+_CONFLICT = "Session was updated concurrently; retry."
+
+@router.post("/start")
+def start_session(payload: StartSessionRequest):
+    provider, source = _provider_config(payload)
     eng = NegotiationEngine(provider)
-    _sessions[payload.session_id] = eng
+    _sessions.put(payload.session_id, eng)
     return {
         "message": "Session started",
         "session_id": payload.session_id,
-        "bounds": {"list_price": provider.list_price, "min_price": provider.min_price},
+        "bounds": {"list_price": provider.list_price, "min_price": provider.min_price, "source": source},
     }
 
 @router.post("/chat", response_model=ChatTurnResponse)
 def chat(payload: ChatTurnRequest):
-    eng = _sessions.get(payload.session_id)
-    if not eng:
+    try:
+        played = _play_turn(_sessions, payload.session_id, payload.user_message, payload.buyer_budget)
+    except SessionConflict:
+        raise HTTPException(status_code=409, detail=_CONFLICT)
+    if not played:
         raise HTTPException(status_code=404, detail="Session not found. Call /start first.")
-    res = eng.step(user_message=payload.user_message, buyer_hint_budget=payload.buyer_budget)
-    return ChatTurnResponse(**res)
+    res, eng, _ = played
+    return ChatTurnResponse(**res, seq=len(eng.state.history))
 
 @router.get("/session/{session_id}")
 def session_state(session_id: str):
@@ -44,23 +94,23 @@ def session_state(session_id: str):
         raise HTTPException(status_code=404, detail="Session not found.")
     return eng.dump_state()
 
+@router.get("/session/{session_id}/history", response_model=TurnsResponse)
+def session_history(session_id: str, since: int = Query(0, ge=0)):
+    """Turns after the first `since` (a client's last seq), for resyncing a chat view."""
+    eng = _sessions.get(session_id)
+    if not eng:
+        raise HTTPException(status_code=404, detail="Session not found.")
+    return _turns(eng, since)
+
 # Intelligent negotiation
 @router.post("/intelligent/start")
 def start_intelligent_session(payload: StartSessionRequest):
-    provider = None
+    provider, source = None, "Auto-detect"
     if hasattr(payload, "product_name") and payload.product_name and payload.product_name != "Auto-detect":
-        provider = ProviderConfig(
-            product_id=payload.product_id,
-            product_name=payload.product_name,
-            list_price=payload.list_price,
-            min_price=payload.min_price,
-            currency=payload.currency or "INR",
-        )
-        if provider.min_price <= 0 or provider.list_price <= 0 or provider.min_price > provider.list_price:
-            raise HTTPException(status_code=400, detail="Invalid price bounds.")
+        provider, source = _provider_config(payload)
 
     eng = IntelligentNegotiationService.create_engine(provider)
-    _intelligent_sessions[payload.session_id] = eng
+    _intelligent_sessions.put(payload.session_id, eng)
 
     return {
         "message": "Intelligent negotiation session started",
@@ -69,16 +119,20 @@ def start_intelligent_session(payload: StartSessionRequest):
         "bounds": {
             "list_price": provider.list_price if provider else "Auto-detect",
             "min_price": provider.min_price if provider else "Auto-detect",
+            "source": source,
         },
     }
 
 @router.post("/intelligent/chat", response_model=ChatTurnResponse)
 def intelligent_chat(payload: ChatTurnRequest):
-    eng = _intelligent_sessions.get(payload.session_id)
-    if not eng:
+    try:
+        played = _play_turn(_intelligent_sessions, payload.session_id, payload.user_message, payload.buyer_budget)
+    except SessionConflict:
+        raise HTTPException(status_code=409, detail=_CONFLICT)
+    if not played:
         raise HTTPException(status_code=404, detail="Intelligent session not found. Call /intelligent/start first.")
-    res = eng.step(user_message=payload.user_message, buyer_hint_budget=payload.buyer_budget)
-    return ChatTurnResponse(**res)
+    res, eng, _ = played
+    return ChatTurnResponse(**res, seq=len(eng.state.history))
 
 @router.get("/intelligent/session/{session_id}")
 def intelligent_session_state(session_id: str):
@@ -87,6 +141,91 @@ def intelligent_session_state(session_id: str):
         raise HTTPException(status_code=404, detail="Intelligent session not found.")
     return eng.dump_state()
 
+@router.get("/intelligent/session/{session_id}/history", response_model=TurnsResponse)
+def intelligent_session_history(session_id: str, since: int = Query(0, ge=0)):
+    eng = _intelligent_sessions.get(session_id)
+    if not eng:
+        raise HTTPException(status_code=404, detail="Intelligent session not found.")
+    return _turns(eng, since)
+
+@router.get("/pricing")
+def pricing_profiles(service_category: str, provider_id: Optional[int] = None,
+                     lat: Optional[float] = None, lng: Optional[float] = None):
+    """Price percentiles and acceptance stats behind the suggested bounds."""
+    try:
+        return {
+            "suggested": pricing_service.suggest_bounds(service_category, provider_id, lat, lng),
+            "profiles": pricing_service.profiles(service_category, provider_id, lat, lng),
+        }
+    except pricing_service.PricingNotReady as e:
+        raise HTTPException(status_code=503, detail=f"{e}; retry shortly.")
+
+# Streaming chat
+def _ws_turn(store: SessionStore, session_id: str, msg: WsChatTurn) -> Optional[Dict[str, Any]]:
+    """Run one turn and return only what it added (None if the session is gone)."""
+    try:
+        played = _play_turn(store, session_id, msg.user_message, msg.buyer_budget)
+    except SessionConflict:
+        return {"type": "error", "detail": _CONFLICT}
+    if not played:
+        return None
+    res, eng, seq = played
+    new = eng.history_since(seq)
+    return {
+        "type": "turn",
+        "seq": seq + len(new),
+        "reply": res["reply"],
+        "status": res["status"],
+        "final_price": res.get("final_price"),
+        "turn": new[-1] if new else None,  # None when the negotiation had already ended
+    }
+
+def _ws_history(store: SessionStore, session_id: str, since: int) -> Optional[Dict[str, Any]]:
+    eng = store.get(session_id)
+    return {"type": "history", **_turns(eng, since)} if eng else None
+
+@router.websocket("/ws/{session_id}")
+async def negotiation_ws(websocket: WebSocket, session_id: str, engine: str = "basic", since: int = 0):
+    """Chat over one socket (`?engine=basic|intelligent`, session created by the matching /start).
+    On connect the client gets {"type": "history", "seq", "turns"} with the turns after `since`.
+    Each {"user_message": .., "buyer_budget": ..} it sends is answered with a {"type": "turn"}
+    carrying only the new turn and the new seq. Send {"type": "resync", "since": n} (or call
+    GET .../history?since=n) to catch up after a gap."""
+    store = _intelligent_sessions if engine == "intelligent" else _sessions
+    snapshot = await run_in_threadpool(_ws_history, store, session_id, max(0, since))
+    if snapshot is None:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    try:
+        await websocket.send_json(snapshot)
+        while True:
+            try:
+                data = json.loads(await websocket.receive_text())
+            except ValueError:
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON."})
+                continue
+            if isinstance(data, dict) and data.get("type") == "resync":
+                try:
+                    out = await run_in_threadpool(_ws_history, store, session_id, max(0, int(data.get("since") or 0)))
+                except (TypeError, ValueError):
+                    await websocket.send_json({"type": "error", "detail": "since must be an integer"})
+                    continue
+            else:
+                try:
+                    msg = WsChatTurn.model_validate(data)
+                except ValidationError as e:
+                    await websocket.send_json({"type": "error", "detail": e.errors(include_url=False, include_context=False)})
+                    continue
+                out = await run_in_threadpool(_ws_turn, store, session_id, msg)
+            if out is None:
+                await websocket.send_json({"type": "error", "detail": "Session not found."})
+                await websocket.close(code=4404)
+                return
+            await websocket.send_json(out)
+    except WebSocketDisconnect:
+        pass
+
 @router.post("/train-ai")
 def train_ai_models():
     try:
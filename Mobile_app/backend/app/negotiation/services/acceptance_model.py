@@ -0,0 +1,121 @@
+"""
+Per-product acceptance models, shared by every negotiation session.
+
+P(accept | price) = 1 / (1 + exp(-(a + b * price)))
+
+Fitted with a few Newton (IRLS) steps in NumPy on the product's labelled turns
+(rows with a bot_offer and an accepted flag) from the shared history store.
+Lookups never fit: a model is refitted on a background thread once
+NEGOTIATION_MODEL_REFIT_ROWS new labelled rows have arrived, and sessions keep
+using the previous model (or the cold-start heuristic) until it is ready.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ...config import settings
+from .history_store import HistoryStore
+
+log = logging.getLogger(__name__)
+
+_MAX_ITER = 25
+_TOL = 1e-6
+_RIDGE = 0.1  # keeps separable data (every low offer accepted) from diverging
+
+
+@dataclass(frozen=True)
+class AcceptanceModel:
+    a: float  # intercept, raw price space
+    b: float  # slope per currency unit
+    n: int    # labelled rows it was fitted on
+
+
+def _labelled(row: Dict[str, Any]) -> bool:
+    return row.get("bot_offer") is not None and row.get("accepted") is not None
+
+
+def fit_logistic(prices: np.ndarray, labels: np.ndarray) -> AcceptanceModel:
+    """Ridge-regularised logistic regression on one feature, by IRLS."""
+    mu = float(prices.mean())
+    sd = float(prices.std()) or 1.0
+    X = np.column_stack([np.ones_like(prices), (prices - mu) / sd])
+    w = np.zeros(2)
+    ridge = _RIDGE * np.eye(2)
+    for _ in range(_MAX_ITER):
+        p = 1.0 / (1.0 + np.exp(-np.clip(X @ w, -35.0, 35.0)))
+        s = p * (1.0 - p)
+        H = X.T @ (X * s[:, None]) + ridge
+        g = X.T @ (p - labels) + ridge @ w
+        step = np.linalg.solve(H, g)
+        w -= step
+        if np.abs(step).max() < _TOL:
+            break
+    # Undo the standardisation so a + b * price works on raw prices
+    b = w[1] / sd
+    return AcceptanceModel(a=float(w[0] - b * mu), b=float(b), n=len(prices))
+
+
+class _Entry:
+    __slots__ = ("model", "scanned", "labelled", "fitted_at", "fitting")
+
+    def __init__(self):
+        self.model: Optional[AcceptanceModel] = None
+        self.scanned = 0    # rows of the product's history already counted
+        self.labelled = 0   # labelled rows among them
+        self.fitted_at = 0  # labelled count the current fit was scheduled at
+        self.fitting = False
+
+
+class AcceptanceModelCache:
+    def __init__(self):
+        self._entries: Dict[Tuple[str, Any], _Entry] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="acceptance-fit")
+
+    def get(self, store: HistoryStore, product_id: Any) -> Optional[AcceptanceModel]:
+        """The current model for the product (None until one is fitted); schedules refits."""
+        rows = store.for_product(product_id)
+        key = (store.log.path, product_id)  # separate stores (e.g. a simulator's) never mix
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None:
+                e = self._entries[key] = _Entry()
+            # Count only rows added since the last lookup
+            total = len(rows)
+            if total > e.scanned:
+                e.labelled += sum(1 for r in rows[e.scanned:total] if _labelled(r))
+                e.scanned = total
+            due = (
+                e.labelled >= settings.NEGOTIATION_MODEL_MIN_ROWS
+                and (e.model is None or e.labelled - e.fitted_at >= settings.NEGOTIATION_MODEL_REFIT_ROWS)
+            )
+            if due and not e.fitting:
+                e.fitting = True
+                e.fitted_at = e.labelled
+                self._executor.submit(self._refit, e, rows, total)
+            return e.model
+
+    def _refit(self, e: _Entry, rows: List[Dict[str, Any]], upto: int) -> None:
+        try:
+            labelled = [r for r in rows[:upto] if _labelled(r)]
+            prices = np.fromiter((float(r["bot_offer"]) for r in labelled), dtype=float, count=len(labelled))
+            labels = np.fromiter((1.0 if r["accepted"] else 0.0 for r in labelled), dtype=float, count=len(labelled))
+            model = fit_logistic(prices, labels)
+            with self._lock:
+                e.model = model
+        except Exception:
+            log.exception("acceptance model fit failed")
+        finally:
+            with self._lock:
+                e.fitting = False
+
+    def wait_idle(self, timeout: Optional[float] = None) -> None:
+        """Block until queued fits have run (tests and scripts)."""
+        self._executor.submit(lambda: None).result(timeout)
+
+
+acceptance_models = AcceptanceModelCache()
@@ -0,0 +1,212 @@
+"""
+Append-only negotiation history (JSON Lines).
+
+Engines hand rows to `NegotiationLog.append()`, which only enqueues; one
+writer thread per log batches them (NEGOTIATION_LOG_BATCH rows or
+NEGOTIATION_LOG_FLUSH_SECONDS, whichever comes first) into a single write,
+so a chat turn never waits on disk and never rewrites old turns. A failed
+write is logged and retried with backoff (1s doubling to 60s) until it lands;
+rows queued meanwhile wait behind it. Rows that can't be serialized are
+logged and skipped.
+
+Files, for a log named `<name>` in the data directory:
+    <name>.jsonl                  live file, appended to
+    <name>.<YYYYmmddHHMMSS>-<n>.jsonl  rotated segments (live file > NEGOTIATION_LOG_MAX_BYTES)
+    <name>.archive.jsonl.gz       older segments compacted together (beyond NEGOTIATION_LOG_KEEP_SEGMENTS)
+    <name>.json                   legacy whole-file JSON list; read, never written
+
+Writes and rotation happen under an exclusive file lock (POSIX), so several
+worker processes can share one log. Readers skip a torn last line.
+"""
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from ...config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process only
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+_RETRY_MIN_S = 1.0
+_RETRY_MAX_S = 60.0
+
+DATA_DIR = settings.NEGOTIATION_DATA_DIR or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
+
+
+class NegotiationLog:
+    def __init__(self, name: str, data_dir: str = DATA_DIR):
+        self.name = name
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, f"{name}.jsonl")
+        self.legacy_path = os.path.join(data_dir, f"{name}.json")
+        self.archive_path = os.path.join(data_dir, f"{name}.archive.jsonl.gz")
+        self.lock_path = os.path.join(data_dir, f".{name}.lock")
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._pending = 0
+
+    # ---------- writing ----------
+    def append(self, row: Dict[str, Any]) -> None:
+        """Queue a row for the writer thread (never blocks on disk)."""
+        self._ensure_writer()
+        with self._idle:
+            self._pending += 1
+        self._queue.put(row)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued row is on disk. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._start_lock:
+            if self._writer is None:
+                os.makedirs(self.data_dir, exist_ok=True)
+                self._writer = threading.Thread(target=self._run, name=f"negotiation-log-{self.name}", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush, 5.0)
+
+    def _run(self) -> None:
+        max_batch = max(1, settings.NEGOTIATION_LOG_BATCH)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + settings.NEGOTIATION_LOG_FLUSH_SECONDS
+            while len(batch) < max_batch:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=wait))
+                except queue.Empty:
+                    break
+            data = self._encode(batch)
+            n_rows = data.count("\n")
+            delay = _RETRY_MIN_S
+            while data:
+                try:
+                    self._write(data)
+                    break
+                except Exception:
+                    log.exception("negotiation log %s: writing %d rows failed; retrying in %.1fs",
+                                  self.name, n_rows, delay)
+                    time.sleep(delay)
+                    delay = min(delay * 2, _RETRY_MAX_S)
+                    # A failed write may have left a partial line; start the retry on a fresh one
+                    data = data if data.startswith("\n") else "\n" + data
+            with self._idle:
+                self._pending -= len(batch)
+                if self._pending == 0:
+                    self._idle.notify_all()
+
+    def _encode(self, rows: List[Dict[str, Any]]) -> str:
+        lines = []
+        for r in rows:
+            try:
+                lines.append(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n")
+            except (TypeError, ValueError):
+                log.exception("negotiation log %s: dropping a row that can't be serialized", self.name)
+        return "".join(lines)
+
+    def _write(self, data: str) -> None:
+        with open(self.lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(data)
+                    size = f.tell()
+                if size > settings.NEGOTIATION_LOG_MAX_BYTES:
+                    self._rotate()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _segments(self) -> List[str]:
+        pattern = os.path.join(self.data_dir, f"{glob.escape(self.name)}.[0-9]*.jsonl")
+        return sorted(glob.glob(pattern))
+
+    def _rotate(self) -> None:
+        # Caller holds the file lock
+        stamp = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+        # Zero-padded counter after the newest segment keeps names in rotation order
+        # within the same second (compacted names must not be reused)
+        n = 0
+        last = self._segments()[-1:]
+        if last and os.path.basename(last[0]).startswith(f"{self.name}.{stamp}-"):
+            n = int(os.path.basename(last[0])[:-len(".jsonl")].rsplit("-", 1)[1]) + 1
+        target = os.path.join(self.data_dir, f"{self.name}.{stamp}-{n:04d}.jsonl")
+        os.replace(self.path, target)
+        segments = self._segments()
+        keep = max(0, settings.NEGOTIATION_LOG_KEEP_SEGMENTS)
+        old = segments[:len(segments) - keep] if len(segments) > keep else []
+        if old:
+            self._compact(old)
+
+    def _compact(self, segments: List[str]) -> None:
+        """Fold rotated segments into the gzip archive (appending a gzip member per segment)."""
+        with open(self.archive_path, "ab") as raw:
+            for seg in segments:
+                with open(seg, "rb") as src, gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+                    shutil.copyfileobj(src, gz)
+                os.remove(seg)
+
+    # ---------- reading ----------
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """Every row, oldest first: legacy JSON, archive, rotated segments, live file."""
+        if os.path.exists(self.legacy_path):
+            try:
+                with open(self.legacy_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, list):
+                    yield from (r for r in data if isinstance(r, dict))
+            except Exception:
+                pass
+        if os.path.exists(self.archive_path):
+            yield from self._iter_lines(gzip.open(self.archive_path, "rt", encoding="utf-8"))
+        for seg in self._segments():
+            yield from self._iter_lines(open(seg, "r", encoding="utf-8"))
+        if os.path.exists(self.path):
+            yield from self._iter_lines(open(self.path, "r", encoding="utf-8"))
+
+    @staticmethod
+    def _iter_lines(f) -> Iterator[Dict[str, Any]]:
+        with f:
+            try:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue  # torn write from a crash
+                    if isinstance(row, dict):
+                        yield row
+            except (OSError, EOFError):
+                return  # truncated archive member
+
+
+_logs: Dict[str, NegotiationLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_log(name: str) -> NegotiationLog:
+    """The process-wide log for `name` (one writer thread per log)."""
+    with _logs_lock:
+        log = _logs.get(name)
+        if log is None:
+            log = _logs[name] = NegotiationLog(name)
+        return log
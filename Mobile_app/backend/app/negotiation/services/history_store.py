@@ -0,0 +1,87 @@
+"""
+Process-wide negotiation history, loaded once and shared by every session.
+
+Engines used to parse the whole history file in __init__ and keep a private
+copy each. Now there is one store per log. It is read lazily on first use and
+indexed by product_id and by service type, and engines query it by reference:
+memory is O(history), and starting a session does no I/O.
+
+Lists returned by the store are live and shared: treat them as read-only.
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+from .history_log import NegotiationLog, get_log
+
+_EMPTY: List[Dict[str, Any]] = []
+
+
+def _service_type(row: Dict[str, Any]) -> Optional[str]:
+    ctx = row.get("service_context")
+    if isinstance(ctx, dict):
+        return ctx.get("service_type")
+    return None
+
+
+class HistoryStore:
+    def __init__(self, log: NegotiationLog):
+        self.log = log
+        self._rows: List[Dict[str, Any]] = []
+        self._by_product: Dict[Any, List[Dict[str, Any]]] = {}
+        self._by_service: Dict[str, List[Dict[str, Any]]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _index(self, row: Dict[str, Any]) -> None:
+        self._rows.append(row)
+        pid = row.get("product_id")
+        if pid is not None:
+            self._by_product.setdefault(pid, []).append(row)
+        st = _service_type(row)
+        if st:
+            self._by_service.setdefault(st, []).append(row)
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                for row in self.log.iter_rows():
+                    self._index(row)
+                self._loaded = True
+
+    def append(self, row: Dict[str, Any]) -> None:
+        """Index the row for every session and hand it to the append-only log."""
+        self._ensure_loaded()
+        with self._lock:
+            self._index(row)
+        self.log.append(row)
+
+    def for_product(self, product_id: Any) -> List[Dict[str, Any]]:
+        self._ensure_loaded()
+        return self._by_product.get(product_id, _EMPTY)
+
+    def for_service(self, service_type: str) -> List[Dict[str, Any]]:
+        self._ensure_loaded()
+        return self._by_service.get(service_type, _EMPTY)
+
+    def all(self) -> List[Dict[str, Any]]:
+        self._ensure_loaded()
+        return self._rows
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._rows)
+
+
+_stores: Dict[str, HistoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(name: str) -> HistoryStore:
+    """The shared store over the log `name` (see history_log.get_log)."""
+    with _stores_lock:
+        store = _stores.get(name)
+        if store is None:
+            store = _stores[name] = HistoryStore(get_log(name))
+        return store
@@ -6,6 +6,11 @@ from dataclasses import dataclass, field
 
 from ..models.provider_model import ProviderConfig
 from ..training.intelligent_negotiation_model import IntelligentNegotiationModel, NegotiationContext
+from .history_store import get_store
+from .history_log import DATA_DIR
+from .message_analysis import analyze
+
+HISTORY_LOG = "intelligent_negotiation_history"
 
 @dataclass
 class IntelligentTurn:
@@ -51,53 +56,24 @@ class IntelligentNegotiationEngine:
         self.conversation_history = []
         # Track consecutive offers below minimum price for handoff
         self.low_offer_strikes = 0
+        # Serialized turns, built once per turn
+        self._turn_dicts: List[Dict[str, Any]] = []
+        # Picks reply templates; the engine's own so nothing else can seed it
+        self.rng = random.Random()
         
-        # Data persistence
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-        self.data_file = os.path.join(base_dir, 'data', 'intelligent_negotiation_history.json')
-        self._history = self._load_history()
-    
-    def _load_history(self) -> List[Dict[str, Any]]:
-        """Load negotiation history for learning"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    return data if isinstance(data, list) else []
-            except Exception:
-                pass
-        return []
+        # Data persistence: shared history store over an append-only JSONL log
+        # (the legacy .json file is only read, once per process)
+        self._store = get_store(HISTORY_LOG)
     
     def _append_history(self, row: Dict[str, Any]) -> None:
         """Append negotiation data to history"""
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        self._history.append(row)
-        with open(self.data_file, "w", encoding="utf-8") as f:
-            json.dump(self._history, f, indent=2, ensure_ascii=False)
+        # Tag with the product so the shared store can index it like the basic engine's rows
+        row.setdefault("product_id", self.provider.product_id if self.provider else None)
+        self._store.append(row)
     
     def _extract_price_from_message(self, message: str) -> Optional[float]:
         """Extract price from user message"""
-        import re
-        
-        # Look for price patterns
-        patterns = [
-            r'₹\s*(\d+(?:,\d+)*(?:\.\d+)?)',  # ₹500, ₹1,000
-            r'(\d+(?:,\d+)*(?:\.\d+)?)\s*(?:rupees?|rs\.?|inr)',  # 500 rupees, 1000 rs
-            r'(\d+(?:,\d+)*(?:\.\d+)?)\s*(?:only|max|maximum)',  # 500 only, 1000 max
-            r'(?:offer|pay|budget)\s*(?:is|of)?\s*₹?\s*(\d+(?:,\d+)*(?:\.\d+)?)',  # offer 500, budget 1000
-            r'(\d+(?:,\d+)*(?:\.\d+)?)\s*(?:bucks|dollars)?'  # 500 bucks (fallback)
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                price_str = match.group(1).replace(',', '')
-                try:
-                    return float(price_str)
-                except ValueError:
-                    continue
-        
-        return None
+        return analyze(message).price
     
     def _generate_contextual_response(self, context: NegotiationContext, strategy: Dict[str, Any], user_offer: Optional[float]) -> str:
         """Generate contextually appropriate response"""
@@ -161,7 +137,7 @@ class IntelligentNegotiationEngine:
         complexity = context.complexity if context.complexity in ["simple", "medium", "complex"] else "medium"
         
         responses = service_responses[service_type][complexity]
-        base_response = random.choice(responses)
+        base_response = self.rng.choice(responses)
         
         # Add strategy-specific additions
         if strategy['strategy'] == 'aggressive' and user_offer and user_offer < context.min_price:
@@ -185,7 +161,7 @@ class IntelligentNegotiationEngine:
                 "reply": f"Negotiation already {self.state.status}.",
                 "status": self.state.status,
                 "final_price": self.state.final_price,
-                "history": [self._turn_to_dict(t) for t in self.state.history],
+                "history": self.history_since(),
             }
         
         # Extract user offer from message
@@ -204,6 +180,10 @@ class IntelligentNegotiationEngine:
         if self.use_ai:
             try:
                 context = self.ai_model.predict_service_context(user_message, self.conversation_history)
+                if self.provider:
+                    # Price the provider's actual listing, not the model's typical job
+                    context.base_price = self.provider.list_price
+                    context.min_price = self.provider.min_price
                 strategy = self.ai_model.suggest_negotiation_strategy(context)
                 
                 # Update state with AI insights
@@ -277,7 +257,7 @@ class IntelligentNegotiationEngine:
                 "reply": bot_msg,
                 "status": self.state.status,
                 "final_price": None,
-                "history": [self._turn_to_dict(t) for t in self.state.history],
+                "history": self.history_since(),
                 "ai_insights": {
                     "service_type": context.service_type if context else "unknown",
                     "complexity": context.complexity if context else "unknown",
@@ -306,7 +286,7 @@ class IntelligentNegotiationEngine:
                 "reply": bot_msg,
                 "status": self.state.status,
                 "final_price": None,
-                "history": [self._turn_to_dict(t) for t in self.state.history],
+                "history": self.history_since(),
             }
         
         # 1b. Track persistent low-balling and suggest provider handoff after 3-4 tries
@@ -340,7 +320,7 @@ class IntelligentNegotiationEngine:
                 "reply": handoff_msg,
                 "status": self.state.status,
                 "final_price": None,
-                "history": [self._turn_to_dict(t) for t in self.state.history],
+                "history": self.history_since(),
             }
         
         # 2. Accept good offers
@@ -367,7 +347,7 @@ class IntelligentNegotiationEngine:
                 "reply": bot_msg,
                 "status": self.state.status,
                 "final_price": final_price,
-                "history": [self._turn_to_dict(t) for t in self.state.history],
+                "history": self.history_since(),
             }
         
         # 3. Counter-offer using AI strategy
@@ -409,7 +389,7 @@ class IntelligentNegotiationEngine:
             "reply": bot_msg,
             "status": self.state.status,
             "final_price": None,
-            "history": [self._turn_to_dict(t) for t in self.state.history],
+            "history": self.history_since(),
             "ai_insights": {
                 "service_type": context.service_type if context else "unknown",
                 "complexity": context.complexity if context else "unknown",
@@ -430,6 +410,13 @@ class IntelligentNegotiationEngine:
             "strategy_used": turn.strategy_used
         }
     
+    def history_since(self, since: int = 0) -> List[Dict[str, Any]]:
+        """Serialized turns from index `since` on; only new turns are converted"""
+        cache = self._turn_dicts
+        for t in self.state.history[len(cache):]:
+            cache.append(self._turn_to_dict(t))
+        return cache[max(0, since):]
+    
     def dump_state(self) -> Dict[str, Any]:
         """Return current negotiation state"""
         return {
@@ -439,10 +426,45 @@ class IntelligentNegotiationEngine:
             "rounds": self.state.rounds,
             "current_strategy": self.state.current_strategy,
             "service_context": self.state.service_context.__dict__ if self.state.service_context else None,
-            "history": [self._turn_to_dict(t) for t in self.state.history],
+            "history": self.history_since(),
             "ai_enabled": self.use_ai
         }
 
+    # ---------- session persistence ----------
+    def to_state(self) -> Dict[str, Any]:
+        """Compact, JSON-serializable snapshot of everything a turn can change"""
+        return {
+            "provider": self.provider.dict() if self.provider else None,
+            "status": self.state.status,
+            "final_price": self.state.final_price,
+            "rounds": self.state.rounds,
+            "history": [[t.user_message, t.user_offer, t.bot_message, t.bot_offer, t.accepted,
+                         t.service_context, t.strategy_used] for t in self.state.history],
+            "service_context": self.state.service_context.__dict__ if self.state.service_context else None,
+            "strategy": self.state.current_strategy,
+            "bot_offer": self.current_bot_offer,
+            "conversation": self.conversation_history,
+            "strikes": self.low_offer_strikes,
+        }
+
+    @classmethod
+    def from_state(cls, data: Dict[str, Any]) -> "IntelligentNegotiationEngine":
+        """Rebuild an engine from to_state() output"""
+        eng = cls(ProviderConfig(**data["provider"]) if data["provider"] else None)
+        ctx = data["service_context"]
+        eng.state = IntelligentNegotiationState(
+            status=data["status"],
+            final_price=data["final_price"],
+            history=[IntelligentTurn(*t) for t in data["history"]],
+            rounds=data["rounds"],
+            service_context=NegotiationContext(**ctx) if ctx else None,
+            current_strategy=data["strategy"],
+        )
+        eng.current_bot_offer = data["bot_offer"]
+        eng.conversation_history = data["conversation"]
+        eng.low_offer_strikes = data["strikes"]
+        return eng
+
 # Service class for dependency injection
 class IntelligentNegotiationService:
     """Service wrapper for the intelligent negotiation engine"""
@@ -458,8 +480,7 @@ class IntelligentNegotiationService:
         model = IntelligentNegotiationModel()
         
         if dataset_path is None:
-            base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-            dataset_path = os.path.join(base_dir, 'data', 'comprehensive_negotiation_dataset.json')
+            dataset_path = os.path.join(DATA_DIR, 'comprehensive_negotiation_dataset.json')
         
         if not os.path.exists(dataset_path):
             raise FileNotFoundError(f"Dataset not found at {dataset_path}. Please generate it first.")
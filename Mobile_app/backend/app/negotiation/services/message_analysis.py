@@ -0,0 +1,174 @@
+"""
+One-pass understanding of a buyer's negotiation message, shared by both engines.
+
+Every keyword set the engines and the intelligent model check (service types,
+complexity, urgency, budget and quality words, scope-reduction phrases) is
+compiled once into a single Aho-Corasick automaton. One scan of the lowercased
+message finds every keyword as a substring, which is exactly the semantics of
+the old `keyword in message` checks, overlaps included ("wash" and "washing").
+Price patterns are compiled once at import.
+
+analyze() is cached and its fields are computed on first use, so the engine,
+the model and the strategy can each ask about the same message within a turn,
+and a caller that only needs the price never pays for the keyword scan.
+"""
+import re
+from collections import deque
+from functools import cached_property, lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from .utils import extract_price
+
+# Checked in this order; the first service with a hit wins (default: plumbing)
+SERVICE_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    'plumbing': ('tap', 'pipe', 'leak', 'toilet', 'drain', 'plumb'),
+    'electrical': ('switch', 'socket', 'outlet', 'wiring', 'breaker', 'electric', 'fan', 'light'),
+    'cleaning': ('clean', 'cleanup', 'dust', 'carpet', 'wash'),
+    'hvac': ('ac', 'hvac', 'cooling', 'refrigerant', 'compressor', 'air'),
+    'appliance': ('fridge', 'refrigerator', 'washing', 'washer', 'dishwasher', 'microwave', 'appliance'),
+}
+DEFAULT_SERVICE = 'plumbing'
+COMPLEX_WORDS = ('major', 'complete', 'complex', 'renovation', 'installation', 'upgrade')
+SIMPLE_WORDS = ('simple', 'basic', 'minor', 'small', 'quick', 'easy')
+URGENCY_WORDS = ('urgent', 'emergency', 'asap', 'immediately', 'quick')
+STRATEGY_URGENCY_WORDS = ('urgent', 'asap', 'immediately')  # what makes the strategy conservative
+BUDGET_WORDS = ('budget', '₹', 'rs', 'inr', 'price', 'cost')
+QUALITY_WORDS = ('quality', 'professional', 'experienced', 'certified')
+SCOPE_KEYWORDS = ('less work', 'smaller job', 'basic', 'partial', 'only', 'exclude', 'without',
+                  'i will provide materials', 'short visit')
+
+# Tried in order; the first pattern that matches anywhere gives the price
+_PRICE_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'₹\s*(\d+(?:,\d+)*(?:\.\d+)?)',  # ₹500, ₹1,000
+    r'(\d+(?:,\d+)*(?:\.\d+)?)\s*(?:rupees?|rs\.?|inr)',  # 500 rupees, 1000 rs
+    r'(\d+(?:,\d+)*(?:\.\d+)?)\s*(?:only|max|maximum)',  # 500 only, 1000 max
+    r'(?:offer|pay|budget)\s*(?:is|of)?\s*₹?\s*(\d+(?:,\d+)*(?:\.\d+)?)',  # offer 500, budget 1000
+    r'(\d+(?:,\d+)*(?:\.\d+)?)\s*(?:bucks|dollars)?',  # 500 bucks (fallback)
+)]
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton, flattened to a DFA: one dict lookup per character."""
+
+    def __init__(self, keywords: Iterable[str]):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[FrozenSet[str]] = [frozenset()]
+        for kw in set(keywords):
+            s = 0
+            for ch in kw:
+                nxt = goto[s].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[s][ch] = nxt
+                    goto.append({})
+                    out.append(frozenset())
+                s = nxt
+            out[s] = out[s] | {kw}
+
+        # BFS: each state's transitions = its fail state's, overridden by its own
+        delta: List[Dict[str, int]] = [dict() for _ in goto]
+        delta[0] = dict(goto[0])
+        queue = deque()
+        for s in goto[0].values():
+            queue.append((s, 0))
+        while queue:
+            s, fail = queue.popleft()
+            out[s] = out[s] | out[fail]
+            delta[s] = {**delta[fail], **goto[s]}
+            for ch, t in goto[s].items():
+                queue.append((t, delta[fail].get(ch, 0)))
+        self._delta = delta
+        self._out = out
+
+    def find(self, text: str) -> FrozenSet[str]:
+        """Every keyword occurring in text (case-sensitive; lowercase first)."""
+        delta, out = self._delta, self._out
+        s = 0
+        found = set()
+        for ch in text:
+            s = delta[s].get(ch, 0)
+            if out[s]:
+                found |= out[s]
+        return frozenset(found)
+
+
+_MATCHER = KeywordMatcher(
+    [k for kws in SERVICE_KEYWORDS.values() for k in kws]
+    + list(COMPLEX_WORDS + SIMPLE_WORDS + URGENCY_WORDS + BUDGET_WORDS + QUALITY_WORDS + SCOPE_KEYWORDS)
+)
+
+
+def _ranked_price(message: str) -> Optional[float]:
+    for pat in _PRICE_PATTERNS:
+        match = pat.search(message)
+        if match:
+            try:
+                return float(match.group(1).replace(',', ''))
+            except ValueError:
+                continue
+    return None
+
+
+class MessageAnalysis:
+    """Everything the engines read from one message. Fields are computed on first use, then kept."""
+
+    def __init__(self, message: str):
+        self.message = message or ''
+
+    @cached_property
+    def keywords(self) -> FrozenSet[str]:
+        return _MATCHER.find(self.message.lower())
+
+    @cached_property
+    def price(self) -> Optional[float]:
+        """Ranked price patterns (intelligent engine)."""
+        return _ranked_price(self.message)
+
+    @cached_property
+    def first_amount(self) -> Optional[float]:
+        """First number in the text (basic engine)."""
+        return extract_price(self.message)
+
+    @cached_property
+    def service_type(self) -> str:
+        found = self.keywords
+        return next((svc for svc, kws in SERVICE_KEYWORDS.items() if any(k in found for k in kws)),
+                    DEFAULT_SERVICE)
+
+    @cached_property
+    def complexity(self) -> str:
+        found = self.keywords
+        if any(w in found for w in COMPLEX_WORDS):
+            return 'complex'
+        if any(w in found for w in SIMPLE_WORDS):
+            return 'simple'
+        return 'medium'
+
+    @property
+    def urgency(self) -> int:
+        return _count(self.keywords, URGENCY_WORDS)
+
+    @property
+    def strategy_urgency(self) -> int:
+        return _count(self.keywords, STRATEGY_URGENCY_WORDS)
+
+    @property
+    def has_budget(self) -> bool:
+        return any(w in self.keywords for w in BUDGET_WORDS)
+
+    @property
+    def quality(self) -> int:
+        return _count(self.keywords, QUALITY_WORDS)
+
+    @property
+    def scope_reduction(self) -> bool:
+        return any(w in self.keywords for w in SCOPE_KEYWORDS)
+
+
+def _count(found: FrozenSet[str], words: Tuple[str, ...]) -> int:
+    return sum(1 for w in words if w in found)
+
+
+@lru_cache(maxsize=4096)
+def analyze(message: str) -> MessageAnalysis:
+    return MessageAnalysis(message)
@@ -1,14 +1,18 @@
-import json
-import os
-import math
 import random
 from dataclasses import dataclass, field
 from typing import Optional, List, Dict, Any
 
+import numpy as np
+
+from ...config import settings
 from ..models.provider_model import ProviderConfig
-from .utils import clamp, extract_price, moving_towards, expected_revenue_grid
+from .utils import clamp, moving_towards, expected_revenue_grid, logistic_revenue_optimum
+from .message_analysis import analyze
+from .history_store import get_store
+from .acceptance_model import acceptance_models
 
-DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "negotiation_history.json")
+# data/negotiation_history.jsonl (+ rotated segments); the legacy .json is read-only
+HISTORY_LOG = "negotiation_history"
 
 @dataclass
 class Turn:
@@ -35,7 +39,8 @@ class NegotiationEngine:
     def __init__(self, provider: ProviderConfig):
         self.provider = provider
         self.state = NegotiationState()
-        self._history = self._load_history()  # list of dict rows
+        # Shared, loaded-once history (indexed by product); never copied per session
+        self._store = get_store(HISTORY_LOG)
 
         # Starting bot offer: the list price
         self.current_bot_offer = float(provider.list_price)
@@ -44,96 +49,56 @@ class NegotiationEngine:
         self.base_min = float(provider.min_price)
         self.floor = float(provider.min_price)  # may adjust if user asks for reduced scope
         self.low_offer_strikes = 0  # consecutive offers below our floor
+        # Serialized turns, built once per turn (turns never change after their step returns)
+        self._turn_dicts: List[Dict[str, Any]] = []
 
         # Cold-start parameters (will adapt via experience)
         self.alpha_buyer = 0.30  # how quickly buyer moves toward budget (simulated)
         self.beta_seller = 0.30  # how quickly bot moves toward min_price
 
-        # Exploration rate when optimizing price
+        # Exploration rate when optimizing price, and the engine's own RNG for it
+        # (never the process-global one, which other code may seed)
         self.explore_eps = 0.10
+        self.rng = random.Random()
 
     # ---------- persistence ----------
-    def _load_history(self) -> List[Dict[str, Any]]:
-        if os.path.exists(DATA_FILE):
-            try:
-                with open(DATA_FILE, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        return data
-            except Exception:
-                pass
-        return []
-
     def _append_history(self, row: Dict[str, Any]) -> None:
-        # Create file folder if missing
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-        self._history.append(row)
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(self._history, f, indent=2)
+        # Visible to every session at once; written to disk by a background writer
+        self._store.append(row)
 
     # ---------- acceptance modeling ----------
     def _fit_acceptance(self) -> Optional[Dict[str, float]]:
         """
-        Fit a simple logistic curve: P(accept | price) = 1 / (1 + exp(-(a + b*price)))
-        using past terminal turns for this product.
-        Returns dict with 'a','b' if enough data; else None.
+        Logistic curve P(accept | price) = 1 / (1 + exp(-(a + b*price))) for this
+        product, from the shared per-product cache (fitted in the background on
+        past terminal turns). Returns dict with 'a','b' if a model exists; else None.
         """
-        # Filter relevant rows (same product, with bot_offer & accepted label)
-        rows = [r for r in self._history
-                if r.get("product_id") == self.provider.product_id
-                and r.get("bot_offer") is not None
-                and r.get("accepted") is not None]
-
-        if len(rows) < 12:  # need some data
+        model = acceptance_models.get(self._store, self.provider.product_id)
+        if model is None:
             return None
-
-        # Build X (price) and y (accepted 0/1)
-        prices = [float(r["bot_offer"]) for r in rows]
-        labels = [1 if r["accepted"] else 0 for r in rows]
-
-        # Normalize price to [0,1] to stabilize a,b fitting
-        lo, hi = self.provider.min_price, self.provider.list_price
-        span = max(1e-6, hi - lo)
-        z = [(p - lo) / span for p in prices]
-
-        # Simple closed-form-ish gradient steps for logistic regression with 1 feature + bias
-        a, b = 0.0, 0.0
-        lr = 0.5
-        for _ in range(400):
-            da = 0.0
-            db = 0.0
-            for zi, yi in zip(z, labels):
-                pred = 1.0 / (1.0 + math.exp(-(a + b * zi)))
-                da += (pred - yi)
-                db += (pred - yi) * zi
-            a -= lr * da / len(z)
-            b -= lr * db / len(z)
-
-        return {"a": a, "b": b, "lo": lo, "hi": hi}
+        return {"a": model.a, "b": model.b}
 
     def _accept_prob_fn(self):
         """
         Returns a function price->probability using fitted curve if available,
-        else a heuristic sigmoid around midpoint.
+        else a heuristic sigmoid around midpoint. Works on NumPy arrays of prices.
         """
         fitted = self._fit_acceptance()
         lo, hi = self.provider.min_price, self.provider.list_price
 
         if fitted:
             a, b = fitted["a"], fitted["b"]
-            span = max(1e-6, hi - lo)
-            def prob(p: float) -> float:
-                z = (p - lo) / span
-                return 1.0 / (1.0 + math.exp(-(a + b * z)))
+            def prob(p):
+                return 1.0 / (1.0 + np.exp(-np.clip(a + b * p, -35.0, 35.0)))
             return prob
 
         # Cold-start heuristic: acceptance rises near user's offer and near min→mid range
         mid = (lo + hi) / 2.0
-        def cold_prob(p: float) -> float:
+        def cold_prob(p):
             # higher prob near mid, taper near hi
             x = (p - lo) / max(1e-6, hi - lo)
             # bell-shaped around ~0.45–0.6
-            return max(0.01, min(0.99, 1.0 / (1.0 + math.exp(8.0 * (x - 0.55)))))
+            return np.clip(1.0 / (1.0 + np.exp(8.0 * (x - 0.55))), 0.01, 0.99)
         return cold_prob
 
     # ---------- policy ----------
@@ -141,15 +106,21 @@ class NegotiationEngine:
         lo, hi = self.floor, self.provider.list_price
 
         # With some probability, explore near user offer (if present)
-        if user_offer is not None and random.random() < self.explore_eps:
+        if user_offer is not None and self.rng.random() < self.explore_eps:
             # explore a small band above user's offer but not below min
             band_hi = clamp(user_offer + 0.15 * (hi - lo), lo, hi)
-            p = random.uniform(max(lo, user_offer), band_hi)
+            p = self.rng.uniform(max(lo, user_offer), band_hi)
             return round(p, 2)
 
-        # Otherwise, pick revenue-maximizing price under current acceptance model
-        prob_fn = self._accept_prob_fn()
-        p_opt = expected_revenue_grid(lo, hi, prob_fn, steps=40)
+        # Otherwise, pick revenue-maximizing price under current acceptance model,
+        # to the nearest NEGOTIATION_PRICE_STEP: closed form for a fitted logistic curve,
+        # a vectorized grid search for the cold-start heuristic
+        step = settings.NEGOTIATION_PRICE_STEP
+        fitted = self._fit_acceptance()
+        if fitted:
+            p_opt = logistic_revenue_optimum(lo, hi, fitted["a"], fitted["b"], step)
+        else:
+            p_opt = expected_revenue_grid(lo, hi, self._accept_prob_fn(), step)
 
         # slight smoothing towards current_bot_offer to avoid big jumps
         smooth = 0.5 * self.current_bot_offer + 0.5 * p_opt
@@ -166,11 +137,12 @@ class NegotiationEngine:
                 "reply": f"Negotiation already {self.state.status}.",
                 "status": self.state.status,
                 "final_price": self.state.final_price,
-                "history": [t.__dict__ for t in self.state.history],
+                "history": self.history_since(),
             }
 
         lo, hi = self.floor, self.provider.list_price
-        user_offer = extract_price(user_message)
+        analysis = analyze(user_message)
+        user_offer = analysis.first_amount
 
         # If user didn't give a number, nudge our offer towards mid/min depending on message count
         if user_offer is None:
@@ -193,14 +165,12 @@ class NegotiationEngine:
                 "reply": bot_msg,
                 "status": self.state.status,
                 "final_price": None,
-                "history": [t.__dict__ for t in self.state.history],
+                "history": self.history_since(),
             }
 
         # Decision logic with hard constraints
         # 1) Detect scope reduction intent and allow limited discount floor
-        text_lower = user_message.lower()
-        scope_keywords = ["less work", "smaller job", "basic", "partial", "only", "exclude", "without", "i will provide materials", "short visit"]
-        if any(k in text_lower for k in scope_keywords):
+        if analysis.scope_reduction:
             # Allow floor down to 80% of base_min when scope is reduced
             self.floor = round(max(0.8 * self.base_min, self.base_min - 0.2 * (self.provider.list_price - self.base_min)), 2)
         else:
@@ -234,7 +204,7 @@ class NegotiationEngine:
                 "reply": bot_msg,
                 "status": self.state.status,
                 "final_price": None,
-                "history": [t.__dict__ for t in self.state.history],
+                "history": self.history_since(),
             }
 
         # 3) If user offer is outrageously low (below 70% of current floor), gracefully end
@@ -256,7 +226,7 @@ class NegotiationEngine:
                 "reply": bot_msg,
                 "status": self.state.status,
                 "final_price": None,
-                "history": [t.__dict__ for t in self.state.history],
+                "history": self.history_since(),
             }
 
         # 4) If user meets or exceeds our current offer, accept at user's price (never below floor)
@@ -280,7 +250,7 @@ class NegotiationEngine:
                 "reply": bot_msg,
                 "status": self.state.status,
                 "final_price": final_price,
-                "history": [t.__dict__ for t in self.state.history],
+                "history": self.history_since(),
             }
 
         # 5) Counter-offer using learned acceptance curve (dynamic)
@@ -319,18 +289,54 @@ class NegotiationEngine:
             "reply": bot_msg,
             "status": self.state.status,
             "final_price": None,
-            "history": [t.__dict__ for t in self.state.history],
+            "history": self.history_since(),
         }
 
+    def history_since(self, since: int = 0) -> List[Dict[str, Any]]:
+        """Serialized turns from index `since` on; only turns added since the last call are converted."""
+        cache = self._turn_dicts
+        for t in self.state.history[len(cache):]:
+            cache.append(dict(t.__dict__))
+        return cache[max(0, since):]
+
     def dump_state(self) -> dict:
         return {
             "provider": self.provider.dict(),
             "status": self.state.status,
             "final_price": self.state.final_price,
             "rounds": self.state.rounds,
-            "history": [t.__dict__ for t in self.state.history],
+            "history": self.history_since(),
         }
 
+    # ---------- session persistence ----------
+    def to_state(self) -> Dict[str, Any]:
+        """Compact, JSON-serializable snapshot of everything a turn can change."""
+        return {
+            "provider": self.provider.dict(),
+            "status": self.state.status,
+            "final_price": self.state.final_price,
+            "rounds": self.state.rounds,
+            "history": [[t.user_message, t.user_offer, t.bot_message, t.bot_offer, t.accepted]
+                        for t in self.state.history],
+            "bot_offer": self.current_bot_offer,
+            "floor": self.floor,
+            "strikes": self.low_offer_strikes,
+        }
+
+    @classmethod
+    def from_state(cls, data: Dict[str, Any]) -> "NegotiationEngine":
+        eng = cls(ProviderConfig(**data["provider"]))
+        eng.state = NegotiationState(
+            status=data["status"],
+            final_price=data["final_price"],
+            history=[Turn(*t) for t in data["history"]],
+            rounds=data["rounds"],
+        )
+        eng.current_bot_offer = data["bot_offer"]
+        eng.floor = data["floor"]
+        eng.low_offer_strikes = data["strikes"]
+        return eng
+
 class NegotiationService:
     """Service wrapper for the negotiation engine"""
     
@@ -0,0 +1,275 @@
+"""
+Negotiation session store: a bounded in-memory tier over a durable backend.
+
+In memory, live engines sit in an LRU (NEGOTIATION_SESSION_CACHE_SIZE entries)
+and are evicted NEGOTIATION_SESSION_TTL_SECONDS after their last use.
+
+The backend (NEGOTIATION_SESSION_BACKEND) holds each session as the compact
+JSON from engine.to_state(), saved after every turn, so sessions survive
+restarts and are shared by worker processes:
+    sqlite  a table in NEGOTIATION_SESSION_DB (default: the negotiation data dir)
+    memory  no durable tier (single process, lost on restart)
+
+Each saved session carries a version. A worker that has the engine cached
+reloads it when another worker has saved a newer turn. Turns go through
+play(): within a process they are serialized per session, and the save is a
+compare-and-set on the version the engine was loaded at, so when two workers
+play a turn on the same version the loser reloads and replays its turn
+instead of overwriting the other one.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from ...config import settings
+from .history_log import DATA_DIR
+
+log = logging.getLogger(__name__)
+
+E = TypeVar("E")
+R = TypeVar("R")
+
+_PURGE_EVERY_SECONDS = 60.0
+_PLAY_ATTEMPTS = 3
+_TURN_LOCK_STRIPES = 64
+
+
+class SessionConflict(RuntimeError):
+    """Another worker saved the session since it was loaded."""
+
+
+class MemoryBackend:
+    """No durability: get() never finds anything the LRU tier doesn't already hold."""
+
+    def version(self, key: str) -> Optional[int]:
+        return None
+
+    def load(self, key: str) -> Optional[Tuple[str, int]]:
+        return None
+
+    def save(self, key: str, data: str, ttl: float, expected: Optional[int] = None) -> Optional[int]:
+        return None
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def purge_expired(self) -> int:
+        return 0
+
+
+class SQLiteBackend:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS negotiation_sessions ("
+                " key TEXT PRIMARY KEY, data TEXT NOT NULL,"
+                " version INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_negotiation_sessions_expires ON negotiation_sessions (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread (sqlite3 connections aren't shareable)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def version(self, key: str) -> Optional[int]:
+        row = self._conn().execute(
+            "SELECT version FROM negotiation_sessions WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def load(self, key: str) -> Optional[Tuple[str, int]]:
+        row = self._conn().execute(
+            "SELECT data, version FROM negotiation_sessions WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save(self, key: str, data: str, ttl: float, expected: Optional[int] = None) -> Optional[int]:
+        """Store `data` and return its new version. With `expected`, only if the stored
+        version still is `expected` (else SessionConflict); without, unconditionally."""
+        with self._conn() as conn:
+            if expected is None:
+                row = conn.execute(
+                    "INSERT INTO negotiation_sessions (key, data, version, expires_at) VALUES (?, ?, 1, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET data = excluded.data, version = version + 1,"
+                    " expires_at = excluded.expires_at RETURNING version",
+                    (key, data, time.time() + ttl),
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "UPDATE negotiation_sessions SET data = ?, version = version + 1, expires_at = ?"
+                    " WHERE key = ? AND version = ? RETURNING version",
+                    (data, time.time() + ttl, key, expected),
+                ).fetchone()
+        if row is None:
+            raise SessionConflict(f"session {key} changed since version {expected}")
+        return row[0]
+
+    def delete(self, key: str) -> None:
+        with self._conn() as conn:
+            conn.execute("DELETE FROM negotiation_sessions WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM negotiation_sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+def _make_backend():
+    kind = settings.NEGOTIATION_SESSION_BACKEND.lower()
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(settings.NEGOTIATION_SESSION_DB or os.path.join(DATA_DIR, "negotiation_sessions.db"))
+    raise ValueError(f"Unknown NEGOTIATION_SESSION_BACKEND: {settings.NEGOTIATION_SESSION_BACKEND}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The process-wide durable backend (created on first use)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _make_backend()
+        return _backend
+
+
+class _Cached(Generic[E]):
+    __slots__ = ("engine", "version", "used_at")
+
+    def __init__(self, engine: E, version: Optional[int]):
+        self.engine = engine
+        self.version = version
+        self.used_at = time.monotonic()
+
+
+class SessionStore(Generic[E]):
+    """Sessions of one engine type, keyed by session_id (namespaced by `kind` in the backend)."""
+
+    def __init__(self, kind: str, from_state: Callable[[Dict[str, Any]], E]):
+        self.kind = kind
+        self._from_state = from_state
+        self._cache: "OrderedDict[str, _Cached[E]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._turn_locks: List[threading.Lock] = [threading.Lock() for _ in range(_TURN_LOCK_STRIPES)]
+        self._purged_at = 0.0
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.kind}:{session_id}"
+
+    def _evict(self, now: float) -> None:
+        # Caller holds the lock; the LRU front is always the least recently used
+        ttl = settings.NEGOTIATION_SESSION_TTL_SECONDS
+        while self._cache:
+            sid, entry = next(iter(self._cache.items()))
+            if len(self._cache) > settings.NEGOTIATION_SESSION_CACHE_SIZE or now - entry.used_at > ttl:
+                del self._cache[sid]
+            else:
+                break
+
+    def get(self, session_id: str) -> Optional[E]:
+        entry = self._current(session_id)
+        return entry.engine if entry is not None else None
+
+    def _current(self, session_id: str) -> Optional[_Cached[E]]:
+        backend = get_backend()
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._cache.get(session_id)
+        if entry is not None:
+            # Another worker may have played a turn since we cached it (memory backend: both None)
+            if backend.version(self._key(session_id)) == entry.version:
+                with self._lock:
+                    entry.used_at = now
+                    if session_id in self._cache:
+                        self._cache.move_to_end(session_id)
+                return entry
+        found = backend.load(self._key(session_id))
+        if found is None:
+            with self._lock:
+                self._cache.pop(session_id, None)
+            return None
+        data, version = found
+        return self._remember(session_id, self._from_state(json.loads(data)), version)
+
+    def put(self, session_id: str, engine: E) -> None:
+        """Cache a new session's engine and save it (replaces any session with that id)."""
+        backend = get_backend()
+        version = backend.save(self._key(session_id), self._dump(engine), settings.NEGOTIATION_SESSION_TTL_SECONDS)
+        self._remember(session_id, engine, version)
+        self._maybe_purge(backend)
+
+    def play(self, session_id: str, turn: Callable[[E], R]) -> Optional[R]:
+        """Run `turn` on the session's engine, save it and return turn's result (None: no such session).
+
+        If another worker saved the session in the meantime, the engine is reloaded
+        and `turn` replayed on it; SessionConflict after _PLAY_ATTEMPTS tries.
+        """
+        backend = get_backend()
+        with self._turn_locks[hash(session_id) % _TURN_LOCK_STRIPES]:
+            for _ in range(_PLAY_ATTEMPTS):
+                entry = self._current(session_id)
+                if entry is None:
+                    return None
+                out = turn(entry.engine)
+                try:
+                    version = backend.save(self._key(session_id), self._dump(entry.engine),
+                                           settings.NEGOTIATION_SESSION_TTL_SECONDS, expected=entry.version)
+                except SessionConflict:
+                    # The cached engine now holds an unsaved turn: drop it so the retry reloads
+                    with self._lock:
+                        if self._cache.get(session_id) is entry:
+                            del self._cache[session_id]
+                    continue
+                self._remember(session_id, entry.engine, version)
+                self._maybe_purge(backend)
+                return out
+        raise SessionConflict(f"session {session_id} kept changing; giving up after {_PLAY_ATTEMPTS} attempts")
+
+    @staticmethod
+    def _dump(engine: E) -> str:
+        return json.dumps(engine.to_state(), ensure_ascii=False, separators=(",", ":"))
+
+    def delete(self, session_id: str) -> None:
+        get_backend().delete(self._key(session_id))
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict(time.monotonic())
+            return len(self._cache)
+
+    def _remember(self, session_id: str, engine: E, version: Optional[int]) -> _Cached[E]:
+        entry = _Cached(engine, version)
+        with self._lock:
+            self._cache[session_id] = entry
+            self._cache.move_to_end(session_id)
+            self._evict(time.monotonic())
+        return entry
+
+    def _maybe_purge(self, backend) -> None:
+        now = time.monotonic()
+        if now - self._purged_at < _PURGE_EVERY_SECONDS:
+            return
+        self._purged_at = now
+        try:
+            backend.purge_expired()
+        except Exception:
+            log.exception("negotiation session purge failed")
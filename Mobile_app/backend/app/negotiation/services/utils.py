@@ -1,6 +1,9 @@
+import math
 import re
 from typing import Optional
 
+import numpy as np
+
 def clamp(v: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, v))
 
@@ -23,15 +26,53 @@ def moving_towards(current: float, target: float, rate: float) -> float:
     # one step towards target by 'rate' fraction
     return current + rate * (target - current)
 
-def expected_revenue_grid(min_price: float, list_price: float, accept_fn, steps: int = 40) -> float:
-    # Search price maximizing p * P_accept(p) without numpy
-    step_size = (list_price - min_price) / (steps - 1)
-    grid = [min_price + i * step_size for i in range(steps)]
-    
-    best_p, best_obj = min_price, -1.0
-    for p in grid:
-        pa = float(accept_fn(p))
-        obj = p * pa
-        if obj > best_obj:
-            best_obj, best_p = obj, p
-    return round(best_p, 2)
\ No newline at end of file
+# Grid points evaluated at most, whatever the step (keeps huge price ranges cheap)
+_MAX_GRID_POINTS = 100_000
+
+def price_grid(min_price: float, list_price: float, step: float) -> np.ndarray:
+    # min_price, min_price + step, ..., always ending on list_price
+    span = max(0.0, list_price - min_price)
+    step = max(step, span / _MAX_GRID_POINTS, 1e-9)
+    grid = min_price + step * np.arange(int(span // step) + 1)
+    if grid[-1] < list_price:
+        grid = np.append(grid, list_price)
+    return grid
+
+def expected_revenue_grid(min_price: float, list_price: float, accept_fn, step: float = 1.0) -> float:
+    # Price maximizing p * P_accept(p) on a `step`-spaced grid; accept_fn takes a NumPy array
+    grid = price_grid(min_price, list_price, step)
+    obj = grid * np.asarray(accept_fn(grid), dtype=float)
+    return round(float(grid[int(np.argmax(obj))]), 2)
+
+def logistic_revenue_optimum(min_price: float, list_price: float, a: float, b: float, step: float = 1.0) -> float:
+    """
+    argmax of p / (1 + exp(-(a + b*p))) on [min_price, list_price], snapped to the `step` grid.
+
+    For b < 0 the unconstrained optimum is p* = (1 + W(e^(a-1))) / -b (W = Lambert W).
+    With u = -b*p, it solves u - 1 = e^(a-u). Newton runs on v = log(u - 1), where
+    h(v) = v + 1 + e^v - a is convex and increasing, so starting right of the root it
+    converges monotonically and never overflows. Revenue is unimodal in p, so clamping
+    p* to the range is exact. If b >= 0, acceptance doesn't fall with price, so
+    list_price wins.
+    """
+    if list_price <= min_price or b >= 0:
+        return round(list_price, 2)
+    v = min(a - 1.0, math.log(max(a, 1.0)))  # h(v) > 0 here
+    for _ in range(60):
+        ev = math.exp(v)
+        nv = v - (v + 1.0 + ev - a) / (1.0 + ev)
+        if abs(nv - v) < 1e-12:
+            break
+        v = nv
+    u = 1.0 + math.exp(v)
+    p_star = clamp(u / -b, min_price, list_price)
+
+    # Snap to the grid: the better of the two neighbouring grid prices (or the range end)
+    if step <= 0:
+        return round(p_star, 2)
+    k = math.floor((p_star - min_price) / step)
+    candidates = {min_price + k * step, min(list_price, min_price + (k + 1) * step)}
+
+    def revenue(p: float) -> float:
+        return p / (1.0 + math.exp(-clamp(a + b * p, -35.0, 35.0)))
+    return round(max(candidates, key=revenue), 2)
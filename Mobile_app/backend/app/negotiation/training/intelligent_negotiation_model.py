@@ -1,6 +1,19 @@
+import json
+import logging
 import os
+import re
+import threading
+import zlib
 from dataclasses import dataclass
-from typing import Dict, List, Any, Optional
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from ...config import settings
+from ..services.message_analysis import analyze
+
+log = logging.getLogger(__name__)
 
 @dataclass
 class NegotiationContext:
@@ -12,68 +25,186 @@ class NegotiationContext:
     base_price: float
     min_price: float
 
+SERVICE_TYPES = ['plumbing', 'electrical', 'cleaning', 'hvac', 'appliance']
+COMPLEXITIES = ['simple', 'medium', 'complex']
+
+BASE_PRICES = {
+    ('plumbing', 'simple'): 300, ('plumbing', 'medium'): 800, ('plumbing', 'complex'): 2000,
+    ('electrical', 'simple'): 250, ('electrical', 'medium'): 600, ('electrical', 'complex'): 1500,
+    ('cleaning', 'simple'): 400, ('cleaning', 'medium'): 800, ('cleaning', 'complex'): 1500,
+    ('hvac', 'simple'): 350, ('hvac', 'medium'): 1200, ('hvac', 'complex'): 3000,
+    ('appliance', 'simple'): 300, ('appliance', 'medium'): 800, ('appliance', 'complex'): 1800,
+}
+MIN_PRICE_RATIO = 0.7
+
+# Trained model files (in model_dir); the meta file is written last and versions the set
+HASH_DIM = 1 << 16
+_META_FILE = 'model_meta.json'
+_SERVICE_FILE = 'service_type.npy'        # HASH_DIM x len(service_types), float32
+_COMPLEXITY_FILE = 'complexity.npy'       # HASH_DIM x len(complexities), float32
+_ACCEPTANCE_FILE = 'acceptance.npy'       # services x complexities x (a, b) on price/base_price; NaN = no curve
+
+_TOKEN_PAT = re.compile(r"[a-z]+")
+
+
+def hashed_features(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Signed feature hashing of unigrams, bigrams and a bias term -> (indices, signs)."""
+    words = _TOKEN_PAT.findall((text or '').lower())
+    grams = ['<bias>'] + words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    h = np.array([zlib.crc32(g.encode('utf-8')) for g in grams], dtype=np.int64)
+    return h & (HASH_DIM - 1), 1.0 - 2.0 * (h >> 31)
+
+
+class _Trained:
+    """Memory-mapped weights, shared by every model instance in the process."""
+
+    def __init__(self, model_dir: str, meta: Dict[str, Any]):
+        self.meta = meta
+        self.service_types: List[str] = meta['service_types']
+        self.complexities: List[str] = meta['complexities']
+        # Plain ndarray views of the maps: same pages, cheaper indexing than np.memmap
+        self.service_w = np.load(os.path.join(model_dir, _SERVICE_FILE), mmap_mode='r').view(np.ndarray)
+        self.complexity_w = np.load(os.path.join(model_dir, _COMPLEXITY_FILE), mmap_mode='r').view(np.ndarray)
+        self.acceptance = np.load(os.path.join(model_dir, _ACCEPTANCE_FILE), mmap_mode='r').view(np.ndarray)
+        if self.service_w.shape != (HASH_DIM, len(self.service_types)) or \
+                self.complexity_w.shape != (HASH_DIM, len(self.complexities)):
+            raise ValueError('trained model shape mismatch')
+
+    @staticmethod
+    def _argmax(weights: np.ndarray, idx: np.ndarray, signs: np.ndarray) -> int:
+        return int(np.argmax(signs @ weights[idx]))
+
+    def classify(self, text: str) -> Tuple[str, str]:
+        idx, signs = hashed_features(text)
+        return (self.service_types[self._argmax(self.service_w, idx, signs)],
+                self.complexities[self._argmax(self.complexity_w, idx, signs)])
+
+    def curve(self, service_type: str, complexity: str) -> Optional[Tuple[float, float]]:
+        try:
+            a, b = self.acceptance[self.service_types.index(service_type), self.complexities.index(complexity)]
+        except ValueError:
+            return None
+        if np.isnan(a):
+            return None
+        return float(a), float(b)
+
+
+_shared: Dict[str, Tuple[int, _Trained]] = {}
+_shared_lock = threading.Lock()
+
+
+def _load_shared(model_dir: str) -> Optional[_Trained]:
+    """The process-wide model for model_dir, reloaded when a retrain replaces the meta file."""
+    try:
+        version = os.stat(os.path.join(model_dir, _META_FILE)).st_mtime_ns
+    except OSError:
+        return None
+    cached = _shared.get(model_dir)
+    if cached and cached[0] == version:
+        return cached[1]
+    with _shared_lock:
+        cached = _shared.get(model_dir)
+        if cached and cached[0] == version:
+            return cached[1]
+        try:
+            with open(os.path.join(model_dir, _META_FILE), 'r', encoding='utf-8') as f:
+                trained = _Trained(model_dir, json.load(f))
+        except Exception:
+            log.exception("could not load trained negotiation model from %s", model_dir)
+            return None
+        _shared[model_dir] = (version, trained)
+        return trained
+
+
+def _save_npy(path: str, arr: np.ndarray) -> None:
+    # Write then rename: sessions holding the old mmap keep a valid file
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def _fit_softmax(rows: np.ndarray, cols: np.ndarray, vals: np.ndarray, labels: np.ndarray, n_classes: int,
+                 epochs: int = 300, lr: float = 0.5, l2: float = 1e-4) -> np.ndarray:
+    """Multinomial logistic regression on sparse hashed features (full-batch gradient descent)."""
+    n = len(labels)
+    Y = np.eye(n_classes)[labels]
+    used, inv = np.unique(cols, return_inverse=True)  # fit only the hash buckets that occur
+    Wc = np.zeros((len(used), n_classes))
+    for _ in range(epochs):
+        scores = np.zeros((n, n_classes))
+        np.add.at(scores, rows, Wc[inv] * vals[:, None])
+        scores -= scores.max(axis=1, keepdims=True)
+        P = np.exp(scores)
+        P /= P.sum(axis=1, keepdims=True)
+        G = np.zeros_like(Wc)
+        np.add.at(G, inv, (P - Y)[rows] * vals[:, None])
+        Wc -= lr * (G / n + l2 * Wc)
+    W = np.zeros((HASH_DIM, n_classes))
+    W[used] = Wc
+    return W.astype(np.float32)
+
+
+def _sparse(texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rows, cols, vals = [], [], []
+    for i, t in enumerate(texts):
+        idx, signs = hashed_features(t)
+        rows.append(np.full(len(idx), i, dtype=np.intp))
+        cols.append(idx)
+        vals.append(signs)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+
+
 class IntelligentNegotiationModel:
     """
-    Lightweight, dependency-free heuristic model for service context and strategy.
-    Designed to avoid heavy ML dependencies in the backend runtime. If trained
-    models are later added, extend load_models/predict methods to use them.
+    Service context and strategy for the intelligent engine.
+
+    Without trained files this is a dependency-free keyword heuristic. After
+    train_complete_model(), a hashed-feature linear classifier (service type and
+    complexity) and per-service price-acceptance curves are saved as .npy files
+    in models/trained. load_models() memory-maps them once per process, so every
+    session shares one copy.
     """
 
     def __init__(self):
         base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-        self.model_dir = os.path.join(base_dir, 'models', 'trained')
-        os.makedirs(self.model_dir, exist_ok=True)
+        self.model_dir = settings.NEGOTIATION_MODEL_DIR or os.path.join(base_dir, 'models', 'trained')
+        self._trained: Optional[_Trained] = None
 
     def load_models(self) -> bool:
-        """Return False to indicate no trained models available by default."""
-        # You can extend this to attempt loading pickled models if present.
-        return False
+        """True if trained models are present (and now attached to this instance)."""
+        self._trained = _load_shared(self.model_dir)
+        return self._trained is not None
 
     def extract_features_from_message(self, message: str, conversation_history: List[Dict[str, Any]] | None = None) -> Dict[str, Any]:
-        m = (message or '').lower()
+        a = analyze(message)
         features = {
-            'has_budget': any(w in m for w in ['budget', '₹', 'rs', 'inr', 'price', 'cost']),
-            'urgency': sum(1 for w in ['urgent', 'emergency', 'asap', 'immediately', 'quick'] if w in m),
-            'quality': sum(1 for w in ['quality', 'professional', 'experienced', 'certified'] if w in m),
+            'has_budget': a.has_budget,
+            'urgency': a.urgency,
+            'quality': a.quality,
         }
         features['conversation_length'] = len(conversation_history or [])
         return features
 
     def _infer_service_type(self, message: str) -> str:
-        m = (message or '').lower()
-        mapping = {
-            'plumbing': ['tap', 'pipe', 'leak', 'toilet', 'drain', 'plumb'],
-            'electrical': ['switch', 'socket', 'outlet', 'wiring', 'breaker', 'electric', 'fan', 'light'],
-            'cleaning': ['clean', 'cleanup', 'dust', 'carpet', 'wash'],
-            'hvac': ['ac', 'hvac', 'cooling', 'refrigerant', 'compressor', 'air'],
-            'appliance': ['fridge', 'refrigerator', 'washing', 'washer', 'dishwasher', 'microwave', 'appliance'],
-        }
-        for svc, keywords in mapping.items():
-            if any(k in m for k in keywords):
-                return svc
-        return 'plumbing'
+        return analyze(message).service_type
 
     def _infer_complexity(self, message: str) -> str:
-        m = (message or '').lower()
-        if any(w in m for w in ['major', 'complete', 'complex', 'renovation', 'installation', 'upgrade']):
-            return 'complex'
-        if any(w in m for w in ['simple', 'basic', 'minor', 'small', 'quick', 'easy']):
-            return 'simple'
-        return 'medium'
+        return analyze(message).complexity
 
     def predict_service_context(self, user_message: str, conversation_history: List[Dict[str, Any]] | None = None) -> NegotiationContext:
-        service_type = self._infer_service_type(user_message)
-        complexity = self._infer_complexity(user_message)
-
-        base_prices = {
-            ('plumbing', 'simple'): 300, ('plumbing', 'medium'): 800, ('plumbing', 'complex'): 2000,
-            ('electrical', 'simple'): 250, ('electrical', 'medium'): 600, ('electrical', 'complex'): 1500,
-            ('cleaning', 'simple'): 400, ('cleaning', 'medium'): 800, ('cleaning', 'complex'): 1500,
-            ('hvac', 'simple'): 350, ('hvac', 'medium'): 1200, ('hvac', 'complex'): 3000,
-            ('appliance', 'simple'): 300, ('appliance', 'medium'): 800, ('appliance', 'complex'): 1800,
-        }
-        base_price = base_prices.get((service_type, complexity), 500)
-        min_price = round(base_price * 0.7, 2)
+        if self._trained is not None:
+            # Classify the whole conversation so far; later turns are mostly prices
+            texts = [h.get('message') or '' for h in (conversation_history or []) if h.get('role') == 'consumer']
+            if not texts or texts[-1] != user_message:
+                texts.append(user_message)
+            service_type, complexity = self._trained.classify(' '.join(texts))
+        else:
+            service_type = self._infer_service_type(user_message)
+            complexity = self._infer_complexity(user_message)
+
+        base_price = BASE_PRICES.get((service_type, complexity), 500)
+        min_price = round(base_price * MIN_PRICE_RATIO, 2)
 
         return NegotiationContext(
             service_type=service_type,
@@ -87,7 +218,7 @@ class IntelligentNegotiationModel:
 
     def suggest_negotiation_strategy(self, context: NegotiationContext) -> Dict[str, Any]:
         # Simple heuristic strategy
-        urgency = sum(1 for w in ['urgent', 'asap', 'immediately'] if w in context.user_message.lower())
+        urgency = analyze(context.user_message).strategy_urgency
         if urgency >= 1:
             strategy = 'conservative'  # less discount if urgent
             discount = 0.05
@@ -98,12 +229,137 @@ class IntelligentNegotiationModel:
             strategy = 'moderate'
             discount = 0.10
         suggested = max(context.min_price, round(context.base_price * (1 - discount), 2))
+
+        # Learned acceptance curve: revenue-maximizing price between min and base
+        curve = self._trained.curve(context.service_type, context.complexity) if self._trained else None
+        if curve and context.base_price > 0:
+            from ..services.utils import logistic_revenue_optimum
+            a, b = curve
+            suggested = logistic_revenue_optimum(context.min_price, context.base_price, a, b / context.base_price,
+                                                 settings.NEGOTIATION_PRICE_STEP)
         return {'strategy': strategy, 'suggested_counter_offer': suggested}
 
+    # ---------- training ----------
     def train_complete_model(self, dataset_path: str) -> Dict[str, Any]:
-        # Placeholder: in a lightweight backend, training is not implemented
-        return {
-            'status': 'not_implemented',
-            'message': 'Training is disabled in lightweight backend. Provide pre-trained models to enable AI mode.',
+        """
+        Train from a ServiceDatasetGenerator dataset plus the logged intelligent
+        negotiation history, save the arrays to model_dir and load them.
+        """
+        from ..services.acceptance_model import fit_logistic
+        from ..services.history_store import get_store
+        from ..services.intelligent_negotiation_service import HISTORY_LOG
+
+        with open(dataset_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        conversations = data['conversations'] if isinstance(data, dict) else data
+
+        # Classification examples: the buyer's job description (first consumer turn)
+        texts: List[str] = []
+        svc_y: List[int] = []
+        cx_y: List[int] = []
+        # Acceptance examples per (service, complexity): (offer / base price, accepted)
+        offers: Dict[Tuple[str, str], List[Tuple[float, float]]] = {}
+        for conv in conversations:
+            svc, cx = conv.get('service_type'), conv.get('complexity')
+            if svc not in SERVICE_TYPES or cx not in COMPLEXITIES:
+                continue
+            turns = conv.get('turns') or []
+            first = next((t['message'] for t in turns if t.get('role') == 'consumer'), None)
+            if first:
+                texts.append(first)
+                svc_y.append(SERVICE_TYPES.index(svc))
+                cx_y.append(COMPLEXITIES.index(cx))
+            base = float(conv.get('list_price') or BASE_PRICES.get((svc, cx), 0))
+            quoted = [t['offer'] for t in turns if t.get('role') == 'provider' and t.get('offer')]
+            if base <= 0 or not quoted:
+                continue
+            # The buyer countered every quote but the last, which it took if the deal closed
+            closed = conv.get('outcome') == 'accepted'
+            for i, o in enumerate(quoted):
+                offers.setdefault((svc, cx), []).append((o / base, 1.0 if closed and i == len(quoted) - 1 else 0.0))
+
+        logged = 0
+        for row in get_store(HISTORY_LOG).all():
+            ctx = row.get('service_context')
+            if not isinstance(ctx, dict) or row.get('bot_offer') is None or row.get('accepted') is None:
+                continue
+            key = (ctx.get('service_type'), ctx.get('complexity'))
+            base = float(ctx.get('base_price') or 0)
+            if key[0] in SERVICE_TYPES and key[1] in COMPLEXITIES and base > 0:
+                offers.setdefault(key, []).append((float(row['bot_offer']) / base, 1.0 if row['accepted'] else 0.0))
+                logged += 1
+
+        if not texts:
+            raise ValueError(f"No labelled conversations in {dataset_path}")
+
+        # Hold out every 5th example to report accuracy
+        order = np.arange(len(texts))
+        test = order % 5 == 4
+        rows, cols, vals = _sparse(texts)
+        svc_y_arr, cx_y_arr = np.array(svc_y), np.array(cx_y)
+        train_mask = ~test[rows]
+        remap = np.cumsum(~test) - 1  # dense row numbers for the training subset
+
+        def fit(y: np.ndarray, k: int) -> np.ndarray:
+            return _fit_softmax(remap[rows[train_mask]], cols[train_mask], vals[train_mask], y[~test], k)
+
+        service_w = fit(svc_y_arr, len(SERVICE_TYPES))
+        complexity_w = fit(cx_y_arr, len(COMPLEXITIES))
+
+        def accuracy(W: np.ndarray, y: np.ndarray) -> Optional[float]:
+            if not test.any():
+                return None
+            hits = 0
+            for k, label in zip(order[test], y):
+                idx, signs = hashed_features(texts[k])
+                hits += int(np.argmax(signs @ W[idx])) == label
+            return round(hits / int(test.sum()), 4)
+
+        svc_acc = accuracy(service_w, svc_y_arr[test])
+        cx_acc = accuracy(complexity_w, cx_y_arr[test])
+
+        # Acceptance curves; a pair with too little data gets the pooled curve
+        acceptance = np.full((len(SERVICE_TYPES), len(COMPLEXITIES), 2), np.nan)
+        pooled_pairs = [p for pairs in offers.values() for p in pairs]
+        pooled = fit_logistic(np.array([p[0] for p in pooled_pairs]), np.array([p[1] for p in pooled_pairs])) \
+            if len(pooled_pairs) >= 12 else None
+        curves_fitted = 0
+        for si, svc in enumerate(SERVICE_TYPES):
+            for ci, cx in enumerate(COMPLEXITIES):
+                pairs = offers.get((svc, cx), [])
+                if len(pairs) >= 12 and len({p[1] for p in pairs}) == 2:
+                    m = fit_logistic(np.array([p[0] for p in pairs]), np.array([p[1] for p in pairs]))
+                    curves_fitted += 1
+                else:
+                    m = pooled
+                if m is not None:
+                    acceptance[si, ci] = (m.a, m.b)
+
+        os.makedirs(self.model_dir, exist_ok=True)
+        _save_npy(os.path.join(self.model_dir, _SERVICE_FILE), service_w)
+        _save_npy(os.path.join(self.model_dir, _COMPLEXITY_FILE), complexity_w)
+        _save_npy(os.path.join(self.model_dir, _ACCEPTANCE_FILE), acceptance)
+        metrics = {
+            'conversations': len(texts),
+            'service_type_accuracy': svc_acc,
+            'complexity_accuracy': cx_acc,
+            'acceptance_examples': len(pooled_pairs),
+            'acceptance_from_history': logged,
+            'acceptance_curves_fitted': curves_fitted,
+        }
+        meta = {
+            'version': 1,
+            'hash_dim': HASH_DIM,
+            'service_types': SERVICE_TYPES,
+            'complexities': COMPLEXITIES,
+            'trained_at': datetime.utcnow().isoformat(),
             'dataset_path': dataset_path,
-        }
\ No newline at end of file
+            'metrics': metrics,
+        }
+        meta_path = os.path.join(self.model_dir, _META_FILE)
+        with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+        self.load_models()
+        return {'status': 'trained', 'model_dir': self.model_dir, **metrics}
@@ -0,0 +1,112 @@
+"""
+Synthetic service-negotiation conversations for training, produced by the
+simulator (synthetic buyers against IntelligentNegotiationEngine). Opening
+messages are composed from per-service vocabulary, so the service-type and
+complexity classifiers see varied wording.
+"""
+import json
+import math
+import os
+import random
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..services.history_log import DATA_DIR
+from .intelligent_negotiation_model import BASE_PRICES, COMPLEXITIES, MIN_PRICE_RATIO, SERVICE_TYPES
+from .simulator import BUYER_PROFILES, Scenario, run_sessions
+
+DATASET_FILE = "comprehensive_negotiation_dataset.json"
+
+# (things, problems) per service type
+SERVICE_VOCAB = {
+    "plumbing": (["kitchen tap", "bathroom pipe", "toilet flush", "sink drain", "water heater pipe", "shower mixer"],
+                 ["is leaking", "is blocked", "keeps dripping", "burst last night", "has low pressure"]),
+    "electrical": (["light switch", "wall socket", "ceiling fan", "main breaker", "bedroom wiring", "power outlet"],
+                   ["stopped working", "keeps tripping", "sparks when used", "is buzzing", "has no power"]),
+    "cleaning": (["living room", "kitchen", "carpet", "bathroom tiles", "sofa", "whole flat"],
+                 ["needs a deep clean", "is very dusty", "needs washing", "has stains", "needs cleanup"]),
+    "hvac": (["split AC", "air conditioner", "AC compressor", "cooling unit", "HVAC duct"],
+             ["is not cooling", "is leaking water", "needs refrigerant", "makes a loud noise", "blows warm air"]),
+    "appliance": (["washing machine", "fridge", "dishwasher", "microwave", "refrigerator door"],
+                  ["is not draining", "stopped working", "makes noise", "does not heat", "is not cooling food"]),
+}
+
+COMPLEXITY_PHRASES = {
+    "simple": ["just a small fix", "should be a quick job", "minor issue", "simple repair please", "basic check needed"],
+    "medium": ["please have a look", "need it repaired", "can you fix it this week", "needs proper repair", ""],
+    "complex": ["need a complete replacement", "major work, full installation", "looking for a complete upgrade",
+                "needs renovation of the whole setup", "complex job, new installation"],
+}
+
+
+class ServiceDatasetGenerator:
+    def __init__(self, seed: int = 0, workers: int = 0, variants_per_job: int = 12):
+        self.seed = seed
+        self.workers = workers
+        self.variants_per_job = variants_per_job
+
+    def build_scenarios(self) -> List[Scenario]:
+        """Every (service type, complexity) job, each with several phrasings of the request."""
+        rng = random.Random(self.seed)
+        scenarios = []
+        for si, svc in enumerate(SERVICE_TYPES):
+            things, problems = SERVICE_VOCAB[svc]
+            for ci, cx in enumerate(COMPLEXITIES):
+                base = BASE_PRICES[(svc, cx)]
+                for _ in range(self.variants_per_job):
+                    text = f"My {rng.choice(things)} {rng.choice(problems)}, {rng.choice(COMPLEXITY_PHRASES[cx])}"
+                    scenarios.append(Scenario(
+                        product_id=(si + 1) * 100 + ci + 1,
+                        description=text.rstrip(", "),
+                        service_type=svc,
+                        complexity=cx,
+                        list_price=base,
+                        min_price=round(base * MIN_PRICE_RATIO, 2),
+                    ))
+        return scenarios
+
+    def generate_training_dataset(self, num_conversations: int = 200) -> List[Dict[str, Any]]:
+        """Conversations spread evenly over the buyer profiles, with outcome labels."""
+        profiles = list(BUYER_PROFILES.values())
+        per_profile = math.ceil(max(0, num_conversations) / len(profiles))
+        rows = run_sessions(
+            engines=("intelligent",),
+            profiles=profiles,
+            sessions=per_profile,
+            workers=self.workers,
+            seed=self.seed,
+            scenarios=self.build_scenarios(),
+            keep_transcripts=True,
+        )
+        # Interleave profiles so truncation keeps the mix even
+        rows = [r for _, r in sorted(enumerate(rows), key=lambda x: x[0] % per_profile)] if per_profile else rows
+        dataset = []
+        for i, r in enumerate(rows[:num_conversations]):
+            turns: List[Dict[str, Any]] = []
+            for t in r["transcript"]:
+                turns.append({"role": "consumer", "message": t["buyer"]})
+                turns.append({"role": "provider", "message": t["bot"], "offer": t["bot_offer"]})
+            dataset.append({
+                "conversation_id": i,
+                "service_type": r["service_type"],
+                "complexity": r["complexity"],
+                "list_price": r["list_price"],
+                "buyer_profile": r["profile"],
+                "buyer_budget": r["budget"],
+                "outcome": r["status"],
+                "final_price": r["final_price"],
+                "turns": turns,
+            })
+        return dataset
+
+    def save_dataset(self, dataset: List[Dict[str, Any]], filepath: Optional[str] = None) -> str:
+        """Write the dataset where IntelligentNegotiationService.train_ai_models looks for it."""
+        filepath = filepath or os.path.join(DATA_DIR, DATASET_FILE)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump({
+                "generated_at": datetime.utcnow().isoformat(),
+                "num_conversations": len(dataset),
+                "conversations": dataset,
+            }, f, ensure_ascii=False, indent=1)
+        return filepath
@@ -0,0 +1,327 @@
+"""
+Offline negotiation simulator and benchmark harness.
+
+Synthetic buyers (BuyerProfile: budget distribution, opening offer, concession
+rate, patience, scope-reduction phrases) haggle with NegotiationEngine and
+IntelligentNegotiationEngine over SCENARIOS. Sessions run across a process pool.
+The report has revenue, acceptance rate, rounds-to-close and per-turn latency
+percentiles for each engine and buyer profile.
+
+Engines learn from a private in-memory history store per worker process, so a
+run never touches the live negotiation history.
+
+    python -m app.negotiation.training.simulator --sessions 2000 --workers 4
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..models.provider_model import ProviderConfig
+from ..services.history_store import HistoryStore
+from ..services import negotiation_service, intelligent_negotiation_service
+from ..services.negotiation_service import NegotiationEngine
+from ..services.intelligent_negotiation_service import IntelligentNegotiationEngine
+
+
+@dataclass(frozen=True)
+class Scenario:
+    product_id: int
+    description: str  # buyer's opening message
+    service_type: str
+    complexity: str
+    list_price: float
+    min_price: float
+
+
+# Prices follow IntelligentNegotiationModel's base prices (min = 70% of list)
+SCENARIOS: List[Scenario] = [
+    Scenario(101, "My kitchen tap is leaking, need a simple fix", "plumbing", "simple", 300, 210),
+    Scenario(102, "Bathroom drain is blocked and the pipe leaks", "plumbing", "medium", 800, 560),
+    Scenario(103, "Need complete bathroom pipe installation", "plumbing", "complex", 2000, 1400),
+    Scenario(201, "One switch socket stopped working, basic job", "electrical", "simple", 250, 175),
+    Scenario(202, "Ceiling fan and light wiring keeps tripping the breaker", "electrical", "medium", 600, 420),
+    Scenario(203, "Full house wiring upgrade needed", "electrical", "complex", 1500, 1050),
+    Scenario(301, "Need a quick dust and wash of one room", "cleaning", "simple", 400, 280),
+    Scenario(302, "Deep clean of the carpet and kitchen", "cleaning", "medium", 800, 560),
+    Scenario(401, "AC not cooling, maybe refrigerant", "hvac", "medium", 1200, 840),
+    Scenario(402, "Complete AC compressor installation", "hvac", "complex", 3000, 2100),
+    Scenario(501, "Washing machine not draining", "appliance", "medium", 800, 560),
+    Scenario(502, "Fridge making noise, minor issue", "appliance", "simple", 300, 210),
+]
+
+DEFAULT_SCOPE_PHRASES = (
+    "basic work is enough",
+    "I will provide materials",
+    "smaller job than it sounds",
+    "partial repair without extras",
+)
+
+
+@dataclass(frozen=True)
+class BuyerProfile:
+    name: str
+    budget_mean: float = 0.85       # budget as a fraction of list price (normal)
+    budget_sd: float = 0.10
+    opening: float = 0.65           # first offer as a fraction of budget
+    concession: float = 0.35        # share of the gap to min(budget, bot offer) conceded per round
+    accept_margin: float = 0.03     # accept a bot offer within this fraction above our last offer
+    patience: int = 8               # rounds before walking away
+    scope_prob: float = 0.0         # chance per turn of adding a scope-reduction phrase
+    scope_phrases: Tuple[str, ...] = DEFAULT_SCOPE_PHRASES
+
+
+BUYER_PROFILES: Dict[str, BuyerProfile] = {
+    "typical": BuyerProfile("typical"),
+    "bargainer": BuyerProfile("bargainer", budget_mean=0.78, opening=0.5, concession=0.2, patience=10),
+    "eager": BuyerProfile("eager", budget_mean=1.0, budget_sd=0.08, opening=0.85, concession=0.6,
+                          accept_margin=0.08, patience=4),
+    "scope_cutter": BuyerProfile("scope_cutter", budget_mean=0.72, opening=0.6, scope_prob=0.5),
+    "lowballer": BuyerProfile("lowballer", budget_mean=0.6, budget_sd=0.12, opening=0.6, concession=0.15, patience=6),
+}
+
+ENGINES = {
+    "basic": NegotiationEngine,
+    "intelligent": IntelligentNegotiationEngine,
+}
+
+_OFFER_TEMPLATES = ("How about ₹{x}?", "Can you do {x} rupees?", "My budget is ₹{x}.")
+
+
+class BuyerAgent:
+    """A scripted buyer: opens low, concedes toward its budget, accepts close offers, walks away."""
+
+    def __init__(self, profile: BuyerProfile, list_price: float, rng: random.Random):
+        self.profile = profile
+        self.rng = rng
+        self.budget = max(1.0, round(list_price * rng.gauss(profile.budget_mean, profile.budget_sd)))
+        self.offer: Optional[float] = None
+
+    def _say(self, price: float) -> str:
+        msg = self.rng.choice(_OFFER_TEMPLATES).format(x=int(price))
+        if self.rng.random() < self.profile.scope_prob:
+            msg = f"{msg} {self.rng.choice(self.profile.scope_phrases)}"
+        return msg
+
+    def respond(self, bot_offer: Optional[float], rounds: int) -> Optional[str]:
+        """Next message, or None to walk away."""
+        p = self.profile
+        if rounds >= p.patience:
+            return None
+        if bot_offer is not None and bot_offer <= self.budget and (
+            self.offer is None or bot_offer <= self.offer * (1 + p.accept_margin)
+        ):
+            self.offer = float(bot_offer)
+            return self._say(round(bot_offer))  # meet the bot's price
+        if self.offer is None:
+            self.offer = float(round(self.budget * p.opening))
+        else:
+            target = min(self.budget, bot_offer) if bot_offer is not None else self.budget
+            self.offer = float(round(self.offer + p.concession * max(0.0, target - self.offer)))
+        return self._say(self.offer)
+
+
+class _MemoryLog:
+    """Stands in for NegotiationLog: simulated turns stay in memory."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.path = f"simulator:{os.getpid()}:{name}"  # keys the acceptance-model cache
+
+    def append(self, row: Dict[str, Any]) -> None:
+        pass
+
+    def iter_rows(self):
+        return iter(())
+
+
+_stores: Dict[str, HistoryStore] = {}
+
+
+def _sim_store(log_name: str) -> HistoryStore:
+    """Per-process history, so simulated sessions learn from each other only."""
+    store = _stores.get(log_name)
+    if store is None:
+        store = _stores[log_name] = HistoryStore(_MemoryLog(log_name))
+    return store
+
+
+def _history_log_name(engine_name: str) -> str:
+    if engine_name == "intelligent":
+        return intelligent_negotiation_service.HISTORY_LOG
+    return negotiation_service.HISTORY_LOG
+
+
+def simulate_session(engine_name: str, scenario: Scenario, profile: BuyerProfile, rng: random.Random,
+                     engine_rng: Optional[random.Random] = None) -> Dict[str, Any]:
+    """Play one negotiation to its end; returns outcome, price, rounds and per-turn latencies.
+    The buyer draws from `rng`, the engine from `engine_rng` (default: `rng` too)."""
+    provider = ProviderConfig(
+        product_id=scenario.product_id,
+        product_name=f"{scenario.service_type.title()} Service ({scenario.complexity})",
+        list_price=scenario.list_price,
+        min_price=scenario.min_price,
+    )
+    with contextlib.redirect_stdout(io.StringIO()):  # engines print setup notices per session
+        engine = ENGINES[engine_name](provider)
+    engine._store = _sim_store(_history_log_name(engine_name))
+    engine.rng = engine_rng or rng
+    buyer = BuyerAgent(profile, scenario.list_price, rng)
+
+    latencies: List[float] = []
+    transcript: List[Dict[str, Any]] = []
+    message: Optional[str] = scenario.description
+    status = "ongoing"
+    final_price = None
+    turns = 0
+    while message is not None:
+        t = time.perf_counter()
+        res = engine.step(message)
+        latencies.append(time.perf_counter() - t)
+        turns += 1
+        status, final_price = res["status"], res.get("final_price")
+        last = res["history"][-1] if res["history"] else {}
+        transcript.append({"buyer": message, "bot": res["reply"], "bot_offer": last.get("bot_offer")})
+        if status != "ongoing":
+            break
+        message = buyer.respond(last.get("bot_offer"), turns)
+    if status == "ongoing":
+        status = "abandoned"
+
+    return {
+        "engine": engine_name,
+        "profile": profile.name,
+        "scenario": scenario.product_id,
+        "service_type": scenario.service_type,
+        "complexity": scenario.complexity,
+        "list_price": scenario.list_price,
+        "budget": buyer.budget,
+        "status": status,
+        "final_price": final_price,
+        "turns": turns,
+        "latencies": latencies,
+        "transcript": transcript,
+    }
+
+
+def _run_chunk(task: Tuple[str, BuyerProfile, int, int, Sequence[Scenario], bool]) -> List[Dict[str, Any]]:
+    engine_name, profile, count, seed, scenarios, keep_transcripts = task
+    rng = random.Random(seed)
+    engine_rng = random.Random(seed)  # shared by the chunk's engines; the global RNG is left alone
+    out = []
+    for _ in range(count):
+        r = simulate_session(engine_name, rng.choice(scenarios), profile, rng, engine_rng)
+        if not keep_transcripts:
+            r.pop("transcript")
+        out.append(r)
+    return out
+
+
+def run_sessions(
+    engines: Sequence[str] = tuple(ENGINES),
+    profiles: Sequence[BuyerProfile] = tuple(BUYER_PROFILES.values()),
+    sessions: int = 500,
+    workers: int = 0,
+    seed: int = 0,
+    scenarios: Sequence[Scenario] = SCENARIOS,
+    chunk_size: int = 50,
+    keep_transcripts: bool = False,
+) -> List[Dict[str, Any]]:
+    """`sessions` per (engine, profile) pair. workers=0 runs in this process."""
+    tasks = []
+    for e in engines:
+        for pi, prof in enumerate(profiles):
+            for start in range(0, sessions, chunk_size):
+                n = min(chunk_size, sessions - start)
+                chunk_seed = random.Random(f"{seed}:{e}:{pi}:{start}").getrandbits(32)  # same on every run
+                tasks.append((e, prof, n, chunk_seed, tuple(scenarios), keep_transcripts))
+    if workers <= 0:
+        chunks = map(_run_chunk, tasks)
+        return [r for chunk in chunks for r in chunk]
+    # spawn: forked children would inherit dead writer/fit threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return [r for chunk in pool.map(_run_chunk, tasks) for r in chunk]
+
+
+def _summary(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    n = len(rows)
+    closed = [r for r in rows if r["status"] == "accepted"]
+    lat_ms = np.array([x for r in rows for x in r["latencies"]], dtype=float) * 1000.0
+    rounds = np.array([r["turns"] for r in closed], dtype=float)
+    revenue = float(sum(r["final_price"] for r in closed))
+    outcomes: Dict[str, int] = {}
+    for r in rows:
+        outcomes[r["status"]] = outcomes.get(r["status"], 0) + 1
+    return {
+        "sessions": n,
+        "acceptance_rate": round(len(closed) / n, 4) if n else 0.0,
+        "revenue_total": round(revenue, 2),
+        "revenue_per_session": round(revenue / n, 2) if n else 0.0,
+        "price_to_list": round(float(np.mean([r["final_price"] / r["list_price"] for r in closed])), 4) if closed else None,
+        "rounds_to_close": {
+            "mean": round(float(rounds.mean()), 2),
+            "p50": float(np.percentile(rounds, 50)),
+            "p90": float(np.percentile(rounds, 90)),
+        } if closed else None,
+        "turn_latency_ms": {
+            "p50": round(float(np.percentile(lat_ms, 50)), 3),
+            "p95": round(float(np.percentile(lat_ms, 95)), 3),
+            "p99": round(float(np.percentile(lat_ms, 99)), 3),
+            "max": round(float(lat_ms.max()), 3),
+        } if lat_ms.size else None,
+        "outcomes": outcomes,
+    }
+
+
+def benchmark(**kwargs) -> Dict[str, Any]:
+    """run_sessions() plus a report per engine and per (engine, profile)."""
+    t = time.perf_counter()
+    rows = run_sessions(**kwargs)
+    report: Dict[str, Any] = {"wall_seconds": 0.0, "engines": {}}
+    for e in sorted({r["engine"] for r in rows}):
+        mine = [r for r in rows if r["engine"] == e]
+        report["engines"][e] = {
+            "overall": _summary(mine),
+            "by_profile": {p: _summary([r for r in mine if r["profile"] == p])
+                           for p in sorted({r["profile"] for r in mine})},
+        }
+    report["wall_seconds"] = round(time.perf_counter() - t, 2)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Benchmark negotiation engines against synthetic buyers")
+    ap.add_argument("--engines", default=",".join(ENGINES), help="comma-separated: basic,intelligent")
+    ap.add_argument("--profiles", default=",".join(BUYER_PROFILES), help="comma-separated buyer profiles")
+    ap.add_argument("--sessions", type=int, default=500, help="sessions per engine and profile")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="0 runs in-process")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args(argv)
+
+    report = benchmark(
+        engines=[e for e in args.engines.split(",") if e],
+        profiles=[BUYER_PROFILES[p] for p in args.profiles.split(",") if p],
+        sessions=args.sessions,
+        workers=args.workers,
+        seed=args.seed,
+    )
+    report["config"] = {**vars(args), "profiles": [asdict(BUYER_PROFILES[p]) for p in args.profiles.split(",") if p]}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
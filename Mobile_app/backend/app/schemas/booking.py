@@ -17,6 +17,8 @@ class BookingAutoCreate(BaseModel):
     consumer_lat: float
     consumer_lng: float
     within_km: float = 5.0
+    # sequential|broadcast; defaults to settings.DISPATCH_MODE
+    dispatch_mode: Optional[str] = None
 
 class BookingUpdateStatus(BaseModel):
     # Allow extended statuses for real-time progress
@@ -30,6 +32,20 @@ class BookingLocationUpdate(BaseModel):
     lat: float
     lng: float
 
+class BookingLocationFix(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+    ts: datetime  # when the fix was taken on the device (ISO 8601 or epoch seconds)
+
+class BookingLocationBatch(BaseModel):
+    fixes: list[BookingLocationFix] = Field(min_length=1, max_length=2000)
+    store_track: bool = True
+
+class BookingTrackPoint(BaseModel):
+    lat: float
+    lng: float
+    ts: datetime
+
 class BookingRatingCreate(BaseModel):
     stars: int = Field(ge=1, le=5)
     comment: Optional[str] = ""
@@ -60,6 +76,11 @@ class BookingOut(BaseModel):
     funding_current: float | None
     funding_contributions: list | None
     auto_assign_enabled: int | None
+    # Server-side estimate from the provider's live position (eta_minutes is what the provider entered)
+    eta_estimate_minutes: int | None = None
+    eta_source: str | None = None  # graph|grid
+    # Deadline of the current provider's offer (auto-dispatched bookings only)
+    offer_expires_at: datetime | None = None
     # Provider information
     provider_name: str | None = None
     provider_phone: str | None = None
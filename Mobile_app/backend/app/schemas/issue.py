@@ -1,7 +1,7 @@
 # backend/app/schemas/issue.py
 from pydantic import BaseModel
 from typing import Optional, Any
-from datetime import datetime
+from datetime import datetime, date
 
 class IssueCreate(BaseModel):
     title: str
@@ -31,10 +31,44 @@ class IssueOut(BaseModel):
     funding_contributions: Optional[list] = None
     auto_assign_enabled: Optional[int] = None
     assigned_booking_id: Optional[int] = None
+    # Duplicate clustering
+    duplicate_of_id: Optional[int] = None
+    duplicate_count: Optional[int] = 0
 
     class Config:
         from_attributes = True
 
+class IssueMarker(BaseModel):
+    id: int
+    lat: float
+    lng: float
+    status: str
+    category: Optional[str] = None
+
+class IssueCluster(BaseModel):
+    cell: str  # "z/x/y" of the aggregation cell
+    count: int
+    lat: float
+    lng: float
+
+class IssueMapOut(BaseModel):
+    zoom: int
+    mode: str  # clusters | markers
+    clusters: list[IssueCluster] = []
+    markers: list[IssueMarker] = []
+
+class IssueStatBucket(BaseModel):
+    cell: Optional[str] = None
+    category: Optional[str] = None
+    day: Optional[date] = None
+    status: Optional[str] = None
+    count: int
+
+class IssueStatsOut(BaseModel):
+    group_by: list[str]
+    total: int
+    buckets: list[IssueStatBucket] = []
+
 class ComplaintEscalateRequest(BaseModel):
     draft: Optional[str] = None  # Optional edited draft to send
 
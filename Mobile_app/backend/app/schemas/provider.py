@@ -29,6 +29,8 @@ class ProviderOut(BaseModel):
     bio: str
     skills: str
     rating: float
+    rating_count: int | None = None
+    rating_score: float | None = None
     jobs_done: int
     age: int | None
     address: str | None
@@ -0,0 +1,17 @@
+# backend/app/schemas/search.py
+from pydantic import BaseModel
+from typing import List, Optional
+
+class SearchHit(BaseModel):
+    kind: str  # issue | forum_post
+    id: int
+    title: str  # HTML-escaped; matched terms wrapped in <mark>...</mark>
+    snippet: Optional[str] = None  # same escaping and highlighting as title
+    score: float
+
+class SearchResults(BaseModel):
+    query: str
+    total: int
+    limit: int
+    offset: int
+    results: List[SearchHit]
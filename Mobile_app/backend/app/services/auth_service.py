@@ -30,6 +30,27 @@ def create_access_token(user: User) -> str:
     }
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
+def decode_user_id(token: str | None) -> Optional[int]:
+    """User id from a valid access token, without touching the DB."""
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+        return int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
+        return None
+
+def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    # For hot paths that only need the caller's id (no users-table lookup)
+    user_id = decode_user_id(token)
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user_id
+
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
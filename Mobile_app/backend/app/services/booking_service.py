@@ -2,6 +2,8 @@
 from sqlalchemy.orm import Session
 from typing import Optional, Sequence
 from ..models.booking import Booking
+from . import live_location
+from .rating_service import record_completion
 
 
 def create_booking(
@@ -16,6 +18,8 @@ def create_booking(
     consumer_lng: Optional[float] = None,
     dispatch_queue: Optional[Sequence[int]] = None,
     dispatch_idx: int = 0,
+    offer_expires_at=None,
+    status: str = "requested",
 ) -> Booking:
     b = Booking(
         customer_id=customer_id,
@@ -27,6 +31,8 @@ def create_booking(
         consumer_lng=consumer_lng,
         dispatch_queue=list(dispatch_queue) if dispatch_queue else None,
         dispatch_idx=dispatch_idx,
+        offer_expires_at=offer_expires_at,
+        status=status,
     )
     db.add(b)
     db.commit()
@@ -47,7 +53,11 @@ def update_booking_status(
     b = db.query(Booking).get(booking_id)
     if not b:
         raise ValueError("Booking not found")
+    if status == "completed":
+        record_completion(db, b)  # counts the job once, even for concurrent "completed" updates
     b.status = status
+    if status != "requested":
+        b.offer_expires_at = None  # the offer was acted on; the dispatch timer no longer applies
     if scheduled_at:
         b.scheduled_at = scheduled_at
     # Persist optional provider offer details if provided
@@ -57,6 +67,10 @@ def update_booking_status(
         b.price_amount = float(price_amount)
     if price_currency is not None and price_currency.strip():
         b.price_currency = price_currency.strip().upper()
+    # Save the latest in-memory live location together with the status change
+    live_location.persist_into(b)
     db.commit()
     db.refresh(b)
+    if status in live_location.TERMINAL_STATUSES:
+        live_location.forget(b.id)
     return b
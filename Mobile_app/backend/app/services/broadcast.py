@@ -0,0 +1,374 @@
+# backend/app/services/broadcast.py
+"""
+Cross-worker broadcast for realtime events and cache invalidation.
+
+With several uvicorn workers, an update handled by worker A must reach
+WebSockets held by worker B. Each worker delivers locally first, then
+forwards an envelope through a pluggable backend selected by BROADCAST_URL:
+
+- memory://                       single process, nothing leaves the worker (default)
+- unix:///run/urbifix-broadcast   one datagram socket per worker in a shared directory
+- redis://[:password@]host:port    Redis PUBLISH/SUBSCRIBE, spoken over a plain socket
+
+Envelopes carry the sender's origin id so a worker ignores its own messages.
+send() only enqueues: a background thread publishes from a bounded outbox
+(BROADCAST_QUEUE_SIZE), so commit hooks and request handlers never wait on
+the network. When the outbox is full (e.g. Redis is unreachable) new messages
+are dropped and logged. Delivery is best-effort: clients also poll, so a lost
+live update is only late.
+"""
+from __future__ import annotations
+import abc
+import glob
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from ..config import settings
+
+log = logging.getLogger(__name__)
+
+ORIGIN = uuid.uuid4().hex[:12]
+
+OnMessage = Callable[[str], None]
+
+
+class BroadcastBackend(abc.ABC):
+    """Ships opaque text messages to every other worker."""
+
+    distributed = True
+
+    @abc.abstractmethod
+    def start(self, on_message: OnMessage) -> None:
+        """Begin delivering other workers' messages to on_message."""
+
+    @abc.abstractmethod
+    def publish(self, message: str) -> None:
+        """Send to every other worker; may block (only the sender thread calls it)."""
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryBackend(BroadcastBackend):
+    distributed = False
+
+    def start(self, on_message: OnMessage) -> None:
+        pass
+
+    def publish(self, message: str) -> None:
+        pass
+
+
+class UnixSocketBackend(BroadcastBackend):
+    """Every worker binds `<dir>/<origin>.sock` (SOCK_DGRAM) and sends to all peers found there."""
+
+    MAX_DATAGRAM = 256 * 1024
+    PEER_REFRESH_S = 1.0
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{ORIGIN}.sock")
+        self._rx: Optional[socket.socket] = None
+        self._tx: Optional[socket.socket] = None
+        self._peers: List[str] = []
+        self._peers_at = 0.0
+        self._lock = threading.Lock()
+
+    def start(self, on_message: OnMessage) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._rx = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._rx.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.MAX_DATAGRAM * 4)
+        self._rx.bind(self.path)
+        self._tx = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._tx.setblocking(False)
+        threading.Thread(target=self._listen, args=(on_message,), name="broadcast-unix", daemon=True).start()
+
+    def _listen(self, on_message: OnMessage) -> None:
+        rx = self._rx
+        while rx is not None and rx.fileno() != -1:
+            try:
+                data = rx.recv(self.MAX_DATAGRAM)
+            except OSError:
+                return  # socket closed
+            try:
+                on_message(data.decode("utf-8"))
+            except Exception:
+                log.exception("broadcast handler failed")
+
+    def _peer_paths(self) -> List[str]:
+        now = time.monotonic()
+        if now - self._peers_at > self.PEER_REFRESH_S:
+            self._peers = [p for p in glob.glob(os.path.join(self.directory, "*.sock")) if p != self.path]
+            self._peers_at = now
+        return self._peers
+
+    def publish(self, message: str) -> None:
+        if self._tx is None:
+            return
+        data = message.encode("utf-8")
+        with self._lock:
+            for peer in self._peer_paths():
+                try:
+                    self._tx.sendto(data, peer)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Worker died without cleaning up; forget its socket
+                    try:
+                        os.unlink(peer)
+                    except OSError:
+                        pass
+                    self._peers_at = 0.0
+                except (BlockingIOError, OSError):
+                    pass  # peer's buffer is full (or message too big); drop for that peer
+
+    def close(self) -> None:
+        for s in (self._rx, self._tx):
+            if s is not None:
+                try:
+                    s.close()
+                except OSError:
+                    pass
+        self._rx = self._tx = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+# ---------- Redis (RESP2 over a plain socket) ----------
+def resp_command(*args: str | bytes) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for a in args:
+        b = a if isinstance(a, bytes) else str(a).encode("utf-8")
+        out.append(b"$%d\r\n%s\r\n" % (len(b), b))
+    return b"".join(out)
+
+
+class RespError(Exception):
+    pass
+
+
+def resp_read(f):
+    """Read one RESP2 reply from a binary file object."""
+    line = f.readline()
+    if not line:
+        raise ConnectionError("connection closed")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode("utf-8")
+    if kind == b"-":
+        raise RespError(rest.decode("utf-8"))
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        n = int(rest)
+        if n < 0:
+            return None
+        data = f.read(n + 2)
+        return data[:-2]
+    if kind == b"*":
+        n = int(rest)
+        return None if n < 0 else [resp_read(f) for _ in range(n)]
+    raise ConnectionError(f"bad RESP reply: {line!r}")
+
+
+class RedisBackend(BroadcastBackend):
+    CHANNEL = "urbifix:broadcast"
+    CONNECT_TIMEOUT_S = 3.0
+
+    def __init__(self, url: str):
+        u = urlparse(url)
+        self.host = u.hostname or "localhost"
+        self.port = u.port or 6379
+        self.password = u.password
+        self._pub: Optional[socket.socket] = None
+        self._pub_file = None
+        self._sub: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        s = socket.create_connection((self.host, self.port), timeout=self.CONNECT_TIMEOUT_S)
+        f = s.makefile("rb")
+        if self.password:
+            s.sendall(resp_command("AUTH", self.password))
+            resp_read(f)
+        return s, f
+
+    def start(self, on_message: OnMessage) -> None:
+        threading.Thread(target=self._listen, args=(on_message,), name="broadcast-redis", daemon=True).start()
+
+    def _listen(self, on_message: OnMessage) -> None:
+        backoff = 0.5
+        while not self._closed:
+            try:
+                s, f = self._connect()
+                self._sub = s
+                s.settimeout(None)
+                s.sendall(resp_command("SUBSCRIBE", self.CHANNEL))
+                backoff = 0.5
+                while not self._closed:
+                    reply = resp_read(f)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        try:
+                            on_message(reply[2].decode("utf-8"))
+                        except Exception:
+                            log.exception("broadcast handler failed")
+            except (OSError, ConnectionError, RespError) as e:
+                self._close_sub()
+                if self._closed:
+                    return
+                log.warning("broadcast redis subscriber: %s; reconnecting in %.1fs", e, backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 10.0)
+
+    def publish(self, message: str) -> None:
+        if self._closed:
+            return  # stop() gave up waiting on the sender; don't reconnect
+        cmd = resp_command("PUBLISH", self.CHANNEL, message)
+        with self._lock:
+            for _ in range(2):  # one reconnect attempt per message
+                try:
+                    if self._pub is None:
+                        self._pub, self._pub_file = self._connect()
+                    self._pub.sendall(cmd)
+                    resp_read(self._pub_file)
+                    return
+                except (OSError, ConnectionError, RespError) as e:
+                    log.warning("broadcast redis publish failed: %s", e)
+                    self._drop_pub()
+
+    def _drop_pub(self) -> None:
+        try:
+            if self._pub is not None:
+                self._pub.close()
+        except OSError:
+            pass
+        self._pub = self._pub_file = None
+
+    def _close_sub(self) -> None:
+        s, self._sub = self._sub, None
+        if s is not None:
+            try:
+                s.close()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        self._closed = True
+        self._close_sub()  # unblocks the subscriber thread
+        with self._lock:
+            self._drop_pub()
+
+
+def backend_from_url(url: str) -> BroadcastBackend:
+    scheme = urlparse(url).scheme
+    if scheme in ("", "memory"):
+        return MemoryBackend()
+    if scheme == "unix":
+        return UnixSocketBackend(urlparse(url).path)
+    if scheme == "redis":
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported BROADCAST_URL: {url}")
+
+
+# ---------- module API ----------
+_backend: BroadcastBackend = MemoryBackend()
+_handlers: Dict[str, Callable[[str, str], None]] = {}
+_started = False
+_start_lock = threading.Lock()
+
+# Outgoing envelopes, published by one sender thread per started backend
+_STOP = object()
+_outbox: "queue.Queue" = queue.Queue(maxsize=settings.BROADCAST_QUEUE_SIZE)
+_sender: Optional[threading.Thread] = None
+_dropped = 0
+_dropped_logged_at = 0.0
+DROP_LOG_INTERVAL_S = 10.0
+STOP_TIMEOUT_S = 2.0
+
+
+def register(kind: str, handler: Callable[[str, str], None]) -> None:
+    """Handle envelopes of `kind` sent by other workers: handler(topic, message)."""
+    _handlers[kind] = handler
+
+
+def _on_message(raw: str) -> None:
+    try:
+        env = json.loads(raw)
+    except ValueError:
+        return
+    if not isinstance(env, dict) or env.get("o") == ORIGIN:
+        return
+    handler = _handlers.get(env.get("k"))
+    if handler is not None:
+        handler(env.get("t") or "", env.get("m") or "")
+
+
+def _drain(backend: BroadcastBackend, outbox: "queue.Queue") -> None:
+    while True:
+        message = outbox.get()
+        if message is _STOP:
+            return
+        try:
+            backend.publish(message)
+        except Exception:
+            log.exception("broadcast publish failed")
+
+
+def start(url: Optional[str] = None) -> BroadcastBackend:
+    """Connect this worker to the broadcast backend (idempotent)."""
+    global _backend, _started, _outbox, _sender
+    with _start_lock:
+        if not _started:
+            backend = backend_from_url(url or settings.BROADCAST_URL)
+            backend.start(_on_message)
+            if backend.distributed:
+                _outbox = queue.Queue(maxsize=settings.BROADCAST_QUEUE_SIZE)
+                _sender = threading.Thread(target=_drain, args=(backend, _outbox), name="broadcast-send", daemon=True)
+                _sender.start()
+            _backend = backend
+            _started = True
+    return _backend
+
+
+def stop() -> None:
+    """Publish what is queued (bounded wait), then disconnect; the unix backend removes its socket."""
+    global _backend, _started, _sender
+    with _start_lock:
+        backend, sender = _backend, _sender
+        _backend, _sender = MemoryBackend(), None  # send() stops enqueueing
+        _started = False
+        if sender is not None:
+            try:
+                _outbox.put(_STOP, timeout=STOP_TIMEOUT_S)
+                sender.join(STOP_TIMEOUT_S)
+            except queue.Full:
+                pass
+        backend.close()
+
+
+def is_distributed() -> bool:
+    return _backend.distributed
+
+
+def send(kind: str, topic: str, message: str) -> None:
+    """Queue a message for the other workers; never blocks (drops it if the outbox is full)."""
+    global _dropped, _dropped_logged_at
+    if not _backend.distributed:
+        return
+    try:
+        _outbox.put_nowait(json.dumps({"o": ORIGIN, "k": kind, "t": topic, "m": message}, separators=(",", ":")))
+    except queue.Full:
+        _dropped += 1
+        now = time.monotonic()
+        if now - _dropped_logged_at >= DROP_LOG_INTERVAL_S:
+            _dropped_logged_at = now
+            log.warning("broadcast outbox full; %d messages dropped so far", _dropped)
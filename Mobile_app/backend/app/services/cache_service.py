@@ -0,0 +1,207 @@
+# backend/app/services/cache_service.py
+"""
+Conditional GET + short-TTL response cache for hot read endpoints.
+
+Every table has an in-process version counter, bumped after a commit that
+wrote to it (ORM flushes and bulk query().update()/delete() are both seen).
+A response's ETag is derived from the versions of the tables it reads, so
+`If-None-Match` can be answered with 304 before any DB work is done.
+
+Anonymous responses are additionally kept, already serialized, in a small
+TTL/LRU cache keyed by URL; a version bump changes the ETag and so misses.
+
+Counters are per process. Bumps are forwarded to the other workers through
+services/broadcast.py; counters still differ between workers, so a client
+hopping between them may get a spurious 200. A stale 304 is only possible
+in the instant before a peer's bump arrives.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import SessionLocal
+from . import broadcast
+from .auth_service import decode_user_id
+
+# A restart resets the counters, so tag ETags with a per-boot id
+_BOOT = secrets.token_hex(4)
+_BOOT_TS = time.time()
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = {}
+_modified_at: Dict[str, float] = {}
+
+
+def bump(*tables: str) -> None:
+    """Mark tables as changed (call for writes the ORM can't see, e.g. in-memory stores)."""
+    _bump_local(*tables)
+    broadcast.send("cache", "", ",".join(tables))
+
+
+def _bump_local(*tables: str) -> None:
+    now = time.time()
+    with _lock:
+        for t in tables:
+            _versions[t] = _versions.get(t, 0) + 1
+            _modified_at[t] = now
+
+
+broadcast.register("cache", lambda _topic, tables: _bump_local(*filter(None, tables.split(","))))
+
+
+def versions(tables: Sequence[str]) -> Tuple[Tuple[int, ...], float]:
+    with _lock:
+        return (
+            tuple(_versions.get(t, 0) for t in tables),
+            max((_modified_at.get(t, _BOOT_TS) for t in tables), default=_BOOT_TS),
+        )
+
+
+# ---------- Session hooks: collect written tables, bump on commit ----------
+def _pending(session: Session) -> set:
+    return session.info.setdefault("_cache_tables", set())
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_flushed(session: Session, flush_context) -> None:
+    pending = _pending(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            pending.add(table)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _collect_bulk(orm_execute_state) -> None:
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            _pending(orm_execute_state.session).add(mapper.local_table.name)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _bump_committed(session: Session) -> None:
+    tables = session.info.pop("_cache_tables", None)
+    if tables:
+        bump(*tables)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_rolled_back(session: Session) -> None:
+    session.info.pop("_cache_tables", None)
+
+
+# ---------- ETag helpers ----------
+def _token_subject(request: Request) -> Optional[str]:
+    # Identify the caller from the JWT alone (no DB hit); invalid tokens just don't vary
+    auth = request.headers.get("authorization") or ""
+    if not auth.lower().startswith("bearer "):
+        return None
+    user_id = decode_user_id(auth[7:].strip())
+    return str(user_id) if user_id is not None else None
+
+
+def _etag(request: Request, vers: Tuple[int, ...], subject: Optional[str]) -> str:
+    variant = hashlib.blake2b(
+        f"{request.url.path}?{request.url.query}|{subject or ''}".encode("utf-8"), digest_size=6
+    ).hexdigest()
+    return f'"{_BOOT}.{".".join(str(v) for v in vers)}.{variant}"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    # If-Modified-Since is deliberately ignored: one-second resolution can't tell
+    # apart two writes in the same second, the version-based ETag can.
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    tags = [t.strip() for t in inm.split(",")]
+    # weak comparison is what If-None-Match specifies
+    return "*" in tags or any((t[2:] if t.startswith("W/") else t) == etag for t in tags)
+
+
+def _validator_headers(etag: str, last_modified: float, private: bool) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": "private, no-cache" if private else "public, no-cache",
+    }
+
+
+def conditional(*tables: str, vary_user: bool = False) -> Callable:
+    """Route dependency: 304 on a matching validator, else stamp ETag/Last-Modified.
+
+    Declare it before `db`/`user` dependencies so a 304 skips them entirely.
+    """
+    def _dep(request: Request, response: Response) -> None:
+        vers, last_modified = versions(tables)
+        subject = _token_subject(request) if vary_user else None
+        etag = _etag(request, vers, subject)
+        headers = _validator_headers(etag, last_modified, private=vary_user)
+        if _matches(request, etag) and (subject is not None or not vary_user):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return _dep
+
+
+# ---------- TTL cache for anonymous reads ----------
+class TTLCache:
+    def __init__(self, ttl_s: float, max_entries: int):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, etag: str) -> Optional[bytes]:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            expires, cached_etag, body = hit
+            if cached_etag != etag or expires < time.monotonic():
+                self._data.pop(key, None)
+                return None
+            self._data.move_to_end(key)
+            return body
+
+    def put(self, key: str, etag: str, body: bytes) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_s, etag, body)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_cache = TTLCache(settings.RESPONSE_CACHE_TTL_SECONDS, settings.RESPONSE_CACHE_MAX_ENTRIES)
+
+
+def cached_response(request: Request, tables: Iterable[str], build: Callable[[], Any]) -> Response:
+    """Serve an anonymous read from validators/TTL cache, calling `build()` only on a miss."""
+    tables = tuple(tables)
+    vers, last_modified = versions(tables)
+    etag = _etag(request, vers, None)
+    headers = _validator_headers(etag, last_modified, private=False)
+    if _matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    key = f"{request.url.path}?{request.url.query}"
+    body = _cache.get(key, etag) if settings.RESPONSE_CACHE_TTL_SECONDS > 0 else None
+    if body is None:
+        body = json.dumps(jsonable_encoder(build()), separators=(",", ":")).encode("utf-8")
+        if settings.RESPONSE_CACHE_TTL_SECONDS > 0:
+            _cache.put(key, etag, body)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,283 @@
+# backend/app/services/dedup_service.py
+"""
+Near-duplicate issue detection.
+
+When a water main bursts we get dozens of reports within a few hundred metres.
+New issues are matched against recent "canonical" issues using:
+- a spatial grid index over Issue.lat/lng (only nearby cells are scanned)
+- a 64-bit SimHash fingerprint of title + description (Hamming distance)
+
+A match links the new report to the existing cluster (Issue.duplicate_of_id) so
+the caller can skip the AI pipeline, complaint drafting and notifications.
+Deleting a duplicate decrements its root's duplicate_count; deleting a
+canonical issue promotes its oldest duplicate to root of the remaining cluster.
+Zero external dependencies; the index is in-memory and rebuilt lazily from the DB.
+Additions and removals are shared with other workers over services/broadcast.py
+so a cluster started on one worker is matched on all of them.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.issue import Issue
+from . import broadcast
+from .provider_service import haversine_km
+
+_TOKEN_PAT = re.compile(r"[a-z0-9]+")
+
+# Very common words carry no signal about *which* incident is being reported
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "of", "in", "on", "at",
+    "to", "for", "from", "and", "or", "it", "this", "that", "there", "here", "near",
+    "our", "my", "we", "i", "you", "please", "pls", "kindly", "very", "since", "has",
+    "have", "had", "with", "by", "not", "no", "its", "area", "road", "street",
+}
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in _TOKEN_PAT.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def simhash(text: str, bits: int = 64) -> int:
+    """64-bit SimHash over unigrams + bigrams; similar texts => small Hamming distance."""
+    toks = _tokens(text)
+    features = toks + [f"{a} {b}" for a, b in zip(toks, toks[1:])]
+    if not features:
+        return 0
+    acc = [0] * bits
+    for feat in features:
+        h = int.from_bytes(hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(bits):
+            acc[i] += 1 if (h >> i) & 1 else -1
+    out = 0
+    for i in range(bits):
+        if acc[i] > 0:
+            out |= 1 << i
+    return out
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _ts(dt: Optional[datetime]) -> float:
+    if dt is None:
+        return time.time()
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+# (issue_id, lat, lng, fingerprint, created_ts)
+_Entry = Tuple[int, float, float, int, float]
+
+
+class DuplicateIndex:
+    """Grid-bucketed index of recent canonical issues (thread-safe)."""
+
+    def __init__(self, radius_m: float, window_hours: float, max_hamming: int):
+        self.radius_km = radius_m / 1000.0
+        self.window_s = window_hours * 3600.0
+        self.max_hamming = max_hamming
+        # Cell size in degrees latitude equals the match radius, so a match is always
+        # within the neighbouring cells (longitude span is widened by 1/cos(lat)).
+        self.cell_deg = max(1e-4, self.radius_km / 111.32)
+        self._cells: Dict[Tuple[int, int], List[_Entry]] = {}
+        self._cell_of: Dict[int, Tuple[int, int]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (int(math.floor(lat / self.cell_deg)), int(math.floor(lng / self.cell_deg)))
+
+    def _neighbour_cells(self, lat: float, lng: float):
+        cy, cx = self._cell(lat, lng)
+        span_x = int(math.ceil(1.0 / max(0.01, math.cos(math.radians(lat)))))
+        for dy in (-1, 0, 1):
+            for dx in range(-span_x, span_x + 1):
+                yield (cy + dy, cx + dx)
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            since = datetime.utcnow() - timedelta(seconds=self.window_s)
+            rows = (
+                db.query(Issue.id, Issue.lat, Issue.lng, Issue.title, Issue.description, Issue.created_at)
+                .filter(
+                    Issue.duplicate_of_id.is_(None),
+                    Issue.lat.isnot(None),
+                    Issue.lng.isnot(None),
+                    Issue.created_at >= since,
+                )
+                .all()
+            )
+            for r in rows:
+                self._add_locked(r.id, r.lat, r.lng, simhash(f"{r.title} {r.description}"), _ts(r.created_at))
+            self._loaded = True
+
+    def _add_locked(self, issue_id: int, lat: float, lng: float, fp: int, created_ts: float) -> None:
+        self._remove_locked(issue_id)  # idempotent: a remote add may race the initial load
+        cell = self._cell(lat, lng)
+        self._cells.setdefault(cell, []).append((issue_id, lat, lng, fp, created_ts))
+        self._cell_of[issue_id] = cell
+
+    def add(self, issue_id: int, lat: float, lng: float, fp: int, created_ts: float) -> None:
+        with self._lock:
+            self._add_locked(issue_id, lat, lng, fp, created_ts)
+
+    def _remove_locked(self, issue_id: int) -> None:
+        cell = self._cell_of.pop(issue_id, None)
+        if cell is None:
+            return
+        bucket = [e for e in self._cells.get(cell, []) if e[0] != issue_id]
+        if bucket:
+            self._cells[cell] = bucket
+        else:
+            self._cells.pop(cell, None)
+
+    def remove(self, issue_id: int) -> None:
+        with self._lock:
+            self._remove_locked(issue_id)
+
+    def find(self, text: str, lat: float, lng: float) -> Optional[int]:
+        """Return the id of the closest matching canonical issue, or None."""
+        fp = simhash(text)
+        if fp == 0:
+            return None
+        cutoff = time.time() - self.window_s
+        best: Optional[Tuple[int, float, int]] = None  # (hamming, dist_km, issue_id)
+        with self._lock:
+            for cell in self._neighbour_cells(lat, lng):
+                bucket = self._cells.get(cell)
+                if not bucket:
+                    continue
+                # Drop entries that fell out of the time window while we're here
+                fresh = [e for e in bucket if e[4] >= cutoff]
+                if len(fresh) != len(bucket):
+                    for e in bucket:
+                        if e[4] < cutoff:
+                            self._cell_of.pop(e[0], None)
+                    if fresh:
+                        self._cells[cell] = fresh
+                    else:
+                        self._cells.pop(cell, None)
+                for issue_id, e_lat, e_lng, e_fp, _ in fresh:
+                    hd = hamming(fp, e_fp)
+                    if hd > self.max_hamming:
+                        continue
+                    dist = haversine_km(lat, lng, e_lat, e_lng)
+                    if dist > self.radius_km:
+                        continue
+                    cand = (hd, dist, issue_id)
+                    if best is None or cand < best:
+                        best = cand
+        return best[2] if best else None
+
+
+_index = DuplicateIndex(
+    radius_m=settings.DEDUP_RADIUS_M,
+    window_hours=settings.DEDUP_WINDOW_HOURS,
+    max_hamming=settings.DEDUP_MAX_HAMMING,
+)
+
+
+def find_duplicate(db: Session, *, title: str, description: str,
+                   lat: Optional[float], lng: Optional[float]) -> Optional[Issue]:
+    """Return the canonical issue a new report duplicates, if any."""
+    if not settings.DEDUP_ENABLED or lat is None or lng is None:
+        return None
+    _index.ensure_loaded(db)
+    issue_id = _index.find(f"{title} {description}", lat, lng)
+    if issue_id is None:
+        return None
+    canonical = db.get(Issue, issue_id)
+    if canonical is None:
+        _forget(issue_id)
+    return canonical
+
+
+def bump_cluster(db: Session, canonical_id: int) -> None:
+    """Count one more report against a cluster's canonical issue."""
+    # Atomic increment so concurrent reports of the same incident don't lose counts
+    db.query(Issue).filter(Issue.id == canonical_id).update(
+        {Issue.duplicate_count: func.coalesce(Issue.duplicate_count, 0) + 1},
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def register_issue(issue: Issue) -> None:
+    """Make a freshly created canonical issue matchable by later reports (on every worker)."""
+    if not settings.DEDUP_ENABLED or issue.lat is None or issue.lng is None or issue.duplicate_of_id is not None:
+        return
+    entry = [issue.lat, issue.lng, simhash(f"{issue.title} {issue.description}"), _ts(issue.created_at)]
+    _index.add(issue.id, *entry)
+    broadcast.send("dedup_add", str(issue.id), json.dumps(entry))
+
+
+def _forget(issue_id: int) -> None:
+    _index.remove(issue_id)
+    broadcast.send("dedup_remove", str(issue_id), "")
+
+
+def unregister_issue(db: Session, issue: Issue) -> Optional[Issue]:
+    """Detach a deleted issue from its cluster (doesn't commit).
+
+    A duplicate is uncounted from its root. A canonical issue's duplicates are
+    re-rooted on the oldest of them, which is returned: pass it to
+    register_issue() after the commit so later reports match the cluster again.
+    """
+    _forget(issue.id)
+    if issue.duplicate_of_id:
+        db.query(Issue).filter(Issue.id == issue.duplicate_of_id).update(
+            {Issue.duplicate_count: case((Issue.duplicate_count > 0, Issue.duplicate_count - 1), else_=0)},
+            synchronize_session=False,
+        )
+        return None
+    dup_ids = [r.id for r in db.query(Issue.id).filter(Issue.duplicate_of_id == issue.id).order_by(Issue.id)]
+    if not dup_ids:
+        return None
+    new_root_id, rest = dup_ids[0], dup_ids[1:]
+    db.query(Issue).filter(Issue.id == new_root_id).update(
+        {Issue.duplicate_of_id: None, Issue.duplicate_count: len(rest)}, synchronize_session=False
+    )
+    if rest:
+        db.query(Issue).filter(Issue.id.in_(rest)).update(
+            {Issue.duplicate_of_id: new_root_id}, synchronize_session=False
+        )
+    new_root = db.get(Issue, new_root_id)
+    if new_root is not None:
+        db.refresh(new_root)
+    return new_root
+
+
+def cluster_root(db: Session, issue: Issue) -> Issue:
+    """Return the canonical issue of the cluster `issue` belongs to."""
+    if issue.duplicate_of_id:
+        root = db.get(Issue, issue.duplicate_of_id)
+        if root is not None:
+            return root
+    return issue
+
+
+# Index changes from other workers
+def _remote_add(topic: str, message: str) -> None:
+    lat, lng, fp, created_ts = json.loads(message)
+    _index.add(int(topic), float(lat), float(lng), int(fp), float(created_ts))
+
+
+broadcast.register("dedup_add", _remote_add)
+broadcast.register("dedup_remove", lambda topic, _message: _index.remove(int(topic)))
@@ -0,0 +1,312 @@
+# backend/app/services/dispatch_service.py
+"""
+Sequential dispatch for auto-assigned bookings.
+
+A booking created by /bookings/auto carries an ordered `dispatch_queue` of
+provider ids. The current provider gets DISPATCH_ACCEPT_TIMEOUT_SECONDS to
+act on the offer (Booking.offer_expires_at). After that, or on an explicit
+decline, the offer moves to the next eligible provider in the queue.
+
+In broadcast mode (DISPATCH_MODE / BookingAutoCreate.dispatch_mode) the
+nearest DISPATCH_BROADCAST_FANOUT providers all get the offer at once, over
+their `provider:{id}` WebSocket topic and a push to Provider.fcm_token. The
+booking stays "offered" until one of them accepts. The first accept wins
+through a compare-and-set on status; the others get an "offer_cancelled"
+event. If nobody accepts before the deadline, the booking is declined.
+
+Pending offers sit in an in-memory heap served by one daemon thread. The heap
+is rebuilt from `offer_expires_at` at startup, so a restart loses no
+timeouts. A timeout that fails (e.g. the database is briefly unavailable) is
+logged and retried with exponential backoff. Every move is a compare-and-set on (status, dispatch_idx), so two
+workers (or a timeout racing an accept) can never both move the same offer.
+"""
+from __future__ import annotations
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models.booking import Booking
+from ..models.provider import Provider
+from . import live_location, notify_service
+from .realtime import hub
+
+log = logging.getLogger(__name__)
+
+OFFER_STATUS = "requested"
+OFFERED_STATUS = "offered"  # broadcast mode: open to every provider in the queue
+
+# Called with (db, booking, previous_provider_id) after the scheduler moved or
+# expired an offer (e.g. to broadcast it)
+_listeners: List[Callable[[Session, Booking, int], None]] = []
+
+
+def on_reassigned(fn: Callable[[Session, Booking, int], None]) -> None:
+    _listeners.append(fn)
+
+
+def offer_deadline() -> datetime:
+    # Naive UTC, like the other timestamps we write ourselves (e.g. rated_at)
+    return datetime.utcnow() + timedelta(seconds=settings.DISPATCH_ACCEPT_TIMEOUT_SECONDS)
+
+
+def _epoch(dt: datetime) -> float:
+    if dt.tzinfo is None:
+        return (dt - datetime(1970, 1, 1)).total_seconds()
+    return dt.timestamp()
+
+
+def _eligible(p: Optional[Provider]) -> bool:
+    return bool(p and p.active and p.lat is not None and p.lng is not None)
+
+
+def provider_topic(provider_id: int) -> str:
+    return f"provider:{provider_id}"
+
+
+def notify_providers(db: Session, provider_ids: List[int], message: dict) -> None:
+    """Send an event to each provider's feed (replayable, see /bookings/ws/provider) and push."""
+    for pid in provider_ids:
+        hub.publish_event(provider_topic(pid), message)
+    # Apps in the background only see pushes
+    push = {"type": message["type"], "booking_id": message.get("booking_id")}
+    rows = (
+        db.query(Provider.fcm_token)
+        .filter(Provider.id.in_(provider_ids), Provider.fcm_token.isnot(None))
+        .all()
+    ) if provider_ids else []
+    for row in rows:
+        try:
+            notify_service.push_to_device(row.fcm_token, push)
+        except Exception as e:
+            log.warning("push to provider device failed: %s", e)  # best-effort: the feed event is still there on reconnect
+
+
+# ---------- broadcast offers ----------
+
+def send_offers(db: Session, b: Booking, booking_payload: dict) -> None:
+    """Offer an "offered" booking to every provider in its queue."""
+    notify_providers(
+        db,
+        list(b.dispatch_queue or []),
+        {"type": "offer", "booking_id": b.id, "expires_at": b.offer_expires_at and b.offer_expires_at.isoformat(),
+         "booking": booking_payload},
+    )
+
+
+def cancel_offers(db: Session, b: Booking, *, reason: str, keep: Optional[int] = None) -> None:
+    """Tell the providers that held the offer it is gone (`keep`: the provider that took it)."""
+    others = [pid for pid in (b.dispatch_queue or []) if pid != keep]
+    notify_providers(db, others, {"type": "offer_cancelled", "booking_id": b.id, "reason": reason})
+
+
+def claim_offer(db: Session, b: Booking, provider_id: int) -> Optional[Booking]:
+    """First accept wins: compare-and-set "offered" -> "accepted" for `provider_id`.
+
+    Returns the refreshed booking, or None if another provider (or the
+    timeout, or the customer) got there first.
+    """
+    queue = list(b.dispatch_queue or [])
+    won = db.query(Booking).filter(
+        Booking.id == b.id,
+        Booking.status == OFFERED_STATUS,
+    ).update(
+        {
+            Booking.provider_id: provider_id,
+            Booking.status: "accepted",
+            Booking.dispatch_idx: queue.index(provider_id),
+            Booking.offer_expires_at: None,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    if not won:
+        return None
+    db.refresh(b)
+    live_location.reassigned(b.id)
+    cancel_offers(db, b, reason="taken", keep=provider_id)
+    return b
+
+
+def _expire_broadcast(db: Session, b: Booking) -> Optional[Booking]:
+    won = db.query(Booking).filter(
+        Booking.id == b.id,
+        Booking.status == OFFERED_STATUS,
+    ).update({Booking.status: "declined", Booking.offer_expires_at: None}, synchronize_session=False)
+    db.commit()
+    if not won:
+        return None
+    db.refresh(b)
+    live_location.forget(b.id)
+    cancel_offers(db, b, reason="expired")
+    return b
+
+
+def advance_dispatch(
+    db: Session,
+    b: Booking,
+    *,
+    exhausted_status: Optional[str] = None,
+) -> Optional[Booking]:
+    """Move the offer to the next eligible provider in the queue.
+
+    When the queue is exhausted the booking keeps its provider and its status
+    becomes `exhausted_status` (if given). Returns the refreshed booking, or None
+    if someone else changed the booking first (the compare-and-set lost).
+    """
+    queue = list(b.dispatch_queue or [])
+    idx = int(b.dispatch_idx or 0)
+    remaining = queue[idx + 1:]
+    # One query for every candidate instead of one get() per queue entry
+    providers: Dict[int, Provider] = (
+        {p.id: p for p in db.query(Provider).filter(Provider.id.in_(remaining)).all()} if remaining else {}
+    )
+    next_idx = next((i for i in range(idx + 1, len(queue)) if _eligible(providers.get(queue[i]))), None)
+
+    if next_idx is not None:
+        values = {
+            Booking.provider_id: queue[next_idx],
+            Booking.status: OFFER_STATUS,
+            Booking.dispatch_idx: next_idx,
+            Booking.offer_expires_at: offer_deadline(),
+            # reset live location and previous offer when reassigning
+            Booking.provider_live_lat: None,
+            Booking.provider_live_lng: None,
+            Booking.eta_minutes: None,
+            Booking.price_amount: None,
+            Booking.price_currency: None,
+        }
+    else:
+        values = {Booking.offer_expires_at: None}
+        if exhausted_status:
+            values[Booking.status] = exhausted_status
+
+    won = db.query(Booking).filter(
+        Booking.id == b.id,
+        Booking.status == b.status,
+        func.coalesce(Booking.dispatch_idx, 0) == idx,
+    ).update(values, synchronize_session=False)
+    db.commit()
+    if not won:
+        return None
+
+    db.refresh(b)
+    if next_idx is not None:
+        # Bulk UPDATE bypasses ORM events: drop the old provider's cached ownership and live fix
+        live_location.reassigned(b.id)
+        scheduler.schedule(b.id, next_idx, b.offer_expires_at)
+    elif exhausted_status in live_location.TERMINAL_STATUSES:
+        live_location.forget(b.id)
+    return b
+
+
+def _expire_offer(booking_id: int, idx: int) -> None:
+    db = SessionLocal()
+    try:
+        b = db.query(Booking).get(booking_id)
+        if b is None or b.offer_expires_at is None or _epoch(b.offer_expires_at) > time.time() + 0.5:
+            return  # acted on or extended meanwhile
+        previous = b.provider_id
+        if b.status == OFFERED_STATUS:
+            moved = _expire_broadcast(db, b)
+        elif b.status == OFFER_STATUS and int(b.dispatch_idx or 0) == idx:
+            moved = advance_dispatch(db, b)
+        else:
+            return  # accepted or moved on meanwhile
+        if moved is not None:
+            for fn in _listeners:
+                try:
+                    fn(db, moved, previous)
+                except Exception:
+                    # The offer already moved; a failed announcement must not stop the dispatcher
+                    log.exception("dispatch listener failed for booking %s", booking_id)
+    finally:
+        db.close()
+
+
+class DispatchScheduler:
+    """Min-heap of (due_ts, booking_id, dispatch_idx, attempt) served by a daemon thread.
+
+    Entries are never removed early; a stale one is recognised when it fires.
+    """
+
+    RETRY_BASE_S = 1.0
+    RETRY_MAX_S = 60.0
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, int, int]] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, booking_id: int, idx: int, due: Optional[datetime]) -> None:
+        if due is None:
+            return
+        with self._cond:
+            heapq.heappush(self._heap, (_epoch(due), booking_id, idx, 0))
+            self._cond.notify()
+
+    def _retry(self, booking_id: int, idx: int, attempt: int) -> float:
+        delay = min(self.RETRY_BASE_S * (2 ** attempt), self.RETRY_MAX_S)
+        with self._cond:
+            heapq.heappush(self._heap, (time.time() + delay, booking_id, idx, attempt + 1))
+            self._cond.notify()
+        return delay
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="dispatch-scheduler", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                due, booking_id, idx, attempt = self._heap[0]
+                delay = due - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+            try:
+                _expire_offer(booking_id, idx)
+            except Exception:
+                # Keep serving other offers; this one must not stay stuck in "offer"
+                delay = self._retry(booking_id, idx, attempt)
+                log.exception("offer timeout failed for booking %s (attempt %d); retrying in %.1fs",
+                              booking_id, attempt + 1, delay)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+
+scheduler = DispatchScheduler()
+
+
+def start() -> None:
+    """Reload pending offers from the DB and start the timer thread (idempotent)."""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Booking.id, Booking.dispatch_idx, Booking.offer_expires_at)
+            .filter(Booking.status.in_((OFFER_STATUS, OFFERED_STATUS)), Booking.offer_expires_at.isnot(None))
+            .all()
+        )
+    except Exception:
+        # e.g. migrate_add_booking_offer_expiry.py not run yet; new offers still get timers
+        log.exception("dispatch recovery skipped")
+        rows = []
+    finally:
+        db.close()
+    for r in rows:
+        scheduler.schedule(r.id, int(r.dispatch_idx or 0), r.offer_expires_at)
+    scheduler.start()
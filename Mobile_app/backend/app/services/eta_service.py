@@ -0,0 +1,419 @@
+# backend/app/services/eta_service.py
+"""
+Arrival-time estimates from a provider's live position to the consumer.
+
+Two engines, no network calls:
+- Road graph (optional, ETA_GRAPH_PATH): an OSM XML extract (.osm) or a
+  pre-converted JSON graph. Routing is A* with ALT (landmark) lower bounds.
+  The landmark distance tables are computed once and saved next to the graph
+  as `<graph>.alt.npz` (plain arrays plus a fingerprint of the graph file),
+  so later boots just load them. The graph loads on a
+  background thread; until it is ready, or when a point is far from any road,
+  the grid engine answers.
+- Speed grid: haversine distance x ETA_DETOUR_FACTOR at a speed learned per
+  tile (ETA_SPEED_CELL_ZOOM) from consecutive provider GPS fixes, with
+  ETA_DEFAULT_SPEED_KMH for tiles without data.
+
+Estimates are cached per (origin tile, destination tile) at ETA_CACHE_ZOOM.
+A moving provider therefore costs one route computation per tile change,
+not one per ping.
+
+JSON graph format:
+    {"nodes": [[id, lat, lng], ...],
+     "edges": [[from_id, to_id, length_m | null, speed_kmh | null, oneway], ...]}
+"""
+from __future__ import annotations
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import settings
+from .map_service import tile_xy
+from .provider_service import haversine_km
+
+log = logging.getLogger(__name__)
+
+INF = float("inf")
+
+# Typical urban speeds per OSM highway class (km/h), used when a way has no maxspeed
+HIGHWAY_SPEEDS_KMH = {
+    "motorway": 80, "motorway_link": 50, "trunk": 60, "trunk_link": 40,
+    "primary": 40, "primary_link": 30, "secondary": 35, "secondary_link": 25,
+    "tertiary": 30, "tertiary_link": 25, "unclassified": 25, "residential": 20,
+    "living_street": 10, "service": 15, "road": 20,
+}
+
+
+class Eta(NamedTuple):
+    seconds: float
+    source: str  # "graph" | "grid"
+
+    @property
+    def minutes(self) -> int:
+        return max(1, int(math.ceil(self.seconds / 60.0)))
+
+
+# ---------- road graph ----------
+class RoadGraph:
+    SNAP_CELL_DEG = 0.01  # ~1 km buckets for nearest-node lookup
+
+    def __init__(self, lat: Sequence[float], lng: Sequence[float], edges: Sequence[Tuple[int, int, float]]):
+        """`edges`: directed (u, v, seconds) over node indexes 0..n-1."""
+        self.n = len(lat)
+        self.lat = array("d", lat)
+        self.lng = array("d", lng)
+        self.adj: List[List[Tuple[int, float]]] = [[] for _ in range(self.n)]
+        self.radj: List[List[Tuple[int, float]]] = [[] for _ in range(self.n)]
+        for u, v, w in edges:
+            self.adj[u].append((v, w))
+            self.radj[v].append((u, w))
+        self._buckets: Dict[Tuple[int, int], List[int]] = {}
+        for i in range(self.n):
+            if self.adj[i] or self.radj[i]:
+                self._buckets.setdefault(self._cell(self.lat[i], self.lng[i]), []).append(i)
+        # ALT tables: d(L, v) and d(v, L) per landmark
+        self.lm_from: List[array] = []
+        self.lm_to: List[array] = []
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (int(math.floor(lat / self.SNAP_CELL_DEG)), int(math.floor(lng / self.SNAP_CELL_DEG)))
+
+    def nearest(self, lat: float, lng: float, max_m: float) -> Optional[Tuple[int, float]]:
+        """Closest routable node within `max_m` metres: (index, metres)."""
+        cx, cy = self._cell(lat, lng)
+        reach = int(math.ceil(max_m / 1000.0 / (self.SNAP_CELL_DEG * 111.0))) + 1
+        best, best_m = -1, INF
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                for i in self._buckets.get((cx + dx, cy + dy), ()):
+                    d = haversine_km(lat, lng, self.lat[i], self.lng[i]) * 1000.0
+                    if d < best_m:
+                        best, best_m = i, d
+        return (best, best_m) if best >= 0 and best_m <= max_m else None
+
+    # ----- shortest paths -----
+    def _dijkstra(self, source: int, reverse: bool = False) -> array:
+        adj = self.radj if reverse else self.adj
+        dist = array("d", [INF]) * self.n
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, w in adj[u]:
+                nd = d + w
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return dist
+
+    def build_landmarks(self, k: int) -> None:
+        """Farthest-point landmark selection, then forward/backward distance tables."""
+        self.lm_from, self.lm_to = [], []
+        nodes = [i for i in range(self.n) if self.adj[i]]
+        if not nodes or k <= 0:
+            return
+        # Start from the node farthest from an arbitrary one
+        seed = self._dijkstra(nodes[0])
+        current = max(nodes, key=lambda i: seed[i] if seed[i] < INF else -1)
+        closest = array("d", [INF]) * self.n
+        for _ in range(min(k, len(nodes))):
+            d_from = self._dijkstra(current)
+            self.lm_from.append(d_from)
+            self.lm_to.append(self._dijkstra(current, reverse=True))
+            for i in nodes:
+                if d_from[i] < closest[i]:
+                    closest[i] = d_from[i]
+            current = max(nodes, key=lambda i: closest[i] if closest[i] < INF else -1)
+            if closest[current] <= 0:
+                break
+
+    def _lower_bound(self, v: int, t: int) -> float:
+        h = 0.0
+        for d_from, d_to in zip(self.lm_from, self.lm_to):
+            # Triangle inequality in both directions; skip landmarks that can't reach
+            a, b = d_from[t], d_from[v]
+            if a < INF and b < INF and a - b > h:
+                h = a - b
+            a, b = d_to[v], d_to[t]
+            if a < INF and b < INF and a - b > h:
+                h = a - b
+        return h
+
+    def route_seconds(self, s: int, t: int, max_settled: int) -> Optional[float]:
+        """A* with landmark bounds. None if unreachable or the search budget runs out."""
+        if s == t:
+            return 0.0
+        g: Dict[int, float] = {s: 0.0}
+        heap = [(self._lower_bound(s, t), s)]
+        settled = set()
+        while heap:
+            _f, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            if u == t:
+                return g[u]
+            settled.add(u)
+            if len(settled) > max_settled:
+                return None
+            gu = g[u]
+            for v, w in self.adj[u]:
+                ng = gu + w
+                if ng < g.get(v, INF):
+                    g[v] = ng
+                    heapq.heappush(heap, (ng + self._lower_bound(v, t), v))
+        return None
+
+
+def _speed_kmh(tags: Dict[str, str]) -> float:
+    raw = (tags.get("maxspeed") or "").split(";")[0].strip().lower()
+    try:
+        if raw.endswith("mph"):
+            return float(raw[:-3]) * 1.609
+        if raw:
+            return float(raw.split()[0])
+    except ValueError:
+        pass
+    return float(HIGHWAY_SPEEDS_KMH.get(tags.get("highway", ""), settings.ETA_DEFAULT_SPEED_KMH))
+
+
+def _read_osm(path: str):
+    """Yield ("node", id, lat, lng) and ("way", [node ids], tags) from an OSM XML extract."""
+    for _event, el in ET.iterparse(path, events=("end",)):
+        if el.tag == "node":
+            yield "node", el.get("id"), float(el.get("lat")), float(el.get("lon"))
+            el.clear()
+        elif el.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in el.findall("tag")}
+            if tags.get("highway") in HIGHWAY_SPEEDS_KMH:
+                yield "way", [nd.get("ref") for nd in el.findall("nd")], tags
+            el.clear()
+
+
+def load_graph(path: str) -> RoadGraph:
+    index: Dict[str, int] = {}
+    lat: List[float] = []
+    lng: List[float] = []
+    raw_edges: List[Tuple[str, str, Optional[float], float, bool]] = []
+
+    def node(nid, la, ln):
+        index[str(nid)] = len(lat)
+        lat.append(float(la))
+        lng.append(float(ln))
+
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for nid, la, ln in data.get("nodes", []):
+            node(nid, la, ln)
+        for e in data.get("edges", []):
+            u, v, length_m, speed = e[0], e[1], e[2] if len(e) > 2 else None, e[3] if len(e) > 3 else None
+            oneway = bool(e[4]) if len(e) > 4 else False
+            raw_edges.append((str(u), str(v), length_m, float(speed or settings.ETA_DEFAULT_SPEED_KMH), oneway))
+    else:
+        for item in _read_osm(path):
+            if item[0] == "node":
+                node(*item[1:])
+            else:
+                refs, tags = item[1], item[2]
+                speed = _speed_kmh(tags)
+                oneway = tags.get("oneway") in ("yes", "1", "true") or tags.get("junction") == "roundabout"
+                for a, b in zip(refs, refs[1:]):
+                    raw_edges.append((a, b, None, speed, oneway))
+
+    edges: List[Tuple[int, int, float]] = []
+    for a, b, length_m, speed, oneway in raw_edges:
+        u, v = index.get(a), index.get(b)
+        if u is None or v is None or speed <= 0:
+            continue
+        if length_m is None:
+            length_m = haversine_km(lat[u], lng[u], lat[v], lng[v]) * 1000.0
+        seconds = float(length_m) / (speed / 3.6)
+        edges.append((u, v, seconds))
+        if not oneway:
+            edges.append((v, u, seconds))
+    return RoadGraph(lat, lng, edges)
+
+
+def _graph_fingerprint(path: str, graph: RoadGraph, k: int) -> bytes:
+    """Digest of the graph file's bytes and the landmark settings the tables were built with."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    h.update(f"|{graph.n}|{k}".encode())
+    return h.digest()
+
+
+def _load_or_build_landmarks(graph: RoadGraph, path: str, k: int) -> None:
+    fingerprint = np.frombuffer(_graph_fingerprint(path, graph, k), dtype=np.uint8)
+    sidecar = f"{path}.alt.npz"
+    try:
+        with np.load(sidecar, allow_pickle=False) as saved:
+            lm_from, lm_to = saved["lm_from"], saved["lm_to"]
+            if (np.array_equal(saved["fingerprint"], fingerprint)
+                    and lm_from.shape == lm_to.shape and lm_from.ndim == 2 and lm_from.shape[1] == graph.n):
+                graph.lm_from = [array("d", row.astype(np.float64).tobytes()) for row in lm_from]
+                graph.lm_to = [array("d", row.astype(np.float64).tobytes()) for row in lm_to]
+                return
+    except (OSError, KeyError, ValueError):
+        pass
+    graph.build_landmarks(k)
+    tmp = f"{sidecar}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                fingerprint=fingerprint,
+                lm_from=np.array(graph.lm_from, dtype=np.float64).reshape(len(graph.lm_from), graph.n),
+                lm_to=np.array(graph.lm_to, dtype=np.float64).reshape(len(graph.lm_to), graph.n),
+            )
+        os.replace(tmp, sidecar)
+    except OSError as e:
+        log.warning("could not save landmark index %s: %s", sidecar, e)
+
+
+# ---------- learned speeds ----------
+class SpeedGrid:
+    """EMA of observed provider speed per tile, plus a global EMA."""
+
+    ALPHA = 0.2
+    MIN_KMH, MAX_KMH = 2.0, 120.0
+
+    def __init__(self, zoom: int, default_kmh: float):
+        self.zoom = zoom
+        self.default_kmh = default_kmh
+        self._cells: Dict[Tuple[int, int], float] = {}
+        self._global: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def observe(self, a: Tuple[float, float, float], b: Tuple[float, float, float]) -> None:
+        """Learn from two consecutive fixes (lat, lng, epoch seconds)."""
+        dt = b[2] - a[2]
+        if dt < 5 or dt > 600:
+            return  # too close to measure, or a gap (the provider stopped / app was closed)
+        km = haversine_km(a[0], a[1], b[0], b[1])
+        if km < 0.02:
+            return  # standing still says nothing about road speed
+        kmh = km / (dt / 3600.0)
+        if not (self.MIN_KMH <= kmh <= self.MAX_KMH):
+            return  # GPS jump
+        cell = tile_xy((a[0] + b[0]) / 2, (a[1] + b[1]) / 2, self.zoom)
+        with self._lock:
+            prev = self._cells.get(cell)
+            self._cells[cell] = kmh if prev is None else prev + self.ALPHA * (kmh - prev)
+            g = self._global
+            self._global = kmh if g is None else g + self.ALPHA * (kmh - g)
+
+    def speed_kmh(self, lat: float, lng: float) -> float:
+        with self._lock:
+            return self._cells.get(tile_xy(lat, lng, self.zoom)) or self._global or self.default_kmh
+
+
+# ---------- engine ----------
+class EtaEngine:
+    def __init__(self):
+        self.graph: Optional[RoadGraph] = None
+        self.speeds = SpeedGrid(settings.ETA_SPEED_CELL_ZOOM, settings.ETA_DEFAULT_SPEED_KMH)
+        self._cache: "OrderedDict[tuple, Tuple[float, Eta]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loader: Optional[threading.Thread] = None
+
+    def load(self, path: str) -> None:
+        t0 = time.monotonic()
+        graph = load_graph(path)
+        _load_or_build_landmarks(graph, path, settings.ETA_LANDMARKS)
+        self.graph = graph
+        with self._lock:
+            self._cache.clear()
+        log.info("ETA road graph: %d nodes, %d landmarks, loaded in %.1fs",
+                 graph.n, len(graph.lm_from), time.monotonic() - t0)
+
+    def start(self) -> None:
+        path = settings.ETA_GRAPH_PATH
+        if not path or self._loader is not None:
+            return
+        if not os.path.exists(path):
+            log.warning("ETA_GRAPH_PATH %s not found; using the speed grid only", path)
+            return
+
+        def run():
+            try:
+                self.load(path)
+            except Exception:
+                log.exception("loading ETA road graph failed; using the speed grid only")
+
+        self._loader = threading.Thread(target=run, name="eta-graph-load", daemon=True)
+        self._loader.start()
+
+    def _grid(self, o_lat, o_lng, d_lat, d_lng) -> Eta:
+        km = haversine_km(o_lat, o_lng, d_lat, d_lng) * settings.ETA_DETOUR_FACTOR
+        kmh = (self.speeds.speed_kmh(o_lat, o_lng) + self.speeds.speed_kmh(d_lat, d_lng)) / 2.0
+        return Eta(km / kmh * 3600.0, "grid")
+
+    def _route(self, o_lat, o_lng, d_lat, d_lng) -> Optional[Eta]:
+        graph = self.graph
+        if graph is None:
+            return None
+        snap_m = settings.ETA_SNAP_MAX_METERS
+        s, t = graph.nearest(o_lat, o_lng, snap_m), graph.nearest(d_lat, d_lng, snap_m)
+        if s is None or t is None:
+            return None
+        seconds = graph.route_seconds(s[0], t[0], settings.ETA_MAX_SETTLED_NODES)
+        if seconds is None:
+            return None
+        # Off-road legs to/from the snapped nodes at the local learned speed
+        off_road_s = (s[1] + t[1]) / 1000.0 / self.speeds.speed_kmh(o_lat, o_lng) * 3600.0
+        return Eta(seconds + off_road_s, "graph")
+
+    def estimate(self, o_lat: float, o_lng: float, d_lat: float, d_lng: float) -> Eta:
+        z = settings.ETA_CACHE_ZOOM
+        key = (tile_xy(o_lat, o_lng, z), tile_xy(d_lat, d_lng, z))
+        now = time.monotonic()
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None and hit[0] > now:
+                self._cache.move_to_end(key)
+                return hit[1]
+        eta = self._route(o_lat, o_lng, d_lat, d_lng) or self._grid(o_lat, o_lng, d_lat, d_lng)
+        with self._lock:
+            self._cache[key] = (now + settings.ETA_CACHE_TTL_SECONDS, eta)
+            self._cache.move_to_end(key)
+            while len(self._cache) > settings.ETA_CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+        return eta
+
+
+_engine = EtaEngine()
+
+
+def start() -> None:
+    """Load the road graph in the background if ETA_GRAPH_PATH is set (idempotent)."""
+    _engine.start()
+
+
+def estimate(o_lat, o_lng, d_lat, d_lng) -> Optional[Eta]:
+    if None in (o_lat, o_lng, d_lat, d_lng):
+        return None
+    return _engine.estimate(float(o_lat), float(o_lng), float(d_lat), float(d_lng))
+
+
+def observe(prev: Optional[Tuple[float, float, float]], fixes: Sequence[Tuple[float, float, float]]) -> None:
+    """Learn road speeds from a provider's consecutive fixes (time-ordered)."""
+    last = prev
+    for f in fixes:
+        if last is not None:
+            _engine.speeds.observe(last, f)
+        last = f
@@ -146,6 +146,8 @@ def try_auto_assign_worker_for_issue(db: Session, issue_id: int):
         issue.status = "assigned"
         db.commit()
         db.refresh(issue)
+        from .map_service import on_issue_status
+        on_issue_status(issue)
     except Exception:
         db.rollback()
     return booking
\ No newline at end of file
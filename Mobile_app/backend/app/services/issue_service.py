@@ -24,11 +24,13 @@ def create_issue(
     lat: Optional[float],
     lng: Optional[float],
     image_url: Optional[str],
-    ai: Optional[Dict[str, Any]]
+    ai: Optional[Dict[str, Any]],
+    duplicate_of_id: Optional[int] = None,
 ) -> Issue:
     issue = Issue(
         user_id=user_id, title=title, description=description,
-        lat=lat, lng=lng, image_url=image_url, ai=ai
+        lat=lat, lng=lng, image_url=image_url, ai=ai,
+        duplicate_of_id=duplicate_of_id,
     )
     db.add(issue)
     db.commit()
@@ -0,0 +1,264 @@
+# backend/app/services/live_location.py
+"""
+Live provider location for active bookings, kept in memory.
+
+GPS pings (REST or the booking WebSocket) only update this store and fan out
+an event; nothing is committed per ping. The latest fix of every booking is
+written to bookings.provider_live_lat/lng:
+- in one batched UPDATE every LIVE_LOCATION_PERSIST_SECONDS, and
+- immediately when the booking's status changes (same commit as the status).
+
+Fixes, the last full booking snapshot, and "who may report for booking X" are
+shared with other workers over services/broadcast.py, so every worker can
+answer polls with the fresh position. Only the worker that received a ping
+persists it.
+"""
+from __future__ import annotations
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models.booking import Booking
+from ..models.provider import Provider
+from . import broadcast
+
+log = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"completed", "canceled", "cancelled", "declined"}
+
+
+class LiveLocationStore:
+    def __init__(self, persist_every_s: float, assignee_ttl_s: float):
+        self.persist_every_s = persist_every_s
+        self.assignee_ttl_s = assignee_ttl_s
+        # booking_id -> (lat, lng, ts)
+        self._fixes: Dict[int, Tuple[float, float, float]] = {}
+        self._dirty: set = set()
+        # booking_id -> full BookingOut payload (last status broadcast)
+        self._snapshots: Dict[int, dict] = {}
+        # booking_id -> (provider user_id, expires_at)
+        self._assignees: Dict[int, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+
+    # ---------- fixes ----------
+    def set_fix(self, booking_id: int, lat: float, lng: float, ts: float, *, local: bool) -> None:
+        with self._lock:
+            prev = self._fixes.get(booking_id)
+            if prev is not None and prev[2] > ts:
+                return  # out-of-order ping
+            self._fixes[booking_id] = (lat, lng, ts)
+            if local:
+                self._dirty.add(booking_id)
+        if local:
+            self._ensure_flusher()
+
+    def fix(self, booking_id: int) -> Optional[Tuple[float, float, float]]:
+        with self._lock:
+            return self._fixes.get(booking_id)
+
+    def take_dirty(self, booking_id: Optional[int] = None) -> Dict[int, Tuple[float, float, float]]:
+        with self._lock:
+            ids = [booking_id] if booking_id is not None else list(self._dirty)
+            out = {}
+            for bid in ids:
+                if bid in self._dirty:
+                    self._dirty.discard(bid)
+                    out[bid] = self._fixes[bid]
+            return out
+
+    def forget(self, booking_id: int) -> None:
+        with self._lock:
+            self._fixes.pop(booking_id, None)
+            self._dirty.discard(booking_id)
+            self._snapshots.pop(booking_id, None)
+
+    # ---------- snapshots ----------
+    def set_snapshot(self, booking_id: int, payload: dict) -> None:
+        with self._lock:
+            self._snapshots[booking_id] = payload
+
+    def snapshot(self, booking_id: int) -> Optional[dict]:
+        with self._lock:
+            return self._snapshots.get(booking_id)
+
+    def drop_snapshot(self, booking_id: int) -> None:
+        with self._lock:
+            self._snapshots.pop(booking_id, None)
+
+    # ---------- assignees ----------
+    def assignee(self, booking_id: int) -> Optional[int]:
+        with self._lock:
+            hit = self._assignees.get(booking_id)
+            if hit is None or hit[1] < time.monotonic():
+                return None
+            return hit[0]
+
+    def set_assignee(self, booking_id: int, user_id: int) -> None:
+        with self._lock:
+            self._assignees[booking_id] = (user_id, time.monotonic() + self.assignee_ttl_s)
+
+    def drop_assignee(self, booking_id: int) -> None:
+        with self._lock:
+            self._assignees.pop(booking_id, None)
+
+    # ---------- background persistence ----------
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="live-location-flush", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.persist_every_s)
+            try:
+                flush_pending()
+            except Exception:
+                # keep the thread alive; the fixes stay in memory and are retried
+                log.exception("live location flush failed")
+
+
+_store = LiveLocationStore(
+    persist_every_s=settings.LIVE_LOCATION_PERSIST_SECONDS,
+    assignee_ttl_s=settings.LIVE_LOCATION_ASSIGNEE_TTL_SECONDS,
+)
+
+_UPDATE_SQL = text("UPDATE bookings SET provider_live_lat = :lat, provider_live_lng = :lng WHERE id = :id")
+
+
+def flush_pending() -> int:
+    """Write every unpersisted fix in one transaction. Returns the number of bookings written."""
+    dirty = _store.take_dirty()
+    if not dirty:
+        return 0
+    db = SessionLocal()
+    try:
+        db.execute(_UPDATE_SQL, [{"id": bid, "lat": f[0], "lng": f[1]} for bid, f in dirty.items()])
+        db.commit()
+    except Exception:
+        db.rollback()
+        with _store._lock:
+            _store._dirty.update(bid for bid in dirty if bid in _store._fixes)
+        raise
+    finally:
+        db.close()
+    return len(dirty)
+
+
+# ---------- public API ----------
+def assigned_user_id(db: Session, booking_id: int) -> Optional[int]:
+    """User id of the booking's assigned provider (cached), or None if the booking doesn't exist."""
+    uid = _store.assignee(booking_id)
+    if uid is not None:
+        return uid
+    row = (
+        db.query(Provider.user_id)
+        .join(Booking, Booking.provider_id == Provider.id)
+        .filter(Booking.id == booking_id)
+        .first()
+    )
+    if row is None:
+        return None
+    _store.set_assignee(booking_id, row.user_id)
+    return row.user_id
+
+
+def record_fix(booking_id: int, lat: float, lng: float, ts: Optional[float] = None) -> Tuple[float, float, float]:
+    """Store a ping from this worker and share it with the others (older than the current fix: ignored)."""
+    now = time.time()
+    ts = now if ts is None else min(ts, now)  # don't let a skewed device clock pin the fix
+    _store.set_fix(booking_id, lat, lng, ts, local=True)
+    broadcast.send("live_fix", str(booking_id), json.dumps([lat, lng, ts]))
+    return (lat, lng, ts)
+
+
+def last_fix(booking_id: int) -> Optional[Tuple[float, float, float]]:
+    """Latest known (lat, lng, ts) for the booking, from any worker."""
+    return _store.fix(booking_id)
+
+
+def overlay(booking_id: int, payload: dict) -> dict:
+    """Return `payload` with the freshest known live position applied."""
+    f = _store.fix(booking_id)
+    if f is None:
+        return payload
+    return {**payload, "provider_live_lat": f[0], "provider_live_lng": f[1]}
+
+
+def remember_snapshot(booking_id: int, payload: dict, share: bool = True) -> None:
+    """Keep the last full booking payload so location events can be sent in the same shape."""
+    _store.set_snapshot(booking_id, payload)
+    if share:
+        broadcast.send("live_snapshot", str(booking_id), json.dumps(payload, separators=(",", ":")))
+
+
+def snapshot(booking_id: int) -> Optional[dict]:
+    return _store.snapshot(booking_id)
+
+
+def persist_into(b: Booking) -> None:
+    """Copy this worker's unpersisted fix onto `b` so it is saved with the caller's commit."""
+    f = _store.take_dirty(b.id).get(b.id)
+    if f is not None:
+        b.provider_live_lat, b.provider_live_lng = f[0], f[1]
+
+
+def forget(booking_id: int) -> None:
+    _store.forget(booking_id)
+    broadcast.send("live_forget", str(booking_id), "")
+
+
+def reassigned(booking_id: int) -> None:
+    """The booking moved to another provider outside the ORM (bulk UPDATE): reset its live state."""
+    forget(booking_id)
+    _store.drop_assignee(booking_id)
+    broadcast.send("live_assignee", str(booking_id), "")
+
+
+# Fixes/snapshots from other workers (never persisted here)
+def _remote_fix(topic: str, message: str) -> None:
+    lat, lng, ts = json.loads(message)
+    _store.set_fix(int(topic), float(lat), float(lng), float(ts), local=False)
+
+
+broadcast.register("live_fix", _remote_fix)
+broadcast.register("live_snapshot", lambda topic, message: _store.set_snapshot(int(topic), json.loads(message)))
+broadcast.register("live_forget", lambda topic, _message: _store.forget(int(topic)))
+broadcast.register("live_assignee", lambda topic, _message: _store.drop_assignee(int(topic)))
+
+
+# ---------- keep cached assignees / snapshots honest ----------
+@event.listens_for(Booking, "after_update")
+def _booking_changed(mapper, connection, target: Booking) -> None:
+    info = Session.object_session(target).info
+    info.setdefault("_live_changed", set()).add(target.id)
+    if inspect(target).attrs.provider_id.history.has_changes():
+        _store.drop_assignee(target.id)
+        info.setdefault("_live_reassigned", set()).add(target.id)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _booking_change_committed(session: Session) -> None:
+    for bid in session.info.pop("_live_changed", ()):
+        # A status broadcast re-sets (and shares) the snapshot; until then don't serve a stale one
+        _store.drop_snapshot(bid)
+    for bid in session.info.pop("_live_reassigned", ()):
+        # Drop again after commit: a concurrent reader may have re-cached the old provider
+        _store.drop_assignee(bid)
+        broadcast.send("live_assignee", str(bid), "")
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _booking_change_rolled_back(session: Session) -> None:
+    session.info.pop("_live_changed", None)
+    session.info.pop("_live_reassigned", None)
@@ -0,0 +1,266 @@
+# backend/app/services/map_service.py
+"""
+Viewport queries for the issues map.
+
+Issues are kept in an in-memory spatial index keyed by Web-Mercator tiles:
+- low zoom  -> pre-aggregated cluster counts per grid cell, one table per zoom level
+- high zoom -> individual lightweight markers from fine-grained buckets
+
+Every zoom level's aggregates are updated incrementally when an issue is
+created, moved, re-classified, changes status or is deleted, so a viewport
+query never scans the issues table. ORM events on Issue note those changes and
+apply them after commit; other workers get them over services/broadcast.py.
+Bulk `query(...).update()` calls bypass the events (see stats_service).
+"""
+from __future__ import annotations
+import json
+import math
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models.issue import Issue
+from . import broadcast
+
+MAX_LAT = 85.05112878  # Web-Mercator limit
+
+
+def tile_xy(lat: float, lng: float, zoom: int) -> Tuple[int, int]:
+    """Slippy-map tile containing (lat, lng) at `zoom`."""
+    lat = max(-MAX_LAT, min(MAX_LAT, lat))
+    n = 1 << zoom
+    x = int((lng + 180.0) / 360.0 * n)
+    lat_r = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_r)) / math.pi) / 2.0 * n)
+    return (min(max(x, 0), n - 1), min(max(y, 0), n - 1))
+
+
+def issue_category(ai: Any) -> Optional[str]:
+    if not isinstance(ai, dict):
+        return None
+    c = ai.get('classification')
+    if isinstance(c, dict):
+        return c.get('category') or c.get('label')
+    if isinstance(c, str):
+        return c
+    return None
+
+
+# (lat, lng, status, category)
+_Point = Tuple[float, float, str, Optional[str]]
+
+
+class IssueMapIndex:
+    def __init__(self, cluster_max_zoom: int, cell_shift: int, bucket_zoom: int):
+        self.cluster_max_zoom = cluster_max_zoom
+        self.cell_shift = cell_shift      # cluster cells are tiles at zoom + cell_shift
+        self.bucket_zoom = bucket_zoom    # marker buckets are tiles at this zoom
+        self._points: Dict[int, _Point] = {}
+        self._buckets: Dict[Tuple[int, int], set] = {}
+        # zoom -> cell -> [count, sum_lat, sum_lng]
+        self._clusters: List[Dict[Tuple[int, int], List[float]]] = [dict() for _ in range(cluster_max_zoom + 1)]
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            rows = (
+                db.query(Issue.id, Issue.lat, Issue.lng, Issue.status, Issue.ai)
+                .filter(Issue.lat.isnot(None), Issue.lng.isnot(None))
+                .all()
+            )
+            for r in rows:
+                self._add_locked(r.id, (r.lat, r.lng, r.status or "open", issue_category(r.ai)))
+            self._loaded = True
+
+    # ---------- incremental maintenance ----------
+    def _add_locked(self, issue_id: int, pt: _Point) -> None:
+        if issue_id in self._points:
+            self._remove_locked(issue_id)
+        lat, lng = pt[0], pt[1]
+        self._points[issue_id] = pt
+        self._buckets.setdefault(tile_xy(lat, lng, self.bucket_zoom), set()).add(issue_id)
+        for z, table in enumerate(self._clusters):
+            agg = table.setdefault(tile_xy(lat, lng, z + self.cell_shift), [0, 0.0, 0.0])
+            agg[0] += 1
+            agg[1] += lat
+            agg[2] += lng
+
+    def _remove_locked(self, issue_id: int) -> None:
+        pt = self._points.pop(issue_id, None)
+        if pt is None:
+            return
+        lat, lng = pt[0], pt[1]
+        key = tile_xy(lat, lng, self.bucket_zoom)
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.discard(issue_id)
+            if not bucket:
+                self._buckets.pop(key, None)
+        for z, table in enumerate(self._clusters):
+            cell = tile_xy(lat, lng, z + self.cell_shift)
+            agg = table.get(cell)
+            if agg is None:
+                continue
+            agg[0] -= 1
+            agg[1] -= lat
+            agg[2] -= lng
+            if agg[0] <= 0:
+                table.pop(cell, None)
+
+    def apply(self, issue_id: int, pt: Optional[_Point]) -> None:
+        """Set an issue's point (None: drop it from the map)."""
+        with self._lock:
+            if not self._loaded:
+                return  # the initial load will pick it up from the DB
+            if pt is None:
+                self._remove_locked(issue_id)
+            else:
+                self._add_locked(issue_id, pt)
+
+    # ---------- queries ----------
+    @staticmethod
+    def _tile_range(bbox: Tuple[float, float, float, float], zoom: int):
+        min_lng, min_lat, max_lng, max_lat = bbox
+        x0, y1 = tile_xy(min_lat, min_lng, zoom)
+        x1, y0 = tile_xy(max_lat, max_lng, zoom)
+        return x0, x1, y0, y1
+
+    @staticmethod
+    def _in_bbox(lat: float, lng: float, bbox) -> bool:
+        return bbox[1] <= lat <= bbox[3] and bbox[0] <= lng <= bbox[2]
+
+    def _cells_in(self, table: dict, bbox, zoom: int):
+        x0, x1, y0, y1 = self._tile_range(bbox, zoom)
+        n_cells = (x1 - x0 + 1) * (y1 - y0 + 1)
+        if n_cells > len(table):
+            # Sparse data: scanning occupied cells beats probing the whole range
+            for (x, y), val in table.items():
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    yield (x, y), val
+        else:
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    val = table.get((x, y))
+                    if val:
+                        yield (x, y), val
+
+    def clusters(self, bbox, zoom: int) -> List[dict]:
+        out = []
+        with self._lock:
+            cell_zoom = zoom + self.cell_shift
+            for (x, y), (count, s_lat, s_lng) in self._cells_in(self._clusters[zoom], bbox, cell_zoom):
+                out.append({
+                    "cell": f"{cell_zoom}/{x}/{y}",
+                    "count": int(count),
+                    # centroid of member issues, so single-issue cells sit on the issue
+                    "lat": s_lat / count,
+                    "lng": s_lng / count,
+                })
+        return out
+
+    def markers(self, bbox, limit: int) -> List[dict]:
+        out = []
+        with self._lock:
+            for _, ids in self._cells_in(self._buckets, bbox, self.bucket_zoom):
+                for issue_id in ids:
+                    lat, lng, status, category = self._points[issue_id]
+                    if self._in_bbox(lat, lng, bbox):
+                        out.append({"id": issue_id, "lat": lat, "lng": lng, "status": status, "category": category})
+                        if len(out) >= limit:
+                            return out
+        return out
+
+
+_index = IssueMapIndex(
+    cluster_max_zoom=settings.MAP_CLUSTER_MAX_ZOOM,
+    cell_shift=settings.MAP_CLUSTER_CELL_SHIFT,
+    bucket_zoom=settings.MAP_MARKER_BUCKET_ZOOM,
+)
+
+
+def parse_bbox(raw: str) -> Tuple[float, float, float, float]:
+    """Parse 'min_lng,min_lat,max_lng,max_lat' (GeoJSON order)."""
+    parts = [p.strip() for p in (raw or "").split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox must be 'min_lng,min_lat,max_lng,max_lat'")
+    min_lng, min_lat, max_lng, max_lat = (float(p) for p in parts)
+    if not (-180 <= min_lng <= max_lng <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError("bbox out of range or min > max")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def query_map(db: Session, *, bbox: Tuple[float, float, float, float], zoom: int) -> Dict[str, Any]:
+    _index.ensure_loaded(db)
+    if zoom <= _index.cluster_max_zoom:
+        return {"zoom": zoom, "mode": "clusters", "clusters": _index.clusters(bbox, zoom), "markers": []}
+    return {"zoom": zoom, "mode": "markers", "clusters": [], "markers": _index.markers(bbox, settings.MAP_MAX_MARKERS)}
+
+
+def issue_point(issue: Issue) -> Optional[_Point]:
+    if issue.lat is None or issue.lng is None:
+        return None
+    return (issue.lat, issue.lng, issue.status or "open", issue_category(issue.ai))
+
+
+# Changes from other workers
+def _decode(message: str) -> Optional[_Point]:
+    pt = json.loads(message) if message else None
+    return tuple(pt) if pt else None  # type: ignore[return-value]
+
+
+broadcast.register("map_issue", lambda topic, message: _index.apply(int(topic), _decode(message)))
+
+
+# ---------- follow issue writes ----------
+_TRACKED = ("lat", "lng", "status", "ai")
+
+
+def _note(target: Issue, pt: Optional[_Point]) -> None:
+    Session.object_session(target).info.setdefault("_map_changed", {})[target.id] = pt
+
+
+@event.listens_for(Issue, "after_insert")
+def _issue_inserted(mapper, connection, target: Issue) -> None:
+    _note(target, issue_point(target))
+
+
+@event.listens_for(Issue, "after_update")
+def _issue_updated(mapper, connection, target: Issue) -> None:
+    state = inspect(target)
+    if not any(state.attrs[a].history.has_changes() for a in _TRACKED):
+        return
+    if any(a in state.unloaded for a in _TRACKED):
+        # Never trigger a lazy load from inside a flush; read the row on the flush's connection
+        r = connection.execute(select(Issue.lat, Issue.lng, Issue.status, Issue.ai).where(Issue.id == target.id)).first()
+        if r is None:
+            return
+        pt = None if r.lat is None or r.lng is None else (r.lat, r.lng, r.status or "open", issue_category(r.ai))
+        _note(target, pt)
+    else:
+        _note(target, issue_point(target))
+
+
+@event.listens_for(Issue, "after_delete")
+def _issue_deleted(mapper, connection, target: Issue) -> None:
+    _note(target, None)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _issues_committed(session: Session) -> None:
+    for issue_id, pt in session.info.pop("_map_changed", {}).items():
+        _index.apply(issue_id, pt)
+        broadcast.send("map_issue", str(issue_id), json.dumps(pt) if pt else "")
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _issues_rolled_back(session: Session) -> None:
+    session.info.pop("_map_changed", None)
@@ -36,4 +36,17 @@ def notify_officials(category: str | dict | None, payload: dict) -> dict:
         "subject": subject,
         "body_preview": body[:200],
         "meta": {k: payload.get(k) for k in ['issue_id', 'title', 'user', 'contact'] if k in payload},
-    }
\ No newline at end of file
+    }
+
+
+def push_to_device(fcm_token: str, data: dict) -> dict:
+    """Log-only push notifier (FCM data message).
+    Replace with an FCM HTTP v1 call for real delivery.
+    """
+    # FCM data payloads are flat string maps
+    flat = {k: str(v) for k, v in data.items() if v is not None}
+    return {
+        "pushed": True,
+        "token_preview": (fcm_token or "")[:12],
+        "data": flat,
+    }
@@ -0,0 +1,377 @@
+# backend/app/services/pricing_service.py
+"""
+Price profiles built from booking outcomes, for data-driven negotiation bounds.
+
+One profile per service category, per (category, provider) and per
+(category, cell). Cells are map tiles at PRICING_CELL_ZOOM around the consumer's
+location. A profile holds:
+- the most recent PRICING_MAX_SAMPLES completed prices, kept sorted, so its
+  percentiles are index lookups (computed once per change, then cached)
+- outcome counts: completed / canceled / declined, and the acceptance rate
+  completed / (completed + canceled + declined)
+
+The index is loaded from the bookings table in the background at startup
+(start(), from main.py) and then kept current without querying it. Lookups
+that arrive while that first load is running wait for it (up to
+PRICING_LOAD_WAIT_SECONDS, then PricingNotReady) rather than report no data.
+After that:
+- ORM events on Booking note status / price changes and fold them in after
+  commit; other workers get them over services/broadcast.py
+- bulk `query(...).update()` calls (dispatch timeouts, reassignment) bypass
+  those events, so the table is re-read in the background every
+  PRICING_REFRESH_SECONDS
+
+Each booking contributes at most once, so replays and repeated "completed"
+updates are harmless. Lookups (suggest_bounds, profiles) are dict reads.
+"""
+from __future__ import annotations
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models.booking import Booking
+from . import broadcast
+from .map_service import tile_xy
+
+log = logging.getLogger(__name__)
+
+CURRENCY = "INR"  # Booking.price_currency default; prices in other currencies are not mixed in
+PERCENTILES = (10, 25, 50, 75, 90)
+_OUTCOMES = {"completed": "completed", "canceled": "canceled", "cancelled": "canceled", "declined": "declined"}
+
+# (category, provider_id, cell, outcome, price or None)
+_Fact = Tuple[str, int, Optional[str], str, Optional[float]]
+
+
+class PricingNotReady(RuntimeError):
+    """The index has not finished its first load."""
+
+
+def category_key(category: Optional[str]) -> str:
+    return (category or "").strip().lower()[:100]
+
+
+def price_cell(lat: Optional[float], lng: Optional[float]) -> Optional[str]:
+    if lat is None or lng is None:
+        return None
+    z = settings.PRICING_CELL_ZOOM
+    x, y = tile_xy(lat, lng, z)
+    return f"{z}/{x}/{y}"
+
+
+def booking_fact(category, provider_id, lat, lng, status, price_amount, price_currency) -> Optional[_Fact]:
+    """What a booking contributes to the index, or None (no outcome yet / no category)."""
+    outcome = _OUTCOMES.get(status or "")
+    cat = category_key(category)
+    if outcome is None or not cat:
+        return None
+    price = None
+    if (outcome == "completed" and price_amount is not None and price_amount > 0
+            and (price_currency or CURRENCY).upper() == CURRENCY):
+        price = round(float(price_amount), 2)
+    return (cat, int(provider_id), price_cell(lat, lng), outcome, price)
+
+
+def _percentile(sorted_prices: List[float], q: float) -> float:
+    """Linearly interpolated percentile (same as numpy's default)."""
+    pos = (len(sorted_prices) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_prices) - 1)
+    return sorted_prices[lo] + (sorted_prices[hi] - sorted_prices[lo]) * (pos - lo)
+
+
+class PriceProfile:
+    __slots__ = ("_recent", "_sorted", "counts", "_summary")
+
+    def __init__(self):
+        self._recent: "OrderedDict[int, float]" = OrderedDict()  # booking_id -> price, oldest first
+        self._sorted: List[float] = []
+        self.counts = {"completed": 0, "canceled": 0, "declined": 0}
+        self._summary: Optional[Dict[str, Any]] = None
+
+    def add(self, booking_id: int, outcome: str, price: Optional[float]) -> None:
+        self.counts[outcome] += 1
+        if price is not None:
+            self._recent[booking_id] = price
+            insort(self._sorted, price)
+            if len(self._recent) > settings.PRICING_MAX_SAMPLES:
+                _, old = self._recent.popitem(last=False)
+                self._drop_price(old)
+        self._summary = None
+
+    def remove(self, booking_id: int, outcome: str) -> None:
+        self.counts[outcome] -= 1
+        price = self._recent.pop(booking_id, None)
+        if price is not None:
+            self._drop_price(price)
+        self._summary = None
+
+    def _drop_price(self, price: float) -> None:
+        i = bisect_left(self._sorted, price)
+        if i < len(self._sorted) and self._sorted[i] == price:
+            del self._sorted[i]
+
+    def percentile(self, q: float) -> float:
+        return _percentile(self._sorted, q)
+
+    @property
+    def samples(self) -> int:
+        return len(self._sorted)
+
+    @property
+    def empty(self) -> bool:
+        return not any(self.counts.values())
+
+    def summary(self) -> Dict[str, Any]:
+        if self._summary is None:
+            prices = self._sorted
+            ended = sum(self.counts.values())
+            out: Dict[str, Any] = {
+                "samples": len(prices),
+                **self.counts,
+                "acceptance_rate": round(self.counts["completed"] / ended, 4) if ended else None,
+                "mean": round(sum(prices) / len(prices), 2) if prices else None,
+            }
+            for q in PERCENTILES:
+                out[f"p{q}"] = round(_percentile(prices, q), 2) if prices else None
+            self._summary = out
+        return self._summary
+
+
+class PricingIndex:
+    """Profiles keyed by ("category", cat) / ("provider", cat, id) / ("cell", cat, cell) (thread-safe)."""
+
+    def __init__(self):
+        self._profiles: Dict[tuple, PriceProfile] = {}
+        self._facts: Dict[int, _Fact] = {}  # booking_id -> what it contributed
+        self._lock = threading.Lock()
+        self._settled = threading.Condition(self._lock)  # notified when a load attempt ends
+        self._loaded = False
+        self._loaded_at = 0.0
+        self._refreshing = False
+        self._touched: set = set()  # booking ids changed by events while a refresh reads the table
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pricing-refresh")
+
+    @staticmethod
+    def _keys(fact: _Fact):
+        cat, provider_id, cell, _, _ = fact
+        yield ("category", cat)
+        yield ("provider", cat, provider_id)
+        if cell is not None:
+            yield ("cell", cat, cell)
+
+    def _apply_locked(self, booking_id: int, fact: Optional[_Fact]) -> None:
+        old = self._facts.get(booking_id)
+        if old == fact:
+            return
+        if old is not None:
+            for key in self._keys(old):
+                p = self._profiles[key]
+                p.remove(booking_id, old[3])
+                if p.empty:
+                    del self._profiles[key]
+            del self._facts[booking_id]
+        if fact is not None:
+            for key in self._keys(fact):
+                p = self._profiles.get(key)
+                if p is None:
+                    p = self._profiles[key] = PriceProfile()
+                p.add(booking_id, fact[3], fact[4])
+            self._facts[booking_id] = fact
+
+    def apply(self, booking_id: int, fact: Optional[_Fact]) -> None:
+        """Record a booking's current outcome (None: it has none, e.g. reopened)."""
+        with self._lock:
+            if self._refreshing:
+                self._touched.add(booking_id)
+            self._apply_locked(booking_id, fact)
+
+    # ---------- loading ----------
+    def _read_table(self) -> Dict[int, _Fact]:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Booking.id, Booking.service_category, Booking.provider_id, Booking.consumer_lat,
+                         Booking.consumer_lng, Booking.status, Booking.price_amount, Booking.price_currency)
+                .filter(Booking.status.in_(list(_OUTCOMES)))
+                .order_by(Booking.id)  # oldest first, so each profile keeps the newest prices
+                .yield_per(1000)
+            )
+            facts = {}
+            for r in rows:
+                fact = booking_fact(r.service_category, r.provider_id, r.consumer_lat, r.consumer_lng,
+                                    r.status, r.price_amount, r.price_currency)
+                if fact is not None:
+                    facts[r.id] = fact
+            return facts
+        finally:
+            db.close()
+
+    def _sync(self, facts: Dict[int, _Fact]) -> None:
+        with self._lock:
+            touched, self._touched = self._touched, set()
+            for bid in [b for b in self._facts if b not in facts and b not in touched]:
+                self._apply_locked(bid, None)
+            for bid, fact in facts.items():
+                if bid not in touched:
+                    self._apply_locked(bid, fact)
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+            self._refreshing = False
+            self._settled.notify_all()
+
+    def schedule_refresh(self) -> None:
+        """Re-read the table on the background thread (no-op while one is running)."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        self._executor.submit(self._refresh)
+
+    def ensure_loaded(self) -> None:
+        """Wait for the first load if it is still running; schedule a re-read when one is due."""
+        if not self._loaded:
+            self.schedule_refresh()  # normally already started by start()
+            with self._lock:
+                self._settled.wait_for(lambda: self._loaded or not self._refreshing,
+                                       timeout=settings.PRICING_LOAD_WAIT_SECONDS)
+                if not self._loaded:
+                    raise PricingNotReady("pricing profiles are still loading")
+            return
+        if time.monotonic() - self._loaded_at >= settings.PRICING_REFRESH_SECONDS:
+            self.schedule_refresh()
+
+    def _refresh(self) -> None:
+        try:
+            facts = self._read_table()
+        except Exception:
+            log.exception("pricing index refresh failed")
+            with self._lock:
+                self._refreshing = False
+                self._loaded_at = time.monotonic()  # retry after the next interval, not on every lookup
+                self._settled.notify_all()
+            return
+        self._sync(facts)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> None:
+        """Block until a scheduled refresh has run (tests and scripts)."""
+        self._executor.submit(lambda: None).result(timeout)
+
+    # ---------- lookups ----------
+    def profile(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            p = self._profiles.get(key)
+            return p.summary() if p is not None else None
+
+    def bounds(self, keys: List[Tuple[str, tuple]]) -> Optional[Dict[str, Any]]:
+        """Bounds from the first of `keys` with at least PRICING_MIN_SAMPLES prices."""
+        with self._lock:
+            for level, key in keys:
+                p = self._profiles.get(key)
+                if p is not None and p.samples >= max(1, settings.PRICING_MIN_SAMPLES):
+                    return {
+                        "list_price": round(p.percentile(settings.PRICING_LIST_PERCENTILE), 2),
+                        "min_price": round(p.percentile(settings.PRICING_MIN_PERCENTILE), 2),
+                        "currency": CURRENCY,
+                        "source": level,
+                        "samples": p.samples,
+                        "acceptance_rate": p.summary()["acceptance_rate"],
+                    }
+        return None
+
+
+_index = PricingIndex()
+
+
+def _lookup_keys(category: str, provider_id: Optional[int], cell: Optional[str]) -> List[Tuple[str, tuple]]:
+    # Most specific first: the first level with enough prices gives the bounds
+    keys = []
+    if provider_id is not None:
+        keys.append(("provider", ("provider", category, int(provider_id))))
+    if cell is not None:
+        keys.append(("cell", ("cell", category, cell)))
+    keys.append(("category", ("category", category)))
+    return keys
+
+
+def profiles(category: Optional[str], provider_id: Optional[int] = None,
+             lat: Optional[float] = None, lng: Optional[float] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Every level's profile for a category (None where there is no data). Raises PricingNotReady like suggest_bounds."""
+    cat = category_key(category)
+    if not cat:
+        return {}
+    _index.ensure_loaded()
+    return {level: _index.profile(key) for level, key in _lookup_keys(cat, provider_id, price_cell(lat, lng))}
+
+
+def suggest_bounds(category: Optional[str], provider_id: Optional[int] = None,
+                   lat: Optional[float] = None, lng: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """List / minimum price from the most specific profile with enough completed prices.
+
+    The list price is the PRICING_LIST_PERCENTILE of what such jobs closed at and
+    the minimum the PRICING_MIN_PERCENTILE. None when there is not enough data;
+    PricingNotReady if the first load has not finished in time.
+    """
+    cat = category_key(category)
+    if not cat:
+        return None
+    _index.ensure_loaded()
+    return _index.bounds(_lookup_keys(cat, provider_id, price_cell(lat, lng)))
+
+
+def start() -> None:
+    """Load the index in the background (startup), so no request pays for the table scan."""
+    _index.schedule_refresh()
+
+
+def rebuild_pricing_index() -> int:
+    """Re-read every booking outcome now. Returns bookings contributing to the index."""
+    with _index._lock:
+        _index._settled.wait_for(lambda: not _index._refreshing)
+        _index._refreshing = True
+    _index._refresh()
+    return len(_index._facts)
+
+
+# Outcomes from other workers
+broadcast.register("pricing_outcome", lambda topic, message: _index.apply(int(topic), _decode(message)))
+
+
+def _decode(message: str) -> Optional[_Fact]:
+    fact = json.loads(message) if message else None
+    return tuple(fact) if fact else None  # type: ignore[return-value]
+
+
+# ---------- follow booking writes ----------
+@event.listens_for(Booking, "after_insert")
+@event.listens_for(Booking, "after_update")
+def _booking_priced(mapper, connection, target: Booking) -> None:
+    attrs = inspect(target).attrs
+    if not (attrs.status.history.has_changes() or attrs.price_amount.history.has_changes()):
+        return
+    fact = booking_fact(target.service_category, target.provider_id, target.consumer_lat, target.consumer_lng,
+                        target.status, target.price_amount, target.price_currency)
+    Session.object_session(target).info.setdefault("_pricing_changed", {})[target.id] = fact
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _booking_priced_committed(session: Session) -> None:
+    for bid, fact in session.info.pop("_pricing_changed", {}).items():
+        if _index._loaded or _index._refreshing:
+            _index.apply(bid, fact)
+        broadcast.send("pricing_outcome", str(bid), json.dumps(fact) if fact else "")
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _booking_priced_rolled_back(session: Session) -> None:
+    session.info.pop("_pricing_changed", None)
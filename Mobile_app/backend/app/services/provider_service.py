@@ -59,6 +59,8 @@ def nearby_providers(db: Session, lat: float, lng: float, within_km: float = 5.0
             candidates.append(p)
 
     if not query:
+        # Best rated first (Bayesian score, so a handful of ratings doesn't dominate)
+        candidates.sort(key=lambda p: -(p.rating_score or 0.0))
         return candidates
 
     q_vec = _emb_client.encode(query)
@@ -0,0 +1,131 @@
+# backend/app/services/rating_service.py
+"""
+Provider rating aggregates, maintained with atomic SQL increments.
+
+- rating_sum / rating_count: totals of Booking.rating_stars for the provider
+- rating:       plain average (rating_sum / rating_count), what the apps show
+- rating_score: Bayesian average used for ranking, so 1 five-star rating does
+                not beat 200 ratings averaging 4.8:
+                (RATING_PRIOR_MEAN * RATING_PRIOR_WEIGHT + rating_sum) / (RATING_PRIOR_WEIGHT + rating_count)
+- jobs_done:    completed bookings (rated or not)
+
+Every change is a single UPDATE ... SET x = x + :d, so concurrent ratings and
+completions cannot overwrite each other. rebuild_provider_ratings() recomputes
+everything from the bookings table.
+"""
+from __future__ import annotations
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.booking import Booking
+from ..models.provider import Provider
+
+
+def bayesian_score(rating_sum: float, rating_count: int) -> float:
+    m, c = settings.RATING_PRIOR_MEAN, settings.RATING_PRIOR_WEIGHT
+    return (m * c + rating_sum) / (c + rating_count) if (c + rating_count) > 0 else 0.0
+
+
+def _add_rating_stmt(provider_id: int, stars: int):
+    # SET right-hand sides all see the pre-update row
+    m, c = settings.RATING_PRIOR_MEAN, settings.RATING_PRIOR_WEIGHT
+    old_sum = func.coalesce(Provider.rating_sum, 0)
+    old_count = func.coalesce(Provider.rating_count, 0)
+    return (
+        update(Provider)
+        .where(Provider.id == provider_id)
+        .values(
+            rating_sum=old_sum + stars,
+            rating_count=old_count + 1,
+            rating=(old_sum + stars) * 1.0 / (old_count + 1),
+            rating_score=(m * c + old_sum + stars) * 1.0 / (c + old_count + 1),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def record_rating(db: Session, booking: Booking, stars: int, comment: Optional[str]) -> bool:
+    """Rate a completed booking once and fold the stars into its provider's aggregates.
+
+    Returns False if the booking was already rated (or is no longer completed).
+    Commits on success.
+    """
+    won = db.query(Booking).filter(
+        Booking.id == booking.id,
+        Booking.status == "completed",
+        Booking.rating_stars.is_(None),
+    ).update(
+        {
+            Booking.rating_stars: stars,
+            Booking.rating_comment: comment,
+            Booking.rated_at: datetime.utcnow(),
+        },
+        synchronize_session=False,
+    )
+    if not won:
+        db.rollback()
+        return False
+    db.execute(_add_rating_stmt(booking.provider_id, stars))
+    db.commit()
+    return True
+
+
+def record_completion(db: Session, booking: Booking) -> bool:
+    """Move `booking` to "completed" and count the job for its provider (once).
+
+    Doesn't commit; the caller's commit saves both. Returns False if the
+    booking was already completed.
+    """
+    won = db.query(Booking).filter(
+        Booking.id == booking.id,
+        Booking.status != "completed",
+    ).update({Booking.status: "completed"}, synchronize_session=False)
+    if not won:
+        return False
+    db.execute(
+        update(Provider)
+        .where(Provider.id == booking.provider_id)
+        .values(jobs_done=func.coalesce(Provider.jobs_done, 0) + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return True
+
+
+def rebuild_provider_ratings(db: Session) -> int:
+    """Recompute every provider's aggregates from the bookings table. Returns providers with bookings."""
+    rows = (
+        db.query(
+            Booking.provider_id,
+            func.coalesce(func.sum(Booking.rating_stars), 0).label("rating_sum"),
+            func.count(Booking.rating_stars).label("rating_count"),
+            func.sum(case((Booking.status == "completed", 1), else_=0)).label("jobs_done"),
+        )
+        .group_by(Booking.provider_id)
+        .all()
+    )
+    # Providers without bookings fall back to the prior
+    db.execute(
+        update(Provider)
+        .values(rating_sum=0, rating_count=0, rating=0.0, rating_score=bayesian_score(0, 0), jobs_done=0)
+        .execution_options(synchronize_session=False)
+    )
+    for r in rows:
+        s, n = int(r.rating_sum), int(r.rating_count)
+        db.execute(
+            update(Provider)
+            .where(Provider.id == r.provider_id)
+            .values(
+                rating_sum=s,
+                rating_count=n,
+                rating=s / n if n else 0.0,
+                rating_score=bayesian_score(s, n),
+                jobs_done=int(r.jobs_done or 0),
+            )
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return len(rows)
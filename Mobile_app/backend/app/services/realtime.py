@@ -0,0 +1,197 @@
+# backend/app/services/realtime.py
+"""
+In-process pub/sub hub for WebSocket fan-out.
+
+- Subscribers live on an event loop; each gets a bounded send queue.
+- publish() is thread-safe: sync route handlers (threadpool) can call it
+  directly. Delivery is scheduled onto the subscriber's loop with
+  call_soon_threadsafe, one callback per loop per event.
+- Payloads are serialized once per event, not once per socket.
+- Events are also forwarded to other workers through services/broadcast.py,
+  which delivers them to that worker's local subscribers.
+- A slow consumer whose queue is full loses its oldest pending message, so
+  it always converges on the latest state instead of stalling publishers.
+- Replayable topics (publish_event) keep their last WS_REPLAY_BUFFER_SIZE
+  events, each tagged "event_id": "<worker>-<seq>". A reconnecting client
+  passes its last id and gets only what it missed. When that is impossible
+  (the events were evicted, or the id came from another worker) it gets a
+  {"type": "resync"} message and should refetch.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from ..config import settings
+from . import broadcast
+
+
+class Subscription:
+    def __init__(self, hub: "PubSubHub", topic: str, maxsize: int):
+        self.hub = hub
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        # Replayable topics: events up to this seq were already sent from the replay buffer
+        self.after_seq = 0
+
+    def _push(self, text: str, seq: Optional[int] = None) -> None:
+        # Runs on self.loop
+        if seq is not None and seq <= self.after_seq:
+            return
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(text)
+
+    async def get(self) -> str:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class ReplayBuffer:
+    """Last `size` events per topic, numbered by one per-worker sequence."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._events: Dict[str, Deque[Tuple[int, str]]] = {}
+        # Highest seq evicted per topic: resuming from below it would miss events
+        self._floor: Dict[str, int] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def add(self, topic: str, payload: Dict[str, Any]) -> Tuple[int, str]:
+        """Number an event and keep it; returns (seq, its JSON text including "event_id")."""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            text = json.dumps({**payload, "event_id": f"{broadcast.ORIGIN}-{seq}"}, separators=(",", ":"))
+            events = self._events.setdefault(topic, deque())
+            events.append((seq, text))
+            if len(events) > self.size:
+                self._floor[topic] = events.popleft()[0]
+            return seq, text
+
+    def since(self, topic: str, last_event_id: Optional[str]) -> Tuple[Optional[List[str]], int]:
+        """Events after `last_event_id` and the seq they run up to (None: can't tell, resync)."""
+        with self._lock:
+            events = list(self._events.get(topic, ()))
+            floor = self._floor.get(topic, 0)
+            current = self._seq
+        if not last_event_id:
+            return [], current
+        origin, _, raw = last_event_id.rpartition("-")
+        if origin != broadcast.ORIGIN or not raw.isdigit():
+            return None, current  # issued by another (or a restarted) worker
+        last = int(raw)
+        if last < floor or last > current:
+            return None, current
+        return [text for seq, text in events if seq > last], current
+
+
+class PubSubHub:
+    def __init__(self, queue_size: int, replay_size: int):
+        self.queue_size = queue_size
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.replay = ReplayBuffer(replay_size)
+
+    def subscribe(self, topic: str) -> Subscription:
+        """Must be called from the event loop that will consume the subscription."""
+        sub = Subscription(self, topic, self.queue_size)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._topics.get(sub.topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    self._topics.pop(sub.topic, None)
+
+    def has_subscribers(self, topic: str) -> bool:
+        """Whether an event on `topic` could reach anyone (here or on another worker)."""
+        if broadcast.is_distributed():
+            return True
+        with self._lock:
+            return bool(self._topics.get(topic))
+
+    @staticmethod
+    def _deliver(subs: List[Subscription], text: str, seq: Optional[int] = None) -> None:
+        for sub in subs:
+            sub._push(text, seq)
+
+    def publish(self, topic: str, payload: Any) -> int:
+        """Queue `payload` (str or JSON-able) for every subscriber of `topic`, on all workers.
+
+        Thread-safe. Returns the number of local subscribers it was queued for.
+        """
+        text = payload if isinstance(payload, str) else json.dumps(payload, separators=(",", ":"))
+        broadcast.send("ws", topic, text)
+        return self.publish_local(topic, text)
+
+    def publish_event(self, topic: str, payload: dict) -> int:
+        """Like publish(), but the event is numbered and kept for replay (see since())."""
+        broadcast.send("ws_event", topic, json.dumps(payload, separators=(",", ":")))
+        return self.publish_event_local(topic, payload)
+
+    def publish_event_local(self, topic: str, payload: Dict[str, Any]) -> int:
+        seq, text = self.replay.add(topic, payload)
+        return self.publish_local(topic, text, seq)
+
+    def subscribe_from(self, topic: str, last_event_id: Optional[str]) -> Tuple[Subscription, Optional[List[str]]]:
+        """Subscribe to a replayable topic; also returns the missed events (None: client must resync).
+
+        Must be called from the consuming event loop, like subscribe().
+        """
+        sub = self.subscribe(topic)
+        # Anything numbered up to `current` is either in `missed` or was never needed;
+        # the live copy of such an event is skipped so nothing is sent twice
+        missed, current = self.replay.since(topic, last_event_id)
+        sub.after_seq = current
+        return sub, missed
+
+    def publish_local(self, topic: str, text: str, seq: Optional[int] = None) -> int:
+        with self._lock:
+            subs = list(self._topics.get(topic, ()))
+        if not subs:
+            return 0
+        by_loop: Dict[asyncio.AbstractEventLoop, List[Subscription]] = {}
+        for sub in subs:
+            by_loop.setdefault(sub.loop, []).append(sub)
+        try:
+            running: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for loop, group in by_loop.items():
+            if loop is running:
+                self._deliver(group, text, seq)
+            else:
+                try:
+                    loop.call_soon_threadsafe(self._deliver, group, text, seq)
+                except RuntimeError:
+                    pass  # loop already closed; its sockets are gone too
+        return len(subs)
+
+
+hub = PubSubHub(queue_size=settings.WS_SEND_QUEUE_SIZE, replay_size=settings.WS_REPLAY_BUFFER_SIZE)
+broadcast.register("ws", hub.publish_local)
+# Numbered by the receiving worker: event ids are per worker
+broadcast.register("ws_event", lambda topic, message: hub.publish_event_local(topic, json.loads(message)))
+
+
+async def pump(websocket, sub: Subscription) -> None:
+    """Forward a subscription's queued messages to a WebSocket until sending fails."""
+    while True:
+        text = await sub.get()
+        await websocket.send_text(text)
@@ -0,0 +1,232 @@
+# backend/app/services/search_service.py
+"""
+Full-text search over issues and forum posts.
+
+SQLite: a single FTS5 table `search_fts` kept in sync by triggers on `issues`
+and `forum_posts`. Rows are keyed by rowid = id * 2 (+1 for forum posts) so the
+triggers can update/delete by primary key instead of scanning.
+Issues also index `ai.text_en` (when it differs from the description) so
+translated regional-language complaints are findable in English.
+
+Postgres: GIN expression indexes over to_tsvector(...) on both tables,
+queried with ts_rank / ts_headline.
+
+Both backends return the title with every match highlighted and a snippet
+around the best match. Titles and snippets are stored user text: the database
+marks matches with private-use sentinels, the text is HTML-escaped, and only
+then are the sentinels turned into <mark> tags, so results are safe to render
+as HTML.
+"""
+from __future__ import annotations
+import html
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+KIND_ISSUE = "issue"
+KIND_FORUM_POST = "forum_post"
+
+_KIND_BIT = {KIND_ISSUE: 0, KIND_FORUM_POST: 1}
+
+HL_START, HL_END = "<mark>", "</mark>"
+_SENTINEL_START, _SENTINEL_END = "\ue000", "\ue001"  # what the database wraps matches in
+
+_TERM_PAT = re.compile(r"[\w\u0300-\u036f\u0900-\u0dff]+", re.UNICODE)  # words incl. Indic vowel signs
+
+# ---------- SQLite FTS5 ----------
+_ISSUE_TEXT_EN = (
+    "CASE WHEN json_valid({row}.ai) "
+    "THEN nullif(json_extract({row}.ai, '$.text_en'), {row}.description) END"
+)
+
+
+def _fts5_tokenizer() -> str:
+    # Keep combining marks (M*) inside tokens so Indic scripts aren't split at vowel signs;
+    # the `categories` option needs a recent SQLite, so probe for it.
+    tok = "unicode61 remove_diacritics 2 categories 'L* N* Co M*'"
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute(f'CREATE VIRTUAL TABLE probe USING fts5(a, tokenize = "{tok}")')
+        finally:
+            conn.close()
+        return tok
+    except sqlite3.Error:
+        return "unicode61 remove_diacritics 2"
+
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        title, body, text_en, tokenize = "{_fts5_tokenizer()}"
+    )""",
+    # issues -> rowid = id * 2
+    f"""CREATE TRIGGER IF NOT EXISTS issues_fts_ins AFTER INSERT ON issues BEGIN
+        INSERT INTO search_fts(rowid, title, body, text_en)
+        VALUES (new.id * 2, new.title, new.description, {_ISSUE_TEXT_EN.format(row='new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS issues_fts_upd AFTER UPDATE OF title, description, ai ON issues BEGIN
+        DELETE FROM search_fts WHERE rowid = old.id * 2;
+        INSERT INTO search_fts(rowid, title, body, text_en)
+        VALUES (new.id * 2, new.title, new.description, {_ISSUE_TEXT_EN.format(row='new')});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS issues_fts_del AFTER DELETE ON issues BEGIN
+        DELETE FROM search_fts WHERE rowid = old.id * 2;
+    END""",
+    # forum posts -> rowid = id * 2 + 1
+    """CREATE TRIGGER IF NOT EXISTS forum_posts_fts_ins AFTER INSERT ON forum_posts BEGIN
+        INSERT INTO search_fts(rowid, title, body, text_en)
+        VALUES (new.id * 2 + 1, new.title, new.content, NULL);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS forum_posts_fts_upd AFTER UPDATE OF title, content ON forum_posts BEGIN
+        DELETE FROM search_fts WHERE rowid = old.id * 2 + 1;
+        INSERT INTO search_fts(rowid, title, body, text_en)
+        VALUES (new.id * 2 + 1, new.title, new.content, NULL);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS forum_posts_fts_del AFTER DELETE ON forum_posts BEGIN
+        DELETE FROM search_fts WHERE rowid = old.id * 2 + 1;
+    END""",
+]
+
+_SQLITE_REBUILD = [
+    "DELETE FROM search_fts",
+    f"""INSERT INTO search_fts(rowid, title, body, text_en)
+        SELECT id * 2, title, description, {_ISSUE_TEXT_EN.format(row='issues')} FROM issues""",
+    """INSERT INTO search_fts(rowid, title, body, text_en)
+        SELECT id * 2 + 1, title, content, NULL FROM forum_posts""",
+    "INSERT INTO search_fts(search_fts) VALUES ('optimize')",
+]
+
+# ---------- Postgres tsvector ----------
+_PG_ISSUE_DOC = (
+    "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '') "
+    "|| ' ' || coalesce(ai->>'text_en', ''))"
+)
+_PG_POST_DOC = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(content, ''))"
+
+_PG_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_issues_fts ON issues USING GIN ({_PG_ISSUE_DOC})",
+    f"CREATE INDEX IF NOT EXISTS ix_forum_posts_fts ON forum_posts USING GIN ({_PG_POST_DOC})",
+]
+
+
+def _dialect(bind) -> str:
+    return bind.dialect.name
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """Create the FTS table/triggers (or PG indexes); backfill when first created."""
+    name = _dialect(engine)
+    with engine.begin() as conn:
+        if name == "sqlite":
+            existed = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_fts'")
+            ).first() is not None
+            for stmt in _SQLITE_DDL:
+                conn.execute(text(stmt))
+            if not existed:
+                for stmt in _SQLITE_REBUILD:
+                    conn.execute(text(stmt))
+        elif name == "postgresql":
+            for stmt in _PG_DDL:
+                conn.execute(text(stmt))
+
+
+def rebuild_search_index(engine: Engine) -> None:
+    """Re-index every issue and forum post from scratch (SQLite only; PG indexes self-maintain)."""
+    ensure_search_index(engine)
+    if _dialect(engine) != "sqlite":
+        return
+    with engine.begin() as conn:
+        for stmt in _SQLITE_REBUILD:
+            conn.execute(text(stmt))
+
+
+def _render(fragment: Optional[str]) -> Optional[str]:
+    """Escape a highlighted fragment and turn its match sentinels into <mark> tags."""
+    if fragment is None:
+        return None
+    return html.escape(fragment).replace(_SENTINEL_START, HL_START).replace(_SENTINEL_END, HL_END)
+
+
+def _fts5_query(q: str) -> Optional[str]:
+    # Quote every term (user input can't inject FTS syntax) and prefix-match the last one
+    terms = _TERM_PAT.findall(q or "")
+    if not terms:
+        return None
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _search_sqlite(db: Session, q: str, kind: Optional[str], limit: int, offset: int) -> Dict[str, Any]:
+    match = _fts5_query(q)
+    if match is None:
+        return {"total": 0, "results": []}
+    where = "search_fts MATCH :match"
+    params: Dict[str, Any] = {"match": match, "limit": limit, "offset": offset}
+    if kind:
+        where += " AND (rowid % 2) = :bit"
+        params["bit"] = _KIND_BIT[kind]
+    total = db.execute(text(f"SELECT count(*) FROM search_fts WHERE {where}"), params).scalar() or 0
+    rows = db.execute(text(f"""
+        SELECT rowid,
+               highlight(search_fts, 0, '{_SENTINEL_START}', '{_SENTINEL_END}') AS title,
+               snippet(search_fts, -1, '{_SENTINEL_START}', '{_SENTINEL_END}', '…', 16) AS snippet,
+               bm25(search_fts, 5.0, 1.0, 1.0) AS rank
+        FROM search_fts
+        WHERE {where}
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    """), params).all()
+    results = [{
+        "kind": KIND_FORUM_POST if r.rowid % 2 else KIND_ISSUE,
+        "id": r.rowid // 2,
+        "title": _render(r.title),
+        "snippet": _render(r.snippet),
+        "score": round(-float(r.rank), 4),  # bm25(): lower is better
+    } for r in rows]
+    return {"total": int(total), "results": results}
+
+
+def _search_postgres(db: Session, q: str, kind: Optional[str], limit: int, offset: int) -> Dict[str, Any]:
+    if not _TERM_PAT.search(q or ""):
+        return {"total": 0, "results": []}
+    sel = f"StartSel={_SENTINEL_START}, StopSel={_SENTINEL_END}"
+    hl = f"{sel}, MaxFragments=1, MaxWords=24, MinWords=8"
+    hl_title = f"{sel}, HighlightAll=true"  # like FTS5 highlight(): the whole title, every match marked
+    parts = []
+    if kind in (None, KIND_ISSUE):
+        parts.append(f"""
+            SELECT '{KIND_ISSUE}' AS kind, id,
+                   ts_headline('simple', title, query, '{hl_title}') AS title,
+                   ts_headline('simple', description, query, '{hl}') AS snippet,
+                   ts_rank({_PG_ISSUE_DOC}, query) AS score
+            FROM issues, plainto_tsquery('simple', :q) AS query
+            WHERE {_PG_ISSUE_DOC} @@ query""")
+    if kind in (None, KIND_FORUM_POST):
+        parts.append(f"""
+            SELECT '{KIND_FORUM_POST}' AS kind, id,
+                   ts_headline('simple', title, query, '{hl_title}') AS title,
+                   ts_headline('simple', content, query, '{hl}') AS snippet,
+                   ts_rank({_PG_POST_DOC}, query) AS score
+            FROM forum_posts, plainto_tsquery('simple', :q) AS query
+            WHERE {_PG_POST_DOC} @@ query""")
+    union = " UNION ALL ".join(parts)
+    params = {"q": q, "limit": limit, "offset": offset}
+    total = db.execute(text(f"SELECT count(*) FROM ({union}) AS hits"), params).scalar() or 0
+    rows = db.execute(text(f"{union} ORDER BY score DESC LIMIT :limit OFFSET :offset"), params).all()
+    results = [{
+        "kind": r.kind, "id": r.id, "title": _render(r.title), "snippet": _render(r.snippet),
+        "score": round(float(r.score), 4),
+    } for r in rows]
+    return {"total": int(total), "results": results}
+
+
+def search(db: Session, *, q: str, kind: Optional[str] = None, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    if _dialect(db.get_bind()) == "postgresql":
+        return _search_postgres(db, q, kind, limit, offset)
+    return _search_sqlite(db, q, kind, limit, offset)
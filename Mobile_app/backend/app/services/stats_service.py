@@ -0,0 +1,189 @@
+# backend/app/services/stats_service.py
+"""
+Issue count rollups for the officials' dashboard.
+
+`issue_stats` holds one row per (grid cell, category, day, status) with a count.
+ORM events on Issue keep it in sync inside the same transaction as the write:
+- insert -> +1 on the new key
+- update of status / ai / lat / lng -> -1 on the old key, +1 on the new one
+- delete -> -1 on the old key
+
+Cells are map tiles at settings.STATS_CELL_ZOOM (a stand-in for wards until we
+have ward boundaries). Bulk `query(...).update()` calls bypass these events, so
+anything that bulk-changes those columns must call rebuild_issue_stats().
+"""
+from __future__ import annotations
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.issue import Issue
+from ..models.issue_stat import IssueStat
+from .map_service import issue_category, tile_xy
+
+UNCATEGORIZED = "uncategorized"
+NO_CELL = "none"
+
+GROUP_FIELDS = ("cell", "category", "day", "status")
+
+# (cell, category, day, status)
+_Key = Tuple[str, str, date, str]
+
+
+def stat_cell(lat: Optional[float], lng: Optional[float]) -> str:
+    if lat is None or lng is None:
+        return NO_CELL
+    z = settings.STATS_CELL_ZOOM
+    x, y = tile_xy(lat, lng, z)
+    return f"{z}/{x}/{y}"
+
+
+def _day(created_at: Any) -> date:
+    if isinstance(created_at, datetime):
+        return created_at.date()
+    if isinstance(created_at, date):
+        return created_at
+    if isinstance(created_at, str) and created_at:
+        try:
+            return datetime.fromisoformat(created_at).date()
+        except ValueError:
+            pass
+    return datetime.utcnow().date()  # matches CURRENT_TIMESTAMP (UTC) of a just-inserted row
+
+
+def stat_key(lat, lng, ai, created_at, status) -> _Key:
+    category = (issue_category(ai) or UNCATEGORIZED)[:64]
+    return (stat_cell(lat, lng), category, _day(created_at), (status or "open")[:32])
+
+
+def _bump(connection, key: _Key, delta: int) -> None:
+    cell, category, day, status = key
+    params = {"cell": cell, "category": category, "day": day, "status": status, "d": delta}
+    if delta > 0:
+        # One atomic upsert: two transactions creating the same key both land (SQLite >= 3.24, Postgres)
+        connection.execute(text(
+            "INSERT INTO issue_stats (cell, category, day, status, count) "
+            "VALUES (:cell, :category, :day, :status, :d) "
+            "ON CONFLICT (cell, category, day, status) DO UPDATE SET count = issue_stats.count + excluded.count"
+        ), params)
+    else:
+        connection.execute(text(
+            "UPDATE issue_stats SET count = count + :d "
+            "WHERE cell = :cell AND category = :category AND day = :day AND status = :status"
+        ), params)
+
+
+def _created_at(connection, target: Issue) -> Any:
+    # Never trigger a lazy load from inside a flush; read the column on the flush's connection
+    loaded = inspect(target).dict.get("created_at")
+    if loaded is not None:
+        return loaded
+    return connection.execute(select(Issue.created_at).where(Issue.id == target.id)).scalar()
+
+
+def _old_value(target: Issue, attr: str) -> Any:
+    hist = inspect(target).attrs[attr].history
+    if hist.deleted:
+        return hist.deleted[0]
+    return hist.unchanged[0] if hist.unchanged else getattr(target, attr)
+
+
+# ---------- ORM events ----------
+_TRACKED = ("status", "ai", "lat", "lng")
+
+
+def _load_old_value_on_set(target, value, oldvalue, initiator):
+    pass
+
+
+for _attr in _TRACKED:
+    # active_history: load the previous value before it is overwritten on an expired
+    # instance, so after_update can always decrement the right rollup row
+    event.listen(getattr(Issue, _attr), "set", _load_old_value_on_set, active_history=True)
+
+
+@event.listens_for(Issue, "after_insert")
+def _issue_inserted(mapper, connection, target: Issue) -> None:
+    key = stat_key(target.lat, target.lng, target.ai, inspect(target).dict.get("created_at"), target.status)
+    _bump(connection, key, +1)
+
+
+@event.listens_for(Issue, "after_update")
+def _issue_updated(mapper, connection, target: Issue) -> None:
+    state = inspect(target)
+    if not any(state.attrs[a].history.has_changes() for a in _TRACKED):
+        return
+    created_at = _created_at(connection, target)
+    old = stat_key(*(_old_value(target, a) for a in ("lat", "lng", "ai")), created_at, _old_value(target, "status"))
+    new = stat_key(target.lat, target.lng, target.ai, created_at, target.status)
+    if old != new:
+        _bump(connection, old, -1)
+        _bump(connection, new, +1)
+
+
+@event.listens_for(Issue, "before_delete")
+def _issue_deleted(mapper, connection, target: Issue) -> None:
+    # before_delete: the row still exists, so created_at can be read if it was expired
+    key = stat_key(
+        _old_value(target, "lat"), _old_value(target, "lng"), _old_value(target, "ai"),
+        _created_at(connection, target), _old_value(target, "status"),
+    )
+    _bump(connection, key, -1)
+
+
+# ---------- rebuild / query ----------
+def rebuild_issue_stats(db: Session) -> int:
+    """Recompute every rollup row from the issues table. Returns the number of rows written."""
+    counts: Dict[_Key, int] = {}
+    rows = db.query(Issue.lat, Issue.lng, Issue.ai, Issue.created_at, Issue.status).yield_per(1000)
+    for r in rows:
+        key = stat_key(r.lat, r.lng, r.ai, r.created_at, r.status)
+        counts[key] = counts.get(key, 0) + 1
+    db.query(IssueStat).delete(synchronize_session=False)
+    db.bulk_insert_mappings(IssueStat, [
+        {"cell": k[0], "category": k[1], "day": k[2], "status": k[3], "count": n}
+        for k, n in counts.items()
+    ])
+    db.commit()
+    return len(counts)
+
+
+def query_stats(
+    db: Session,
+    *,
+    group_by: Sequence[str],
+    day_from: Optional[date] = None,
+    day_to: Optional[date] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    cell: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Aggregate rollup rows; cost depends on the number of rollup rows, not issues."""
+    cols = [getattr(IssueStat, f) for f in group_by]
+    q = db.query(*cols, func.sum(IssueStat.count).label("count"))
+    if day_from is not None:
+        q = q.filter(IssueStat.day >= day_from)
+    if day_to is not None:
+        q = q.filter(IssueStat.day <= day_to)
+    if category:
+        q = q.filter(IssueStat.category == category)
+    if status:
+        q = q.filter(IssueStat.status == status)
+    if cell:
+        q = q.filter(IssueStat.cell == cell)
+    if cols:
+        q = q.group_by(*cols).order_by(*cols)
+    buckets: List[dict] = []
+    total = 0
+    for r in q.all():
+        n = int(r.count or 0)
+        if n <= 0:
+            continue
+        total += n
+        item = {f: getattr(r, f) for f in group_by}
+        item["count"] = n
+        buckets.append(item)
+    return {"group_by": list(group_by), "total": total, "buckets": buckets}
@@ -0,0 +1,119 @@
+# backend/app/services/track_service.py
+"""
+Compact provider tracks for ETA and replay.
+
+Fixes are simplified with Douglas-Peucker (tolerance in metres) and stored as
+a polyline-encoded string (Google's varint/zig-zag scheme) extended with a
+third dimension, the seconds since the previous point:
+    lat * 1e5, lng * 1e5, t (epoch seconds) -> delta-encoded per point
+so a few hundred points fit in a couple of KB of text.
+"""
+from __future__ import annotations
+import math
+from typing import List, Sequence, Tuple
+
+# (lat, lng, epoch_seconds)
+TrackPoint = Tuple[float, float, float]
+
+_EARTH_M = 6371000.0
+
+
+def _project(lat: float, lng: float, lat0: float) -> Tuple[float, float]:
+    # Equirectangular projection around lat0: accurate enough over a few km
+    x = math.radians(lng) * math.cos(math.radians(lat0)) * _EARTH_M
+    y = math.radians(lat) * _EARTH_M
+    return x, y
+
+
+def _seg_dist(p, a, b) -> float:
+    (px, py), (ax, ay), (bx, by) = p, a, b
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def simplify(points: Sequence[TrackPoint], tolerance_m: float) -> List[TrackPoint]:
+    """Douglas-Peucker simplification; keeps the first and last point (iterative, no recursion)."""
+    n = len(points)
+    if n <= 2 or tolerance_m <= 0:
+        return list(points)
+    lat0 = points[0][0]
+    xy = [_project(p[0], p[1], lat0) for p in points]
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        best, idx = 0.0, -1
+        for k in range(i + 1, j):
+            d = _seg_dist(xy[k], xy[i], xy[j])
+            if d > best:
+                best, idx = d, k
+        if idx != -1 and best > tolerance_m:
+            keep[idx] = True
+            stack.append((i, idx))
+            stack.append((idx, j))
+    return [p for p, k in zip(points, keep) if k]
+
+
+# ---------- polyline encoding (lat, lng, t) ----------
+def _encode_value(v: int, out: List[str]) -> None:
+    v = ~(v << 1) if v < 0 else (v << 1)
+    while v >= 0x20:
+        out.append(chr((0x20 | (v & 0x1f)) + 63))
+        v >>= 5
+    out.append(chr(v + 63))
+
+
+def encode(points: Sequence[TrackPoint]) -> str:
+    out: List[str] = []
+    plat = plng = pt = 0
+    for lat, lng, t in points:
+        ilat, ilng, it = int(round(lat * 1e5)), int(round(lng * 1e5)), int(round(t))
+        _encode_value(ilat - plat, out)
+        _encode_value(ilng - plng, out)
+        _encode_value(it - pt, out)
+        plat, plng, pt = ilat, ilng, it
+    return "".join(out)
+
+
+def decode(s: str | None) -> List[TrackPoint]:
+    points: List[TrackPoint] = []
+    if not s:
+        return points
+    vals = [0, 0, 0]
+    i, n, dim = 0, len(s), 0
+    while i < n:
+        shift = result = 0
+        while True:
+            b = ord(s[i]) - 63
+            i += 1
+            result |= (b & 0x1f) << shift
+            shift += 5
+            if b < 0x20:
+                break
+        vals[dim] += ~(result >> 1) if result & 1 else (result >> 1)
+        dim += 1
+        if dim == 3:
+            points.append((vals[0] / 1e5, vals[1] / 1e5, float(vals[2])))
+            dim = 0
+    return points
+
+
+def append(encoded: str | None, fixes: Sequence[TrackPoint], *, tolerance_m: float, max_points: int) -> str:
+    """Append time-ordered fixes to an encoded track, simplifying the new stretch."""
+    track = decode(encoded)
+    last_t = track[-1][2] if track else float("-inf")
+    fresh = [f for f in fixes if f[2] > last_t]
+    if not fresh:
+        return encoded or ""
+    # Anchor the new stretch on the last stored point so the join is simplified too
+    stretch = simplify(([track[-1]] if track else []) + fresh, tolerance_m)
+    if track:
+        stretch = stretch[1:]
+    track.extend(stretch)
+    if len(track) > max_points:
+        track = track[-max_points:]
+    return encode(track)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Migration: add duplicate_of_id / duplicate_count columns to issues (SQLite only).
+Run once after pulling changes to update existing SQLite DB.
+"""
+import sqlite3
+import os
+from app.config import settings
+
+
+def _resolve_sqlite_path(url: str) -> str | None:
+    if not url.startswith("sqlite:///"):
+        return None
+    raw_path = url.replace("sqlite:///", "", 1)
+    if raw_path.startswith("/") and os.name == "nt":
+        raw_path = raw_path.lstrip("/")
+    if os.path.isabs(raw_path):
+        return raw_path
+    backend_dir = os.path.dirname(__file__)
+    return os.path.abspath(os.path.join(backend_dir, raw_path))
+
+
+def migrate_add_issue_duplicates():
+    db_path = _resolve_sqlite_path(settings.DATABASE_URL)
+    if not db_path:
+        print("This migration script only supports SQLite DATABASE_URL")
+        return False
+
+    if not os.path.exists(db_path):
+        print(f"Database file not found: {db_path}")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+        cur.execute("PRAGMA table_info(issues)")
+        cols = [c[1] for c in cur.fetchall()]
+
+        if 'duplicate_of_id' not in cols:
+            print("Adding duplicate_of_id column to issues ...")
+            cur.execute("ALTER TABLE issues ADD COLUMN duplicate_of_id INTEGER REFERENCES issues(id)")
+        else:
+            print("duplicate_of_id column already exists")
+
+        if 'duplicate_count' not in cols:
+            print("Adding duplicate_count column to issues ...")
+            cur.execute("ALTER TABLE issues ADD COLUMN duplicate_count INTEGER DEFAULT 0")
+        else:
+            print("duplicate_count column already exists")
+
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_issues_duplicate_of_id ON issues (duplicate_of_id)")
+
+        conn.commit()
+        conn.close()
+        print("Migration completed successfully!")
+        return True
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        try:
+            conn.close()
+        except Exception:
+            pass
+        return False
+
+
+if __name__ == "__main__":
+    ok = migrate_add_issue_duplicates()
+    print("\n✅ Done!" if ok else "\n❌ Failed.")
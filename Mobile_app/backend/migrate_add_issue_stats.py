@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Migration: create the issue_stats rollup table and (re)build it from issues.
+Safe to re-run; use it as the rebuild command after bulk imports or bulk updates.
+"""
+from app.db import Base, SessionLocal, engine
+from app.models.issue_stat import IssueStat
+from app.services.stats_service import rebuild_issue_stats
+
+
+def migrate_add_issue_stats():
+    db = None
+    try:
+        print("Creating issue_stats table ...")
+        Base.metadata.create_all(bind=engine, tables=[IssueStat.__table__])
+        print("Rebuilding issue rollups ...")
+        db = SessionLocal()
+        n = rebuild_issue_stats(db)
+        print(f"Wrote {n} rollup rows")
+        print("Migration completed successfully!")
+        return True
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        return False
+    finally:
+        if db is not None:
+            db.close()
+
+
+if __name__ == "__main__":
+    ok = migrate_add_issue_stats()
+    print("\n✅ Done!" if ok else "\n❌ Failed.")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Migration: add rating_sum, rating_count and rating_score columns to providers
+(SQLite only) and rebuild every provider's rating aggregates and jobs_done
+from the bookings table.
+Safe to re-run; use it as the rebuild command if the aggregates ever drift.
+"""
+import sqlite3
+import os
+from app.config import settings
+
+
+def _resolve_sqlite_path(url: str) -> str | None:
+    if not url.startswith("sqlite:///"):
+        return None
+    raw_path = url.replace("sqlite:///", "", 1)
+    if raw_path.startswith("/") and os.name == "nt":
+        raw_path = raw_path.lstrip("/")
+    if os.path.isabs(raw_path):
+        return raw_path
+    backend_dir = os.path.dirname(__file__)
+    return os.path.abspath(os.path.join(backend_dir, raw_path))
+
+
+def migrate_add_provider_rating_aggregates():
+    db_path = _resolve_sqlite_path(settings.DATABASE_URL)
+    if not db_path:
+        print("This migration script only supports SQLite DATABASE_URL")
+        return False
+
+    if not os.path.exists(db_path):
+        print(f"Database file not found: {db_path}")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+        cur.execute("PRAGMA table_info(providers)")
+        cols = [c[1] for c in cur.fetchall()]
+
+        for name, ddl in (
+            ("rating_sum", "INTEGER DEFAULT 0"),
+            ("rating_count", "INTEGER DEFAULT 0"),
+            ("rating_score", "FLOAT DEFAULT 0.0"),
+        ):
+            if name not in cols:
+                print(f"Adding {name} column to providers ...")
+                cur.execute(f"ALTER TABLE providers ADD COLUMN {name} {ddl}")
+            else:
+                print(f"{name} column already exists")
+
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        try:
+            conn.close()
+        except Exception:
+            pass
+        return False
+
+    # Rebuild through the app so the scoring matches rating_service exactly
+    from app.db import SessionLocal
+    from app.services.rating_service import rebuild_provider_ratings
+
+    db = SessionLocal()
+    try:
+        print("Rebuilding provider rating aggregates ...")
+        n = rebuild_provider_ratings(db)
+        print(f"Updated {n} providers")
+        print("Migration completed successfully!")
+        return True
+    except Exception as e:
+        print(f"Rebuild failed: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    ok = migrate_add_provider_rating_aggregates()
+    print("\n✅ Done!" if ok else "\n❌ Failed.")
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Migration: create (or rebuild) the full-text search index over issues and forum posts.
+SQLite gets an FTS5 table + sync triggers; Postgres gets GIN tsvector indexes.
+Safe to re-run; use it to rebuild the index after bulk imports.
+"""
+from app.db import engine
+from app.services.search_service import rebuild_search_index
+
+
+def migrate_add_search_index():
+    try:
+        print("Building search index ...")
+        rebuild_search_index(engine)
+        print("Migration completed successfully!")
+        return True
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    ok = migrate_add_search_index()
+    print("\n✅ Done!" if ok else "\n❌ Failed.")
@@ -0,0 +1,6 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+# Import `app` as the server does, whatever directory pytest is started from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
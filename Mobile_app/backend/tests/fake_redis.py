@@ -0,0 +1,160 @@
+# backend/tests/fake_redis.py
+"""
+Local stand-in for a Redis server, for testing services/broadcast.RedisBackend.
+
+Speaks just enough RESP2 over TCP: AUTH, PING, SUBSCRIBE, UNSUBSCRIBE and
+PUBLISH (fan-out to every subscribed connection, replying with the receiver
+count). Requests are parsed here independently of broadcast.resp_read, so the
+backend's encoder and parser are both exercised against it.
+
+    with FakeRedis(password="pw") as srv:
+        backend = RedisBackend(srv.url)
+"""
+from __future__ import annotations
+import socketserver
+import threading
+from typing import Dict, List, Optional, Set
+
+
+def _bulk(b: bytes) -> bytes:
+    return b"$%d\r\n%s\r\n" % (len(b), b)
+
+
+def _array(*items: bytes) -> bytes:
+    return b"*%d\r\n" % len(items) + b"".join(items)
+
+
+def _int(n: int) -> bytes:
+    return b":%d\r\n" % n
+
+
+class _Conn:
+    """One client connection; writes are locked because PUBLISH fans out from other threads."""
+
+    def __init__(self, handler: socketserver.StreamRequestHandler):
+        self.handler = handler
+        self.lock = threading.Lock()
+        self.channels: Set[bytes] = set()
+
+    def send(self, data: bytes) -> None:
+        with self.lock:
+            self.handler.wfile.write(data)
+            self.handler.wfile.flush()
+
+
+class FakeRedis:
+    def __init__(self, password: Optional[str] = None):
+        self.password = password.encode("utf-8") if password else None
+        self._lock = threading.Lock()
+        self._subscribers: Dict[bytes, Set[_Conn]] = {}
+        self._conns: Set[_Conn] = set()
+        self.published: List[bytes] = []
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                fake._serve(self)
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.url = f"redis://{':' + password + '@' if password else ''}127.0.0.1:{self.port}"
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "FakeRedis":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-redis", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self.drop_clients()
+
+    def subscriber_count(self, channel: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(channel.encode("utf-8"), ()))
+
+    def drop_clients(self) -> None:
+        """Close every client connection, like a Redis restart."""
+        with self._lock:
+            conns = list(self._conns)
+        for c in conns:
+            try:
+                c.handler.connection.shutdown(2)
+            except OSError:
+                pass
+
+    # ---------- protocol ----------
+    @staticmethod
+    def _read_command(rfile) -> Optional[List[bytes]]:
+        line = rfile.readline()
+        if not line:
+            return None
+        if line[:1] != b"*":
+            raise ValueError(f"expected a RESP array, got {line!r}")
+        args = []
+        for _ in range(int(line[1:])):
+            header = rfile.readline()
+            if header[:1] != b"$":
+                raise ValueError(f"expected a bulk string, got {header!r}")
+            data = rfile.read(int(header[1:]) + 2)
+            if data[-2:] != b"\r\n":
+                raise ValueError("bulk string not terminated by CRLF")
+            args.append(data[:-2])
+        return args
+
+    def _serve(self, handler: socketserver.StreamRequestHandler) -> None:
+        conn = _Conn(handler)
+        authed = self.password is None
+        with self._lock:
+            self._conns.add(conn)
+        try:
+            while True:
+                try:
+                    args = self._read_command(handler.rfile)
+                except (OSError, ValueError):
+                    return
+                if not args:
+                    return
+                name = args[0].upper()
+                if name == b"AUTH":
+                    authed = len(args) == 2 and args[1] == self.password
+                    conn.send(b"+OK\r\n" if authed else b"-WRONGPASS invalid password\r\n")
+                elif not authed:
+                    conn.send(b"-NOAUTH Authentication required.\r\n")
+                elif name == b"PING":
+                    conn.send(b"+PONG\r\n")
+                elif name == b"SUBSCRIBE":
+                    for ch in args[1:]:
+                        with self._lock:
+                            self._subscribers.setdefault(ch, set()).add(conn)
+                        conn.channels.add(ch)
+                        conn.send(_array(_bulk(b"subscribe"), _bulk(ch), _int(len(conn.channels))))
+                elif name == b"UNSUBSCRIBE":
+                    for ch in args[1:] or list(conn.channels):
+                        with self._lock:
+                            self._subscribers.get(ch, set()).discard(conn)
+                        conn.channels.discard(ch)
+                        conn.send(_array(_bulk(b"unsubscribe"), _bulk(ch), _int(len(conn.channels))))
+                elif name == b"PUBLISH" and len(args) == 3:
+                    ch, message = args[1], args[2]
+                    with self._lock:
+                        self.published.append(message)
+                        targets = list(self._subscribers.get(ch, ()))
+                    for t in targets:
+                        try:
+                            t.send(_array(_bulk(b"message"), _bulk(ch), _bulk(message)))
+                        except OSError:
+                            pass
+                    conn.send(_int(len(targets)))
+                else:
+                    conn.send(b"-ERR unknown command '%s'\r\n" % name.lower())
+        finally:
+            with self._lock:
+                self._conns.discard(conn)
+                for ch in conn.channels:
+                    self._subscribers.get(ch, set()).discard(conn)
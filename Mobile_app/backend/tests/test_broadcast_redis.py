@@ -0,0 +1,113 @@
+# backend/tests/test_broadcast_redis.py
+"""RedisBackend and the broadcast module against the local RESP2 stand-in (tests/fake_redis.py)."""
+import json
+import time
+
+import pytest
+
+from app.services import broadcast
+from app.services.broadcast import RedisBackend, RespError, resp_command, resp_read
+from fake_redis import FakeRedis
+
+
+def wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def redis():
+    with FakeRedis() as srv:
+        yield srv
+
+
+def _subscribed(srv: FakeRedis, n: int):
+    return lambda: srv.subscriber_count(RedisBackend.CHANNEL) >= n
+
+
+def test_publish_reaches_a_second_subscriber(redis):
+    sender, receiver = RedisBackend(redis.url), RedisBackend(redis.url)
+    got = []
+    sender.start(lambda m: None)
+    receiver.start(got.append)
+    try:
+        assert wait_for(_subscribed(redis, 2))
+        message = 'héllo ☃ "quoted"\r\n$3\r\n*not a frame*'
+        sender.publish(message)
+        assert wait_for(lambda: got)
+        assert got == [message]
+        assert redis.published == [message.encode("utf-8")]
+    finally:
+        sender.close()
+        receiver.close()
+
+
+def test_password_is_sent_with_auth():
+    with FakeRedis(password="s3cret") as srv:
+        sender, receiver = RedisBackend(srv.url), RedisBackend(srv.url)
+        got = []
+        receiver.start(got.append)
+        try:
+            assert wait_for(_subscribed(srv, 1))
+            sender.publish("authed")
+            assert wait_for(lambda: got == ["authed"])
+        finally:
+            sender.close()
+            receiver.close()
+
+
+def test_subscriber_and_publisher_reconnect_after_server_drops_them(redis):
+    sender, receiver = RedisBackend(redis.url), RedisBackend(redis.url)
+    got = []
+    receiver.start(got.append)
+    try:
+        assert wait_for(_subscribed(redis, 1))
+        sender.publish("before")
+        assert wait_for(lambda: got == ["before"])
+        redis.drop_clients()
+        assert wait_for(lambda: redis.subscriber_count(RedisBackend.CHANNEL) == 0)
+        assert wait_for(_subscribed(redis, 1))
+        sender.publish("after")  # the dead publisher connection is replaced on first use
+        assert wait_for(lambda: got == ["before", "after"])
+    finally:
+        sender.close()
+        receiver.close()
+
+
+def test_resp_round_trip_and_errors(redis):
+    import socket
+    with socket.create_connection(("127.0.0.1", redis.port), timeout=5) as s:
+        f = s.makefile("rb")
+        s.sendall(resp_command("PING"))
+        assert resp_read(f) == "PONG"
+        s.sendall(resp_command("PUBLISH", "nobody-listens", "x"))
+        assert resp_read(f) == 0
+        s.sendall(resp_command("NOPE"))
+        with pytest.raises(RespError):
+            resp_read(f)
+
+
+def test_module_send_and_receive_between_workers(redis, monkeypatch):
+    """broadcast.send() reaches another worker; envelopes from other origins reach handlers."""
+    other = RedisBackend(redis.url)  # stands in for a second worker
+    seen_by_other, handled = [], []
+    other.start(seen_by_other.append)
+    monkeypatch.setitem(broadcast._handlers, "test_kind", lambda topic, message: handled.append((topic, message)))
+    broadcast.start(redis.url)
+    try:
+        assert wait_for(_subscribed(redis, 2))
+        broadcast.send("test_kind", "topic-1", "from this worker")
+        assert wait_for(lambda: seen_by_other)
+        env = json.loads(seen_by_other[0])
+        assert (env["o"], env["k"], env["t"], env["m"]) == (broadcast.ORIGIN, "test_kind", "topic-1", "from this worker")
+        assert handled == []  # a worker ignores its own envelopes
+
+        other.publish(json.dumps({"o": "another-worker", "k": "test_kind", "t": "topic-2", "m": "hi"}))
+        assert wait_for(lambda: handled == [("topic-2", "hi")])
+    finally:
+        broadcast.stop()
+        other.close()
@@ -0,0 +1,170 @@
+# backend/tests/test_message_analysis.py
+"""
+message_analysis must behave exactly like the checks it replaced.
+
+The reference functions below are the engines' and the model's old per-call
+logic, with their keyword lists spelled out as they were (not taken from
+message_analysis), compared against analyze() on seeded fuzzed messages.
+"""
+import random
+import re
+import string
+
+import pytest
+
+from app.negotiation.services.message_analysis import KeywordMatcher, MessageAnalysis
+from app.negotiation.services.utils import extract_price
+
+N_MESSAGES = 20_000
+
+
+# ---------- the old logic ----------
+def old_extract_price_from_message(message):
+    # IntelligentNegotiationEngine._extract_price_from_message
+    patterns = [
+        r'₹\s*(\d+(?:,\d+)*(?:\.\d+)?)',
+        r'(\d+(?:,\d+)*(?:\.\d+)?)\s*(?:rupees?|rs\.?|inr)',
+        r'(\d+(?:,\d+)*(?:\.\d+)?)\s*(?:only|max|maximum)',
+        r'(?:offer|pay|budget)\s*(?:is|of)?\s*₹?\s*(\d+(?:,\d+)*(?:\.\d+)?)',
+        r'(\d+(?:,\d+)*(?:\.\d+)?)\s*(?:bucks|dollars)?'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, message, re.IGNORECASE)
+        if match:
+            price_str = match.group(1).replace(',', '')
+            try:
+                return float(price_str)
+            except ValueError:
+                continue
+    return None
+
+
+def old_scope_reduction(user_message):
+    # NegotiationEngine.step
+    text_lower = user_message.lower()
+    scope_keywords = ["less work", "smaller job", "basic", "partial", "only", "exclude", "without",
+                      "i will provide materials", "short visit"]
+    return any(k in text_lower for k in scope_keywords)
+
+
+def old_features(message):
+    # IntelligentNegotiationModel.extract_features_from_message (keyword part)
+    m = (message or '').lower()
+    return {
+        'has_budget': any(w in m for w in ['budget', '₹', 'rs', 'inr', 'price', 'cost']),
+        'urgency': sum(1 for w in ['urgent', 'emergency', 'asap', 'immediately', 'quick'] if w in m),
+        'quality': sum(1 for w in ['quality', 'professional', 'experienced', 'certified'] if w in m),
+    }
+
+
+def old_infer_service_type(message):
+    m = (message or '').lower()
+    mapping = {
+        'plumbing': ['tap', 'pipe', 'leak', 'toilet', 'drain', 'plumb'],
+        'electrical': ['switch', 'socket', 'outlet', 'wiring', 'breaker', 'electric', 'fan', 'light'],
+        'cleaning': ['clean', 'cleanup', 'dust', 'carpet', 'wash'],
+        'hvac': ['ac', 'hvac', 'cooling', 'refrigerant', 'compressor', 'air'],
+        'appliance': ['fridge', 'refrigerator', 'washing', 'washer', 'dishwasher', 'microwave', 'appliance'],
+    }
+    for svc, keywords in mapping.items():
+        if any(k in m for k in keywords):
+            return svc
+    return 'plumbing'
+
+
+def old_infer_complexity(message):
+    m = (message or '').lower()
+    if any(w in m for w in ['major', 'complete', 'complex', 'renovation', 'installation', 'upgrade']):
+        return 'complex'
+    if any(w in m for w in ['simple', 'basic', 'minor', 'small', 'quick', 'easy']):
+        return 'simple'
+    return 'medium'
+
+
+def old_strategy_urgency(user_message):
+    # IntelligentNegotiationModel strategy
+    return sum(1 for w in ['urgent', 'asap', 'immediately'] if w in user_message.lower())
+
+
+# ---------- fuzzing ----------
+_VOCAB = [
+    'tap', 'pipe', 'leak', 'toilet', 'drain', 'plumb', 'switch', 'socket', 'outlet', 'wiring', 'breaker',
+    'electric', 'fan', 'light', 'clean', 'cleanup', 'dust', 'carpet', 'wash', 'ac', 'hvac', 'cooling',
+    'refrigerant', 'compressor', 'air', 'fridge', 'refrigerator', 'washing', 'washer', 'dishwasher',
+    'microwave', 'appliance', 'major', 'complete', 'complex', 'renovation', 'installation', 'upgrade',
+    'simple', 'basic', 'minor', 'small', 'quick', 'easy', 'urgent', 'emergency', 'asap', 'immediately',
+    'budget', '₹', 'rs', 'rs.', 'inr', 'price', 'cost', 'quality', 'professional', 'experienced',
+    'certified', 'less work', 'smaller job', 'partial', 'only', 'exclude', 'without',
+    'i will provide materials', 'short visit', 'rupee', 'rupees', 'max', 'maximum', 'offer', 'pay',
+    'is', 'of', 'bucks', 'dollars', 'the', 'my', 'please', 'can you do', 'for', 'need', 'İ', 'ß',
+    'नल', 'ठीक', 'İstanbul',
+]
+
+
+def _number(rng):
+    n = str(rng.randint(0, 20000))
+    r = rng.random()
+    if r < 0.2 and len(n) > 3:
+        n = f"{n[:-3]},{n[-3:]}"
+    elif r < 0.35:
+        n += f".{rng.randint(0, 99)}"
+    elif r < 0.4:
+        n += ","
+    return n
+
+
+def fuzz_message(rng):
+    parts = []
+    for _ in range(rng.randint(0, 12)):
+        r = rng.random()
+        if r < 0.55:
+            w = rng.choice(_VOCAB)
+            if rng.random() < 0.3:
+                w = w.upper() if rng.random() < 0.5 else w.title()
+        elif r < 0.8:
+            w = _number(rng)
+        else:
+            w = "".join(rng.choice(string.ascii_letters + string.digits + string.punctuation + "₹ \t\n")
+                        for _ in range(rng.randint(1, 6)))
+        parts.append(w)
+    sep = rng.choice([" ", "", "  ", "-", ", "])
+    return sep.join(parts)
+
+
+@pytest.fixture(scope="module")
+def messages():
+    rng = random.Random(48)
+    return [fuzz_message(rng) for _ in range(N_MESSAGES)] + ["", "   ", "₹", "500", "Only 500!", "ACASAP"]
+
+
+# ---------- tests ----------
+def test_prices_match_both_engines(messages):
+    for msg in messages:
+        a = MessageAnalysis(msg)
+        assert a.price == old_extract_price_from_message(msg), msg
+        assert a.first_amount == extract_price(msg), msg
+
+
+def test_keyword_fields_match_old_checks(messages):
+    for msg in messages:
+        a = MessageAnalysis(msg)
+        feats = old_features(msg)
+        assert a.service_type == old_infer_service_type(msg), msg
+        assert a.complexity == old_infer_complexity(msg), msg
+        assert a.has_budget == feats['has_budget'], msg
+        assert a.urgency == feats['urgency'], msg
+        assert a.quality == feats['quality'], msg
+        assert a.scope_reduction == old_scope_reduction(msg), msg
+        assert a.strategy_urgency == old_strategy_urgency(msg), msg
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_keyword_matcher_equals_substring_checks(seed):
+    # Small alphabets force overlaps, shared prefixes/suffixes and keywords inside keywords
+    rng = random.Random(seed)
+    alphabet = "ab" if seed % 2 else "abc"
+    keywords = {"".join(rng.choice(alphabet) for _ in range(rng.randint(1, 5))) for _ in range(rng.randint(1, 12))}
+    matcher = KeywordMatcher(keywords)
+    for _ in range(500):
+        text = "".join(rng.choice(alphabet + "x") for _ in range(rng.randint(0, 30)))
+        assert matcher.find(text) == {kw for kw in keywords if kw in text}, (sorted(keywords), text)